@@ -0,0 +1,344 @@
+import os
+import numpy as np
+import pandas as pd
+from pyH2A.Discounted_Cash_Flow import compile_workflow_plan
+from pyH2A.Analysis.Monte_Carlo_Analysis import h2_cost_calculation, sample_unit_hypercube, sampling_methods
+from pyH2A.Utilities.input_modification import convert_input_to_dictionary, parse_parameter, parse_parameter_to_array
+from pyH2A.Utilities.output_utilities import Figure_Lean
+from pyH2A.Utilities.worker_pool import Worker_Pool
+
+def saltelli_samples(unit_samples):
+	'''Saltelli sample matrices for unit hypercube samples.
+
+	Parameters
+	----------
+	unit_samples : ndarray
+		2D array of shape (N, 2 * dimensions). The first `dimensions` columns are used
+		as matrix A, the remaining ones as matrix B.
+
+	Returns
+	-------
+	values : ndarray
+		2D array with N * (dimensions + 2) rows and `dimensions` columns, containing
+		A, B and AB_i for each parameter i (A with column i taken from B).
+	'''
+
+	dimensions = unit_samples.shape[1] // 2
+	A, B = unit_samples[:,:dimensions], unit_samples[:,dimensions:]
+
+	blocks = [A, B]
+
+	for i in range(dimensions):
+		AB = np.array(A)
+		AB[:,i] = B[:,i]
+		blocks.append(AB)
+
+	return np.concatenate(blocks)
+
+def split_saltelli_output(output, dimensions):
+	'''Split model `output` for Saltelli samples (see ``saltelli_samples()``) into
+	f(A), f(B) (1D arrays) and f(AB) (2D array, one column per parameter).
+	'''
+
+	N = len(output) // (dimensions + 2)
+	blocks = output.reshape(dimensions + 2, N)
+
+	return blocks[0], blocks[1], blocks[2:].T
+
+def sobol_indices(f_A, f_B, f_AB):
+	'''First order and total Sobol indices.
+
+	Parameters
+	----------
+	f_A, f_B : ndarray
+		Model output for sample matrices A and B, sample axis last.
+	f_AB : ndarray
+		Model output for sample matrices AB_i, with sample axis second to last and
+		one entry per parameter along the last axis.
+
+	Returns
+	-------
+	first_order : ndarray
+		First order indices (one per parameter along the last axis).
+	total : ndarray
+		Total indices.
+
+	Notes
+	-----
+	Estimators of Saltelli et al. (2010) for first order indices and of Jansen (1999)
+	for total indices. The variance is estimated from the outputs for A and B. Leading
+	axes (e.g. bootstrap resamples) are broadcast.
+	'''
+
+	variance = np.var(np.concatenate([f_A, f_B], axis = -1), axis = -1)[...,None]
+	difference = f_AB - f_A[...,None]
+
+	with np.errstate(divide = 'ignore', invalid = 'ignore'):
+		first_order = np.mean(f_B[...,None] * difference, axis = -2) / variance
+		total = 0.5 * np.mean(difference**2, axis = -2) / variance
+
+	return first_order, total
+
+def bootstrap_sobol_indices(f_A, f_B, f_AB, resamples, seed, block_size = 64):
+	'''First order and total Sobol indices for `resamples` bootstrap resamples of the
+	base samples (see ``sobol_indices()``).
+
+	Returns
+	-------
+	first_order : ndarray
+		2D array with one row per resample and one column per parameter.
+	total : ndarray
+		2D array with one row per resample and one column per parameter.
+
+	Notes
+	-----
+	Resamples are evaluated in blocks of `block_size`, so that memory use does not
+	scale with the number of resamples.
+	'''
+
+	rng = np.random.default_rng(seed)
+	first_order, total = [], []
+
+	for start in range(0, resamples, block_size):
+		indices = rng.integers(0, len(f_A), size = (min(block_size, resamples - start), len(f_A)))
+		first_block, total_block = sobol_indices(f_A[indices], f_B[indices], f_AB[indices])
+
+		first_order.append(first_block)
+		total.append(total_block)
+
+	return np.concatenate(first_order), np.concatenate(total)
+
+class Global_Sensitivity_Analysis:
+	'''Variance-based global sensitivity analysis (first order and total Sobol indices)
+	of the levelized cost of hydrogen.
+
+	Parameters
+	----------
+	Global_Sensitivity_Analysis > Samples > Value : int
+		Number of base samples N. The discounted cash flow analysis is evaluated for
+		N * (number of parameters + 2) sets of parameter values. Sobol sequences have
+		the best balance properties if N is a power of 2.
+	Global_Sensitivity_Analysis > Workers > Value : int, optional
+		Number of worker processes. Defaults to the number of available CPUs.
+	Global_Sensitivity_Analysis > Seed > Value : int, optional
+		Seed for sampling and bootstrap resampling. If not specified, a random seed
+		is generated.
+	Global_Sensitivity_Analysis > Sampling Method > Value : str, optional
+		Method used to generate base samples: 'sobol' (default), 'halton',
+		'latin hypercube' or 'uniform' (see
+		:func:`~pyH2A.Analysis.Monte_Carlo_Analysis.sample_unit_hypercube`).
+	Global_Sensitivity_Analysis > Bootstrap Samples > Value : int, optional
+		Number of bootstrap resamples used to compute confidence intervals. Defaults
+		to 1000.
+	Global_Sensitivity_Analysis > Confidence Level > Value : float, optional
+		Confidence level of confidence intervals. Defaults to 95%.
+	Global_Sensitivity_Analysis > Output File > Value : str, optional
+		Path to location where the table of Sobol indices (see ``save_results()``)
+		should be saved.
+	Parameters - Global_Sensitivity_Analysis > [...] > Name : str
+		Display name for parameter, e.g. used for plot labels.
+	Parameters - Global_Sensitivity_Analysis > [...] > Type : str
+		Type of parameter values. If `Type` is 'value', provided values are
+		used as is. If `Type` is 'factor', provided values are multiplied
+		with base value of parameter in input file.
+	Parameters - Global_Sensitivity_Analysis > [...] > Values : str
+		Value range for parameter, specified in following format: upper limit; lower
+		limit (order is irrelevant). 'Base' or 'Reference' can be used to retrieve
+		base value of parameter in input file as one of the values. E.g. 'Base; 20%'.
+
+	Returns
+	-------
+	indices : pandas.DataFrame
+		Table with one row per parameter, containing first order ('First Order') and
+		total ('Total') Sobol indices as well as the lower and upper limits of their
+		bootstrap confidence intervals.
+
+	Notes
+	-----
+	`Parameters - Global_Sensitivity_Analysis` contains the parameters which are varied
+	(uniformly within their value range). First column specifies path to parameter in
+	input file (top key > middle key > bottom key format, e.g. Catalyst > Cost per kg ($) > Value).
+
+	The first order index of a parameter is the fraction of the variance of the levelized
+	cost of hydrogen which is caused by the parameter alone. The total index also includes
+	all interactions with other parameters, hence the difference between the two indicates
+	the importance of interactions.
+
+	Indices are estimated using Saltelli sampling: two matrices A and B of base samples
+	are generated from a 2 * (number of parameters) dimensional sequence and for each
+	parameter i, matrix AB_i (A with column i taken from B) is formed (see
+	``sobol_indices()`` for the estimators). Confidence intervals are percentile
+	intervals of bootstrap resamples of the base samples, which do not require
+	additional model evaluations.
+
+	All samples are evaluated with the batched discounted cash flow analysis of
+	``Monte_Carlo_Analysis`` (see :func:`~pyH2A.Analysis.Monte_Carlo_Analysis.h2_cost_calculation`),
+	distributed over a :class:`~pyH2A.Utilities.worker_pool.Worker_Pool` and using an
+	``Incremental_Workflow_Plan``. Parameters which only enter the financial calculations
+	do not require the workflow to be executed again.
+	'''
+
+	def __init__(self, input_file):
+		self.inp = convert_input_to_dictionary(input_file)
+		settings = self.inp['Global_Sensitivity_Analysis']
+
+		self.samples = int(settings['Samples']['Value'])
+		self.workers = settings['Workers']['Value'] if 'Workers' in settings else None
+		self.bootstrap_samples = int(settings['Bootstrap Samples']['Value']) if 'Bootstrap Samples' in settings else 1000
+		self.confidence_level = float(settings['Confidence Level']['Value']) if 'Confidence Level' in settings else 0.95
+
+		if 'Seed' in settings:
+			self.seed = int(settings['Seed']['Value'])
+		else:
+			self.seed = np.random.SeedSequence().entropy
+
+		if 'Sampling Method' in settings:
+			self.sampling_method = sampling_methods[str(settings['Sampling Method']['Value']).strip().lower()]
+		else:
+			self.sampling_method = 'sobol'
+
+		self.process_parameters()
+
+		unit_samples = sample_unit_hypercube(self.sampling_method, self.samples, 2 * len(self.parameters), self.seed)
+		self.values = self.scale_unit_samples(saltelli_samples(unit_samples))
+
+		self.h2_cost = self.perform_h2_cost_calculation(self.values)
+		self.indices = self.calculate_indices(self.h2_cost)
+
+		if 'Output File' in settings:
+			self.save_results(settings['Output File']['Value'])
+
+	def process_parameters(self):
+		'''Parameters are read from `Parameters - Global_Sensitivity_Analysis` and stored
+		in `self.parameters` (keyed by display name), value ranges in `self.values_ranges`.
+		'''
+
+		table = self.inp['Parameters - Global_Sensitivity_Analysis']
+
+		self.values_ranges = np.empty((len(table), 2))
+		self.parameters = {}
+
+		for counter, key in enumerate(table):
+			values_range = parse_parameter_to_array(table[key]['Values'], delimiter = ';',
+													dictionary = self.inp,
+													top_key = 'Parameters - Global_Sensitivity_Analysis',
+													middle_key = key, bottom_key = 'Values',
+													special_values = ['Base', 'Reference'],
+													path = key)
+
+			self.values_ranges[counter] = np.sort(values_range)
+			self.parameters[table[key]['Name']] = {'Parameter': parse_parameter(key), 'Type': table[key]['Type'],
+												   'Values': self.values_ranges[counter], 'Index': counter}
+
+	def scale_unit_samples(self, unit_samples):
+		'''Scale samples from unit hypercube to parameter ranges.
+		'''
+
+		return self.values_ranges[:,0] + (self.values_ranges[:,1] - self.values_ranges[:,0]) * unit_samples
+
+	def calculation_context(self):
+		'''Keyword arguments for ``h2_cost_calculation()``, containing the base input,
+		parameter locations and compiled workflow plan.
+		'''
+
+		parameters = list(self.parameters.values())
+		paths = [parameter['Parameter'] for parameter in parameters]
+
+		return {'inp': self.inp,
+				'idx': [parameter['Index'] for parameter in parameters],
+				'parameters': paths,
+				'value_types': [parameter['Type'] for parameter in parameters],
+				'plan': compile_workflow_plan(self.inp, paths, incremental = True)}
+
+	def perform_h2_cost_calculation(self, values):
+		'''H2 cost for each row of `values`, evaluated in parallel using a ``Worker_Pool``.
+		'''
+
+		with Worker_Pool(h2_cost_calculation, context = self.calculation_context(),
+						 workers = min(self.workers or os.cpu_count(), len(values))) as pool:
+			return pool.map(values)
+
+	def calculate_indices(self, h2_cost):
+		'''Sobol indices and bootstrap confidence intervals for `h2_cost` (model output
+		for Saltelli samples).
+
+		Returns
+		-------
+		indices : pandas.DataFrame
+			Table of Sobol indices (see class documentation).
+		'''
+
+		f_A, f_B, f_AB = split_saltelli_output(h2_cost, len(self.parameters))
+
+		first_order, total = sobol_indices(f_A, f_B, f_AB)
+		first_bootstrap, total_bootstrap = bootstrap_sobol_indices(f_A, f_B, f_AB, self.bootstrap_samples, self.seed)
+
+		percentiles = 50 * (1 - self.confidence_level), 50 * (1 + self.confidence_level)
+		first_lower, first_upper = np.nanpercentile(first_bootstrap, percentiles, axis = 0)
+		total_lower, total_upper = np.nanpercentile(total_bootstrap, percentiles, axis = 0)
+
+		return pd.DataFrame({'First Order': first_order, 'First Order Lower': first_lower,
+							 'First Order Upper': first_upper, 'Total': total,
+							 'Total Lower': total_lower, 'Total Upper': total_upper},
+							index = pd.Index(list(self.parameters), name = 'Parameter'))
+
+	def save_results(self, file_name):
+		'''Save table of Sobol indices to `file_name` (comma separated values).
+		'''
+
+		self.indices.to_csv(file_name)
+
+	def plot_sobol_indices(self, ax = None, figure_lean = True, height = 0.38,
+						   plot_kwargs = {}, **kwargs):
+		'''Bar chart of first order and total Sobol indices with confidence intervals.
+
+		Parameters
+		----------
+		ax : matplotlib.axes, optional
+			Axes object in which plot is drawn. Default is None, creating new plot.
+		figure_lean : bool, optional
+			If figure_lean is True, matplotlib.fig object is returned.
+		height : float, optional
+			Height of bars.
+		plot_kwargs: dict, optional
+			Dictionary containing optional keyword arguments for
+			:func:`~pyH2A.Utilities.output_utilities.Figure_Lean`, has priority over `**kwargs`.
+		**kwargs:
+			Additional `kwargs` passed to
+			:func:`~pyH2A.Utilities.output_utilities.Figure_Lean`
+
+		Returns
+		-------
+		figure : matplotlib.fig or None
+			matplotlib.fig is returned if `figure_lean` is True.
+
+		Notes
+		-----
+		Parameters are sorted by descending total index.
+		'''
+
+		kwargs = {**{'left': 0.35, 'right': 0.95, 'bottom': 0.15, 'top': 0.95,
+				     'fig_width': 6, 'fig_height': 1 + 0.4 * len(self.indices),
+				     'name': 'Global_Sensitivity_Indices'},
+				  **kwargs, **plot_kwargs}
+
+		if ax is None:
+			figure = Figure_Lean(**kwargs)
+			ax = figure.ax
+
+		data = self.indices.sort_values('Total', kind = 'stable')
+		positions = np.arange(len(data))
+
+		for offset, key, color in [(height / 2, 'Total', 'darkred'), (-height / 2, 'First Order', 'darkblue')]:
+			errors = np.abs([data[key] - data[key + ' Lower'], data[key + ' Upper'] - data[key]])
+			ax.barh(positions + offset, data[key], height = height, xerr = errors,
+					color = color, ecolor = 'black', capsize = 2, label = key)
+
+		ax.set_yticks(positions)
+		ax.set_yticklabels(data.index)
+		ax.set_xlabel('Sobol index')
+		ax.legend(loc = 'lower right')
+
+		if figure_lean is True:
+			figure.execute()
+			return figure.fig
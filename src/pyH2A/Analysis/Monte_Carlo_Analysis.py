@@ -1,18 +1,21 @@
-import multiprocessing
-import copy
+import os
+import json
 from pathlib import Path
 from timeit import default_timer as timer
 import numpy as np
 from scipy.signal import savgol_filter
 from scipy.spatial import distance as scipy_distance
 from scipy.stats import norm as normal_distribution
+from scipy.stats import qmc
 import matplotlib.pyplot as plt
 import matplotlib.ticker as mticker
 from matplotlib.transforms import Bbox
 
 import pyH2A.Utilities.find_nearest as fn
 from pyH2A.Utilities.input_modification import convert_input_to_dictionary,parse_parameter, parse_parameter_to_array, get_by_path, set_by_path, read_textfile, file_import, reverse_parameter_to_string
-from pyH2A.Discounted_Cash_Flow import Discounted_Cash_Flow
+from pyH2A.Discounted_Cash_Flow import batch_discounted_cash_flow, compile_workflow_plan
+from pyH2A.Utilities.worker_pool import Worker_Pool, chunk_bounds
+from pyH2A.Utilities.surrogate_model import Polynomial_Chaos_Surrogate
 from pyH2A.Utilities.output_utilities import make_bold, format_scientific, dynamic_value_formatting, insert_image, Figure_Lean
 
 def select_non_reference_value(reference, values):
@@ -22,21 +25,88 @@ def select_non_reference_value(reference, values):
 	idx = np.invert(np.equal(values, reference))
 	return values[idx][0]
 
-def divide_into_batches(array, batch_size):
-	'''Divide provided array into batches of size batch_size for parallel processing'''
+def h2_cost_calculation(values, inp, idx, parameters, value_types, plan = None):
+	'''H2 cost calculation for the sets of parameter values in `values` using
+	``batch_discounted_cash_flow()``. Columns `idx` of `values` are substituted
+	at the locations specified in `parameters`. Used by worker processes.
+	'''
+
+	return batch_discounted_cash_flow(inp, values[:,idx], parameters, 
+									  value_types = value_types, plan = plan)
+
+sampling_methods = {'uniform': 'uniform', 'latin hypercube': 'latin hypercube', 
+					'lhs': 'latin hypercube', 'sobol': 'sobol', 'halton': 'halton'}
+
+def sample_unit_hypercube(method, samples, dimensions, seed):
+	'''Generate samples in `dimensions`-dimensional unit hypercube.
+
+	Parameters
+	----------
+	method : str
+		Sampling method: 'uniform' (independent uniform random numbers), 
+		'latin hypercube', 'sobol' (scrambled Sobol sequence) or 'halton' 
+		(scrambled Halton sequence).
+	samples : int
+		Number of samples.
+	dimensions : int
+		Number of dimensions (parameters).
+	seed : int
+		Seed for random number generator (used for scrambling/permutation in
+		case of quasi-random methods).
 
-	number_of_divisions = np.floor(len(array)/batch_size)
-	idx = int(number_of_divisions * batch_size)
+	Returns
+	-------
+	unit_samples : ndarray
+		2D array of shape (`samples`, `dimensions`) with values in [0, 1).
+
+	Notes
+	-----
+	Quasi-random methods use ``scipy.stats.qmc``. Sobol sequences have the best 
+	balance properties if `samples` is a power of 2.
+	'''
 
-	first_part = array[:idx]
-	second_part = array[idx:]
+	if method == 'uniform':
+		rng = np.random.default_rng(seed)
+		return rng.random((dimensions, samples)).T
 
-	batches = np.split(first_part, number_of_divisions)
+	elif method == 'latin hypercube':
+		engine = qmc.LatinHypercube(dimensions, seed = seed)
+	elif method == 'sobol':
+		engine = qmc.Sobol(dimensions, scramble = True, seed = seed)
+	elif method == 'halton':
+		engine = qmc.Halton(dimensions, scramble = True, seed = seed)
+
+	return engine.random(samples)
+
+def weights_file_name(file_name):
+	'''Name of file containing importance weights belonging to results file `file_name`.
+	'''
+
+	return str(file_name) + '.weights.npy'
+
+def dcf_evaluated_file_name(file_name):
+	'''Name of file containing the mask of samples evaluated with the discounted cash 
+	flow analysis (as opposed to the surrogate model) belonging to results file `file_name`.
+	'''
+
+	return str(file_name) + '.dcf.npy'
+
+def convergence_file_name(file_name):
+	'''Name of file containing convergence trace belonging to results file `file_name`.
+	'''
+
+	return str(file_name) + '.convergence.txt'
+
+def weighted_percentile(data, weights, percentiles):
+	'''Percentiles of `data` with sample `weights` (inverse of weighted empirical
+	cumulative distribution function).
+	'''
 
-	if second_part.size != 0:
-		batches.append(second_part)
+	order = np.argsort(data)
+	cumulative = np.cumsum(weights[order])
+	idx = np.searchsorted(cumulative, np.asarray(percentiles) / 100. * cumulative[-1])
 
-	return batches
+	return data[order][np.minimum(idx, len(data) - 1)]
 
 def normalize_parameter(parameter, base, limit, log_normalize = False):
 	'''Linear of log normalization of parameter (float or array) based on 
@@ -54,8 +124,22 @@ def normalize_parameter(parameter, base, limit, log_normalize = False):
 
 	return scaled
 
+def is_binary_results_file(file_name):
+	'''Check if `file_name` is a binary (.npy) Monte Carlo results file, based on
+	the NumPy magic string at the beginning of the file.
+	'''
+
+	with file_import(str(file_name), mode = 'rb') as file:
+		return file.read(6) == b'\x93NUMPY'
+
+def metadata_file_name(file_name):
+	'''Name of JSON metadata file belonging to binary results file `file_name`.
+	'''
+
+	return str(file_name) + '.json'
+
 def calculate_distance(data, parameters, selection, metric = 'cityblock', log_normalize = False,
-					   sum_distance = False):
+					   sum_distance = False, block_size = 65536):
 	'''
 	Distance of datapoints to reference is calculated using the specified metric.
 
@@ -76,6 +160,9 @@ def calculate_distance(data, parameters, selection, metric = 'cityblock', log_no
 		Flag to control if distance is calculated by simply summing individual 
 		normalized values (equal to cityblock distance but without using absolute values,
 		hence distance can be negative).
+	block_size : int, optional
+		Number of datapoints which are scaled and evaluated at once, limiting the 
+		memory required for large (e.g. memory-mapped) `data`.
 
 	Returns
 	-------
@@ -93,13 +180,8 @@ def calculate_distance(data, parameters, selection, metric = 'cityblock', log_no
 	number_of_parameters = len(selection)
 
 	reference = []
-	data_scaled = np.empty((len(data), number_of_parameters))
 
-	for counter, key in enumerate(selection):
-		idx = parameters[key]['Index']
-		data_scaled[:,counter] = normalize_parameter(data[:,idx], parameters[key]['Reference'],
-													 parameters[key]['Limit'], 
-													 log_normalize = log_normalize)
+	for key in selection:
 		reference.append(normalize_parameter(parameters[key]['Reference'], parameters[key]['Reference'],
 											 parameters[key]['Limit'],
 											 log_normalize = log_normalize))
@@ -107,9 +189,25 @@ def calculate_distance(data, parameters, selection, metric = 'cityblock', log_no
 	reference_scaled = np.array([reference])
 
 	if sum_distance:
-		distances = np.sum(data_scaled, axis = 1)
+		distances = np.empty(len(data))
 	else:
-		distances = scipy_distance.cdist(data_scaled, reference_scaled, metric = metric)
+		distances = np.empty((len(data), 1))
+
+	for start in range(0, len(data), block_size):
+		block = data[start:start + block_size]
+		data_scaled = np.empty((len(block), number_of_parameters))
+
+		for counter, key in enumerate(selection):
+			idx = parameters[key]['Index']
+			data_scaled[:,counter] = normalize_parameter(block[:,idx], parameters[key]['Reference'],
+														 parameters[key]['Limit'], 
+														 log_normalize = log_normalize)
+
+		if sum_distance:
+			distances[start:start + block_size] = np.sum(data_scaled, axis = 1)
+		else:
+			distances[start:start + block_size] = scipy_distance.cdist(data_scaled, reference_scaled, 
+																		metric = metric)
 
 	if metric is 'cityblock':
 		distances = distances / number_of_parameters
@@ -146,6 +244,391 @@ def coordinate_position(x_reference, x_values, y_reference, y_values):
 
 	return xtext, ytext
 
+class Target_Price_Sampler:
+	'''Adaptive importance sampling of the unit hypercube, concentrating samples
+	in regions in which the H2 cost is within the target price range.
+
+	Parameters
+	----------
+	target_price_range : ndarray
+		Lower and upper limit of target price range.
+	seed : int
+		Seed for random number generator.
+
+	Returns
+	-------
+	Target_Price_Sampler : object
+		Sampler object.
+
+	Notes
+	-----
+	The proposal density of each round is a defensive mixture of the uniform density 
+	(fraction `defensive_fraction`) and Gaussian kernels (truncated to the unit hypercube)
+	centered on "elite" samples of the previous rounds. Elite samples are all samples within 
+	the target price range, complemented with the samples closest to it if less than 
+	`minimum_elite` samples are within the range (at most `maximum_centers` elite samples 
+	are used). Kernel bandwidths follow Scott's rule applied to the elite samples.
+
+	Each sample drawn from a proposal density q has the importance weight 1/q (relative 
+	to uniform sampling of the unit hypercube), so that weighted statistics remain unbiased.
+	The defensive fraction ensures that the weights are bounded.
+	'''
+
+	defensive_fraction = 0.1
+	minimum_elite = 10
+	maximum_centers = 256
+	minimum_bandwidth = 0.01
+
+	def __init__(self, target_price_range, seed):
+		self.target_price_range = np.sort(target_price_range)
+		self.seed = seed
+
+	def select_centers(self, unit_values, h2_cost, rng):
+		'''Select elite samples from `unit_values` based on distance of `h2_cost`
+		to target price range.
+		'''
+
+		distance = np.maximum.reduce([self.target_price_range[0] - h2_cost, 
+									  h2_cost - self.target_price_range[1], 
+									  np.zeros(len(h2_cost))])
+
+		number_elite = max(np.count_nonzero(distance == 0), self.minimum_elite, 2 * unit_values.shape[1])
+		number_elite = min(number_elite, len(distance))
+		elite = np.argsort(distance, kind = 'stable')[:number_elite]
+
+		if len(elite) > self.maximum_centers:
+			elite = rng.choice(elite, self.maximum_centers, replace = False)
+
+		return unit_values[elite]
+
+	def bandwidth(self, centers):
+		'''Kernel bandwidth for each dimension (Scott's rule).
+		'''
+
+		dimensions = centers.shape[1]
+		scale = np.std(centers, axis = 0) * len(centers)**(-1. / (dimensions + 4))
+
+		return np.maximum(scale, self.minimum_bandwidth)
+
+	def propose(self, unit_values, h2_cost, samples, round_number):
+		'''Generate samples for next round.
+
+		Parameters
+		----------
+		unit_values : ndarray
+			2D array of previously evaluated samples, scaled to unit hypercube.
+		h2_cost : ndarray
+			H2 cost of previously evaluated samples.
+		samples : int
+			Number of samples to be generated.
+		round_number : int
+			Number of round (used to derive seed of random number generator).
+
+		Returns
+		-------
+		unit_samples : ndarray
+			2D array of generated samples in unit hypercube.
+		weights : ndarray
+			Importance weights of generated samples.
+		'''
+
+		rng = np.random.default_rng([self.seed, round_number])
+
+		centers = self.select_centers(unit_values, h2_cost, rng)
+		bandwidth = self.bandwidth(centers)
+
+		uniform = rng.random(samples) < self.defensive_fraction
+		chosen = centers[rng.integers(len(centers), size = samples)]
+
+		lower = normal_distribution.cdf(-chosen / bandwidth)
+		upper = normal_distribution.cdf((1 - chosen) / bandwidth)
+		quantile = lower + rng.random(chosen.shape) * (upper - lower)
+		kernel_samples = chosen + bandwidth * normal_distribution.ppf(quantile)
+
+		unit_samples = np.where(uniform[:,None], rng.random(chosen.shape), kernel_samples)
+		unit_samples = np.clip(unit_samples, 0, np.nextafter(1, 0))
+
+		weights = 1. / self.density(unit_samples, centers, bandwidth)
+
+		return unit_samples, weights
+
+	def density(self, unit_samples, centers, bandwidth, block_size = 4096):
+		'''Proposal density at `unit_samples` (mixture of uniform density and 
+		truncated Gaussian kernels at `centers`).
+		'''
+
+		normalization = bandwidth * (normal_distribution.cdf((1 - centers) / bandwidth) 
+									 - normal_distribution.cdf(-centers / bandwidth))
+		kernels = np.empty(len(unit_samples))
+
+		for start in range(0, len(unit_samples), block_size):
+			block = unit_samples[start:start + block_size]
+			z = (block[:,None,:] - centers[None,:,:]) / bandwidth
+			kernels[start:start + block_size] = np.mean(np.prod(normal_distribution.pdf(z) / normalization, 
+																axis = 2), axis = 1)
+
+		return self.defensive_fraction + (1 - self.defensive_fraction) * kernels
+
+class Convergence_Monitor:
+	'''Monitoring of Monte Carlo statistics for convergence-based early stopping.
+
+	Parameters
+	----------
+	target_price_range : ndarray
+		Lower and upper limit of target price range.
+	parameters : dict
+		Dictionary containing information on varied parameters (used to calculate
+		development distances).
+	tolerance : float or None
+		Relative tolerance for change of monitored statistics between rounds.
+	time_budget : float or None
+		Wall-clock time budget in seconds.
+
+	Returns
+	-------
+	Convergence_Monitor : object
+		Monitor object.
+
+	Attributes
+	----------
+	trace : list
+		One list of statistics per round (see `columns`).
+	stop_reason : str or None
+		Reason for stopping ('converged' or 'time budget').
+
+	Notes
+	-----
+	Monitored statistics are the (weighted) mean, 5th, 50th and 95th percentile of H2 cost,
+	fraction of samples in target price range and shortest development distance of samples
+	in target price range. Convergence is reached when the relative change of all statistics
+	is below `tolerance` in `required_rounds` consecutive rounds.
+	'''
+
+	columns = ['Samples', 'Time (s)', 'Mean', 'P5', 'P50', 'P95', 'Target Fraction', 'Shortest Distance']
+	required_rounds = 2
+
+	def __init__(self, target_price_range, parameters, tolerance = None, time_budget = None):
+
+		self.target_price_range = np.sort(target_price_range)
+		self.parameters = parameters
+		self.selection = sorted(parameters, key = lambda name: parameters[name]['Input Index'])
+		self.tolerance = tolerance
+		self.time_budget = time_budget
+
+		self.start = timer()
+		self.trace = []
+		self.converged_rounds = 0
+		self.stop_reason = None
+
+	def statistics(self, values, h2_cost, weights):
+		'''Monitored statistics for samples `values` with `h2_cost` and `weights`.
+		'''
+
+		in_range = (h2_cost >= self.target_price_range[0]) & (h2_cost <= self.target_price_range[1])
+
+		if np.any(in_range):
+			distances = calculate_distance(np.c_[values[in_range], h2_cost[in_range]], self.parameters, 
+										   self.selection)
+			shortest_distance = float(np.amin(distances))
+		else:
+			shortest_distance = np.nan
+
+		return [np.sum(weights * h2_cost) / np.sum(weights), 
+				*weighted_percentile(h2_cost, weights, [5, 50, 95]),
+				np.sum(weights[in_range]) / np.sum(weights), shortest_distance]
+
+	def update(self, values, h2_cost, weights):
+		'''Add statistics of all samples evaluated so far to `trace` and check
+		stopping criteria.
+
+		Returns
+		-------
+		stop : bool
+			True if statistics have converged or time budget is used up.
+		'''
+
+		statistics = self.statistics(values, h2_cost, weights)
+
+		if self.trace and self.tolerance is not None:
+			previous = np.array(self.trace[-1][2:])
+			change = np.abs(np.array(statistics) - previous) / np.maximum(np.abs(previous), 1e-12)
+
+			if np.all(change <= self.tolerance):
+				self.converged_rounds += 1
+			else:
+				self.converged_rounds = 0
+
+		self.trace.append([len(h2_cost), timer() - self.start, *statistics])
+
+		if self.converged_rounds >= self.required_rounds:
+			self.stop_reason = 'converged'
+		elif self.time_budget is not None and timer() - self.start >= self.time_budget:
+			self.stop_reason = 'time budget'
+
+		return self.stop_reason is not None
+
+	def save(self, file_name):
+		'''Save convergence trace as tab separated text file.
+		'''
+
+		np.savetxt(Path(file_name), np.array(self.trace), header = '	'.join(self.columns), delimiter = '	')
+
+class Monte_Carlo_Checkpoint:
+	'''Append-only checkpoint file for streaming Monte Carlo results to disk.
+
+	Parameters
+	----------
+	file_name : str
+		Path to checkpoint file.
+	plan : dict
+		Sample plan (number of samples, random number generator seed and parameter
+		specifications), which has to be JSON serializable.
+
+	Returns
+	-------
+	Monte_Carlo_Checkpoint : object
+		Checkpoint object.
+
+	Notes
+	-----
+	The first line of the checkpoint file contains the sample plan in JSON format. 
+	Each following line contains the sample index, parameter values and H2 cost of 
+	one sample evaluated with the discounted cash flow analysis (tab separated). Lines are flushed to disk after each 
+	evaluated chunk of samples, so that an interrupted run can be resumed by only 
+	evaluating the missing samples.
+	'''
+
+	def __init__(self, file_name, plan):
+		self.file_name = file_name
+		self.plan = json.loads(json.dumps(plan))
+		self.file = None
+		self.rows = np.empty((0, 0))
+
+	@staticmethod
+	def read_plan(file_name):
+		'''Read sample plan from checkpoint file `file_name`. Returns None if file
+		does not exist or contains no valid plan.
+		'''
+
+		try:
+			with open(file_name, 'r') as file:
+				return json.loads(file.readline().lstrip('# '))
+		except (OSError, ValueError):
+			return None
+
+	def resume(self, number_of_parameters):
+		'''Read completed samples from existing checkpoint file and open it for
+		appending. 
+
+		Parameters
+		----------
+		number_of_parameters : int
+			Number of parameters per sample.
+
+		Returns
+		-------
+		self.rows : ndarray
+			2D array of completed samples (index, parameter values and H2 cost).
+
+		Notes
+		-----
+		Completed samples are only used if the plan stored in the checkpoint file 
+		is identical to `plan`. Incomplete lines (e.g. due to an interruption during 
+		writing) are discarded. Otherwise, a new checkpoint file is started.
+		'''
+
+		rows = []
+
+		plan = self.read_plan(self.file_name)
+
+		if plan is not None and plan != self.plan:
+			print('Warning: Checkpoint file {0} does not match sample plan, starting new run'.format(self.file_name))
+
+		elif plan is not None:
+			with open(self.file_name, 'r') as file:
+				next(file)
+				for line in file:
+					try:
+						row = np.array(line.split('\t'), dtype = float)
+					except ValueError:
+						continue
+					if line.endswith('\n') and len(row) == number_of_parameters + 2:
+						rows.append(row)
+
+		self.rows = np.array(rows).reshape(-1, number_of_parameters + 2)
+		self.rows = self.rows[np.unique(self.rows[:,0], return_index = True)[1]]
+
+		self.write_header(self.rows)
+
+		return self.rows
+
+	def completed(self, values, offset = 0):
+		'''Completed samples for `values`, whose indices start at `offset`.
+
+		Returns
+		-------
+		indices : ndarray
+			Indices of completed samples (relative to `offset`).
+		h2_cost : ndarray
+			H2 cost of completed samples.
+
+		Notes
+		-----
+		Stored samples are only used if their parameter values are identical to `values`.
+		'''
+
+		idx = self.rows[:,0].astype(int) - offset
+		valid = (idx >= 0) & (idx < len(values))
+		valid[valid] = np.all(self.rows[valid,1:-1] == values[idx[valid]], axis = 1)
+
+		return idx[valid], self.rows[valid,-1]
+
+	def write_header(self, rows):
+		'''Write plan and already completed `rows` to new checkpoint file, which 
+		is then kept open for appending.
+		'''
+
+		temporary_file = self.file_name + '.tmp'
+
+		with open(temporary_file, 'w') as file:
+			file.write('# ' + json.dumps(self.plan) + '\n')
+			for row in rows:
+				file.write(self.format_row(row))
+
+		os.replace(temporary_file, self.file_name)
+		self.file = open(self.file_name, 'a')
+
+	@staticmethod
+	def format_row(row):
+		'''Format `row` as tab separated line (with full float precision).'''
+
+		return '\t'.join(repr(float(value)) for value in row) + '\n'
+
+	def append(self, indices, values, h2_cost):
+		'''Append evaluated samples to checkpoint file and flush it to disk.
+		'''
+
+		for row in np.c_[indices, values, h2_cost]:
+			self.file.write(self.format_row(row))
+
+		self.file.flush()
+		os.fsync(self.file.fileno())
+
+	def close(self):
+		'''Close checkpoint file.'''
+
+		if self.file is not None:
+			self.file.close()
+			self.file = None
+
+	def remove(self):
+		'''Close and delete checkpoint file (after results have been saved).'''
+
+		self.close()
+
+		if os.path.exists(self.file_name):
+			os.remove(self.file_name)
+
 class Monte_Carlo_Analysis:
 	'''Monte Carlo analysis of a techno-economic model.
 
@@ -158,10 +641,50 @@ class Monte_Carlo_Analysis:
 		lower value; higher value (e.g. "1.5: 1.54").
 	Monte_Carlo_Analysis > Output File > Value : str, optional
 		Path to location where output file containing Monte Carlo analysis
-		results should be saved.
+		results should be saved. If the file name ends with ".npy", results are 
+		saved in binary format (see ``save_results()``), otherwise as text file.
 	Monte_Carlo_Analysis > Input File > Value : str, optional
 		Path to location of file containing Monte Carlo analysis results that
-		should be read.
+		should be read (binary or text format, which is detected automatically).
+	Monte_Carlo_Analysis > Workers > Value : int, optional
+		Number of worker processes used for Monte Carlo analysis. Defaults to
+		the number of available CPUs.
+	Monte_Carlo_Analysis > Seed > Value : int, optional
+		Seed for random number generator used to generate samples. If not specified,
+		a random seed is generated (and stored in the checkpoint file).
+	Monte_Carlo_Analysis > Sampling Method > Value : str, optional
+		Method used to generate samples: 'uniform' (default), 'latin hypercube',
+		'sobol' (scrambled Sobol sequence) or 'halton' (scrambled Halton sequence). 
+		Latin hypercube and quasi-random sequences cover the parameter space more 
+		evenly, so that fewer samples are required for the same precision.
+	Monte_Carlo_Analysis > Adaptive Rounds > Value : int, optional
+		If specified, adaptive sampling is used: after an initial exploration round 
+		(using `Sampling Method`), `Adaptive Rounds` further rounds are performed, 
+		in which samples are concentrated in regions with H2 costs in the target 
+		price range (see ``Target_Price_Sampler``). `Samples` are divided evenly 
+		between the rounds.
+	Monte_Carlo_Analysis > Surrogate Training Samples > Value : int, optional
+		If specified, a polynomial chaos surrogate model (see 
+		:class:`~pyH2A.Utilities.surrogate_model.Polynomial_Chaos_Surrogate`) is trained 
+		on `Surrogate Training Samples` discounted cash flow evaluations (latin hypercube 
+		samples) and used to predict the H2 cost of all other samples.
+	Monte_Carlo_Analysis > Convergence Tolerance > Value : float, optional
+		If specified, Monte Carlo analysis is performed in rounds and stopped once the
+		relative change of monitored statistics (see ``Convergence_Monitor``) between 
+		rounds is below `Convergence Tolerance`. `Samples` is then the maximum 
+		number of samples.
+	Monte_Carlo_Analysis > Time Budget (s) > Value : float, optional
+		If specified, Monte Carlo analysis is performed in rounds and stopped once the
+		wall-clock time budget is used up.
+	Monte_Carlo_Analysis > Round Samples > Value : int, optional
+		Number of samples per round if `Convergence Tolerance` or `Time Budget (s)` is 
+		specified. Defaults to 10% of `Samples`. If adaptive sampling is used, the 
+		adaptive rounds are used instead.
+	Monte_Carlo_Analysis > Surrogate Margin ($) > Value : float, optional
+		Samples for which the predicted H2 cost is within the target price range
+		extended by `Surrogate Margin ($)` are evaluated with the discounted cash flow
+		analysis. Defaults to the larger of the maximum validation error and three times
+		the root mean square validation error of the surrogate model.
 	Parameters - Monte_Carlo_Analysis > [...] > Name : str
 		Display name for parameter, e.g. used for axis labels.
 	Parameters - Monte_Carlo_Analysis > [...] > Type : str
@@ -187,6 +710,30 @@ class Monte_Carlo_Analysis:
 	(top key > middle key > bottom key format, e.g. Catalyst > Cost per kg ($) > Value).
 	Order of parameters can be changed, which for example affects the mapping onto different
 	axis in `plot_colored_scatter` (first parameter is on x axis, second on y axis, etc.).
+
+	If adaptive sampling is used, the importance weight of each sample (relative to uniform 
+	sampling) is stored in `self.weights` (otherwise all weights are 1) and saved next to 
+	`Output File` (".weights.npy" suffix). Weighted statistics (e.g. `plot_complete_histogram`)
+	remain unbiased, while the target price region is sampled much more densely.
+
+	If a surrogate model is used, its validation error is printed and stored in 
+	`self.surrogate.validation_error`. Since all samples within (or close to) the target 
+	price range are evaluated with the discounted cash flow analysis, `self.target_price_data`
+	and the development distances are based on actual H2 costs. `self.dcf_evaluated` is a
+	boolean array, which is True for samples evaluated with the discounted cash flow analysis
+	and False for samples whose H2 cost was predicted by the surrogate model. It is saved next 
+	to `Output File` (".dcf.npy" suffix) and its sum is stored in the metadata of binary results.
+	Only samples evaluated with the discounted cash flow analysis are written to the checkpoint
+	file, so that surrogate predictions are never resumed as evaluated samples.
+
+	If `Convergence Tolerance` or `Time Budget (s)` is specified, the statistics of each 
+	round are stored in `self.convergence_trace` and saved next to `Output File` 
+	(".convergence.txt" suffix).
+
+	During Monte Carlo analysis, evaluated samples are streamed to a checkpoint file
+	(`Output File` with `.partial` suffix, see ``Monte_Carlo_Checkpoint``), which is deleted 
+	once `Output File` has been written. If the analysis is interrupted, running it again
+	with the same input resumes it from the checkpoint file, only evaluating the missing samples.
 	'''
 
 	def __init__(self, input_file):
@@ -207,6 +754,14 @@ class Monte_Carlo_Analysis:
 		'''
 
 		self.inp = convert_input_to_dictionary(input_file)
+		self.pool = None
+		self.surrogate = None
+		self.monitor = None
+
+		if 'Workers' in self.inp['Monte_Carlo_Analysis']:
+			self.workers = self.inp['Monte_Carlo_Analysis']['Workers']['Value']
+		else:
+			self.workers = None
 
 		if 'Display Parameters' in self.inp:
 			self.color = self.inp['Display Parameters']['Color']['Value']
@@ -218,9 +773,13 @@ class Monte_Carlo_Analysis:
 		if 'Input File' in self.inp['Monte_Carlo_Analysis']:
 			self.read_results(self.inp['Monte_Carlo_Analysis']['Input File']['Value'])
 		else:
+			output_file = self.inp['Monte_Carlo_Analysis']['Output File']['Value']
+			self.checkpoint_file = str(output_file) + '.partial'
+
 			self.process_parameters()
 			self.perform_full_monte_carlo()
-			self.save_results(self.inp['Monte_Carlo_Analysis']['Output File']['Value'])
+			self.save_results(output_file)
+			self.checkpoint.remove()
 
 		self.check_parameter_integrity(self.results)
 		self.target_price_components()
@@ -239,19 +798,45 @@ class Monte_Carlo_Analysis:
 		either be a number, a path, or a `special_value` such as `Base` or `Reference`. If such a `special_value`
 		is specified, the base value of that parameter is retrieved from `self.inp`.
 		Parameter information is stored in `self.parameters` attribute.
-		Based on the ranges for each parameter, random values (uniform distribution) are generated and stored
-		in the `self.values` attribute.
+		Based on the ranges for each parameter, values are generated using `self.sampling_method` 
+		(see ``sample_unit_hypercube()``) and stored in the `self.values` attribute. The random 
+		number generator is seeded with `self.seed` (see ``get_seed()``).
 		The target price range is read from `self.inp` file and stored in `self.target_price_range` attribute.
 		'''
 
 		monte = self.inp['Parameters - Monte_Carlo_Analysis']
-		samples = self.inp['Monte_Carlo_Analysis']['Samples']['Value']
+		self.samples = self.inp['Monte_Carlo_Analysis']['Samples']['Value']
+
+		if 'Adaptive Rounds' in self.inp['Monte_Carlo_Analysis']:
+			self.adaptive_rounds = int(self.inp['Monte_Carlo_Analysis']['Adaptive Rounds']['Value'])
+		else:
+			self.adaptive_rounds = 0
+
+		self.round_sizes = [len(i) for i in np.array_split(np.arange(self.samples), self.adaptive_rounds + 1)]
+
+		settings = self.inp['Monte_Carlo_Analysis']
+		self.convergence_tolerance = float(settings['Convergence Tolerance']['Value']) if 'Convergence Tolerance' in settings else None
+		self.time_budget = float(settings['Time Budget (s)']['Value']) if 'Time Budget (s)' in settings else None
+
+		if 'Round Samples' in settings:
+			self.round_samples = int(settings['Round Samples']['Value'])
+		else:
+			self.round_samples = max(int(self.samples / 10), 1)
+
+		if 'Surrogate Training Samples' in self.inp['Monte_Carlo_Analysis']:
+			self.surrogate_training_samples = int(self.inp['Monte_Carlo_Analysis']['Surrogate Training Samples']['Value'])
+		else:
+			self.surrogate_training_samples = 0
+		samples = self.round_sizes[0]
 
 		number_parameters = len(monte)
 
-		values = np.empty((samples, number_parameters))
+		self.values_ranges = np.empty((number_parameters, 2))
 		parameters = {}
 
+		self.seed = self.get_seed()
+		self.sampling_method = self.get_sampling_method()
+
 		for counter, key in enumerate(monte):
 			values_range = parse_parameter_to_array(monte[key]['Values'], delimiter = ';', 
 													dictionary = self.inp, 
@@ -261,9 +846,7 @@ class Monte_Carlo_Analysis:
 													path = key)
 
 			values_range = values_range[np.argsort(values_range)]
-			values[:,counter] = np.random.uniform(values_range[0], 
-												  values_range[1], 
-												  samples)
+			self.values_ranges[counter] = values_range
 
 			path = parse_parameter(key)
 			reference = get_by_path(self.inp, path)
@@ -274,12 +857,84 @@ class Monte_Carlo_Analysis:
 											  'Index': counter, 'Input Index': counter,
 											  'Limit': limit}
 	
-		self.values = values
+		self.values = self.scale_unit_samples(sample_unit_hypercube(self.sampling_method, samples, 
+																	number_parameters, self.seed))
 		self.parameters = parameters
 		self.target_price_range = parse_parameter_to_array(self.inp['Monte_Carlo_Analysis']['Target Price Range ($)']['Value'], 
 														   delimiter = ';', 
 														   dictionary = self.inp)
 
+	def scale_unit_samples(self, unit_samples):
+		'''Scale samples from unit hypercube to parameter ranges.
+		'''
+
+		return self.values_ranges[:,0] + (self.values_ranges[:,1] - self.values_ranges[:,0]) * unit_samples
+
+	def unit_samples(self, values):
+		'''Scale parameter `values` to unit hypercube.
+		'''
+
+		return (values - self.values_ranges[:,0]) / (self.values_ranges[:,1] - self.values_ranges[:,0])
+
+	def get_seed(self):
+		'''Seed for random number generator. Read from `Seed` entry of Monte_Carlo_Analysis 
+		table, or from plan of existing checkpoint file (to resume interrupted run). 
+		Otherwise, a new seed is generated.
+		'''
+
+		if 'Seed' in self.inp['Monte_Carlo_Analysis']:
+			return int(self.inp['Monte_Carlo_Analysis']['Seed']['Value'])
+
+		plan = Monte_Carlo_Checkpoint.read_plan(getattr(self, 'checkpoint_file', ''))
+
+		if plan is not None and 'Seed' in plan:
+			return plan['Seed']
+		else:
+			return np.random.SeedSequence().entropy
+
+	def get_sampling_method(self):
+		'''Sampling method read from `Sampling Method` entry of Monte_Carlo_Analysis 
+		table (defaults to 'uniform').
+		'''
+
+		if 'Sampling Method' not in self.inp['Monte_Carlo_Analysis']:
+			return 'uniform'
+
+		method = str(self.inp['Monte_Carlo_Analysis']['Sampling Method']['Value']).strip().lower()
+
+		if method not in sampling_methods:
+			raise KeyError('Sampling Method {0} is not available, choose from: {1}'.format(
+						   method, ', '.join(sampling_methods)))
+
+		return sampling_methods[method]
+
+	def sample_plan(self):
+		'''Sample plan of Monte Carlo analysis, stored in checkpoint file.
+		'''
+
+		return {'Samples': self.samples, 'Seed': self.seed, 
+				'Bit Generator': 'PCG64', 'Sampling': self.sampling_method,
+				'Adaptive Rounds': self.adaptive_rounds,
+				'Surrogate Training Samples': self.surrogate_training_samples,
+				'Convergence Tolerance': self.convergence_tolerance, 'Round Samples': self.round_samples,
+				'Parameters': [[name, parameter['Parameter'], parameter['Type'], list(parameter['Values'])]
+							   for name, parameter in self.parameters.items()]}
+
+	def calculation_context(self):
+		'''Keyword arguments for ``h2_cost_calculation()``, containing the base input,
+		parameter locations and compiled workflow plan (an ``Incremental_Workflow_Plan``,
+		so that only the workflow steps affected by the varied parameters are executed).
+		'''
+
+		parameters = list(self.parameters.values())
+		paths = [parameter['Parameter'] for parameter in parameters]
+
+		return {'inp': self.inp, 
+				'idx': [parameter['Index'] for parameter in parameters],
+				'parameters': paths,
+				'value_types': [parameter['Type'] for parameter in parameters],
+				'plan': compile_workflow_plan(self.inp, paths, incremental = True)}
+
 	def perform_h2_cost_calculation(self, values):
 		'''H2 cost calculation for provided parameter values is performed.
 
@@ -295,32 +950,41 @@ class Monte_Carlo_Analysis:
 
 		Notes
 		-----
-		Performs H2 cost calulation by modifying a copy of self.inp based 
-		on the provided values and `self.parameters`. The modified copy of 
-		`self.inp` is then passed to `Discounted_Cash_Flow()`.
+		Performs H2 cost calulation using ``batch_discounted_cash_flow()``, which
+		substitutes the provided values at the locations specified in `self.parameters`
+		and evaluates all sets of values in one batched discounted cash flow analysis.
 		A parameter value can be either a value replacing the existing one 
 		in self.inp (Type = value) or it can be a factor hich will be multiplied 
 		by the existing value.
 		'''
 
-		parameters = self.parameters
-		h2_cost = []
+		return h2_cost_calculation(values, **self.calculation_context())
 
-		for value_set in values:
-			input_dict = copy.deepcopy(self.inp)
+	def get_worker_pool(self):
+		'''Returns persistent ``Worker_Pool`` of this analysis, which is started on
+		first use. The base input and compiled workflow plan are shipped to the 
+		workers once at startup. The pool is shut down at the end of each analysis
+		step (see ``close_worker_pool()``) and restarted when it is needed again.
+		'''
+
+		if self.pool is None:
+			self.pool = Worker_Pool(h2_cost_calculation, context = self.calculation_context(),
+									workers = self.workers)
 
-			for key, parameter in parameters.items():
-				set_by_path(input_dict, parameter['Parameter'], value_set[parameter['Index']], 
-							value_type = parameter['Type'])
+		return self.pool
 
-			dcf = Discounted_Cash_Flow(input_dict, print_info = False)
-			h2_cost.append(dcf.h2_cost)
+	def close_worker_pool(self):
+		'''Graceful shutdown of worker pool.
+		'''
 
-		return np.asarray(h2_cost)
+		if self.pool is not None:
+			self.pool.close()
+			self.pool = None
 
-	def perform_monte_carlo_multiprocessing(self, values, return_full_array = True):
-		'''Monte Carlo analysis is performed with multiprocessing parallelization across
-		all available CPUs.
+	def perform_monte_carlo_multiprocessing(self, values, return_full_array = True, print_info = False,
+											callback = None):
+		'''Monte Carlo analysis is performed with multiprocessing parallelization using
+		the persistent worker pool (see ``get_worker_pool()``).
 
 		Parameters
 		----------
@@ -330,6 +994,11 @@ class Monte_Carlo_Analysis:
 			If `return_full_array` is True, the full 2D array containing parameter
 			variations and H2 cost is returned. Otherwise, a 1D array containing only
 			H2 cost values is returned.
+		print_info : bool, optional
+			Flag to control if progress (throughput and estimated remaining time)
+			is printed after each evaluated chunk of samples.
+		callback : function, optional
+			Function called after each evaluated chunk of samples, see ``Worker_Pool.map()``.
 
 		Returns
 		-------
@@ -339,13 +1008,7 @@ class Monte_Carlo_Analysis:
 			1D array containing H2 costvalues.
 		'''
 
-		num_cpus = multiprocessing.cpu_count()
-		pool = multiprocessing.Pool(num_cpus)
-
-		value_batches = divide_into_batches(values, np.ceil(len(values)/num_cpus))
-		
-		h2_cost = pool.map(self.perform_h2_cost_calculation, value_batches)
-		h2_cost = np.concatenate(h2_cost)
+		h2_cost = self.get_worker_pool().map(values, print_info = print_info, callback = callback)
 
 		if return_full_array is True:
 			return np.c_[self.values, h2_cost]
@@ -355,21 +1018,299 @@ class Monte_Carlo_Analysis:
 	def perform_full_monte_carlo(self):
 		'''Monte Carlo analysis is performed based on random parameter variations 
 		in `self.values`.
+
+		Notes
+		-----
+		Evaluated samples are streamed to `self.checkpoint_file`. If this file contains 
+		samples from an interrupted run with the same sample plan, only the missing 
+		samples are evaluated.
+
+		If adaptive sampling is used, `self.values` is extended by the samples of 
+		each adaptive round (see ``perform_adaptive_rounds()``). If a surrogate model
+		is used, it is trained first (see ``train_surrogate()``).
+
+		If a convergence tolerance or time budget is specified, statistics are monitored
+		after each round (see ``Convergence_Monitor``) and the analysis is stopped 
+		early once the stopping criteria are met (see ``evaluate_until_converged()``).
 		'''
 
 		start = timer()
 
-		self.results = self.perform_monte_carlo_multiprocessing(self.values)
+		self.checkpoint = Monte_Carlo_Checkpoint(self.checkpoint_file, self.sample_plan())
+		self.checkpoint.resume(self.values.shape[1])
+
+		if self.convergence_tolerance is not None or self.time_budget is not None:
+			self.monitor = Convergence_Monitor(self.target_price_range, self.parameters, 
+											   tolerance = self.convergence_tolerance, 
+											   time_budget = self.time_budget)
+
+		try:
+			if self.surrogate_training_samples > 0:
+				self.train_surrogate()
+
+			if self.monitor is not None and self.adaptive_rounds == 0:
+				h2_cost, self.dcf_evaluated = self.evaluate_until_converged()
+			else:
+				h2_cost, self.dcf_evaluated = self.evaluate_samples(self.values)
+
+			self.weights = np.ones(len(self.values))
+
+			if self.adaptive_rounds > 0 and not self.check_convergence(h2_cost):
+				h2_cost = self.perform_adaptive_rounds(h2_cost)
+
+		finally:
+			self.close_worker_pool()
+			self.checkpoint.close()
+		self.results = np.c_[self.values, h2_cost]
+
+		if self.monitor is not None:
+			self.convergence_trace = np.array(self.monitor.trace)
+			print('Monte Carlo analysis stopped after {0} samples ({1})'.format(
+				  len(self.results), self.monitor.stop_reason or 'maximum number of samples'))
 
 		end = timer()
 		print('Time Monte Carlo Multi:', end - start)
 
+	def evaluate_samples(self, values, offset = 0):
+		'''H2 cost calculation for `values` (whose sample indices start at `offset`),
+		using completed samples from checkpoint file and streaming newly evaluated 
+		samples to it. If a surrogate model is available, it is used for all samples 
+		except those close to the target price range (see ``surrogate_fallback()``).
+
+		Returns
+		-------
+		h2_cost : ndarray
+			H2 cost of each sample.
+		dcf_evaluated : ndarray
+			Boolean array, False for samples whose H2 cost was predicted by the 
+			surrogate model.
+		'''
+
+		completed_idx, completed_h2_cost = self.checkpoint.completed(values, offset = offset)
+
+		h2_cost = np.empty(len(values))
+		h2_cost[completed_idx] = completed_h2_cost
+
+		missing = np.ones(len(values), dtype = bool)
+		missing[completed_idx] = False
+		missing_idx = np.flatnonzero(missing)
+
+		if len(completed_idx) > 0:
+			print('Resuming Monte Carlo analysis from {0}: {1} of {2} samples already evaluated'
+				  .format(self.checkpoint_file, len(completed_idx), len(values)))
+
+		dcf_evaluated = np.ones(len(values), dtype = bool)
+
+		if self.surrogate is not None:
+			h2_cost[missing_idx] = self.surrogate.predict(values[missing_idx])
+			fallback = self.surrogate_fallback(h2_cost[missing_idx])
+
+			dcf_evaluated[missing_idx[~fallback]] = False
+			missing_idx = missing_idx[fallback]
+
+			print('Surrogate model: {0} of {1} samples evaluated with discounted cash flow analysis'
+				  .format(len(missing_idx), len(values)))
+
+		def store_chunk(chunk_start, chunk_stop, chunk_h2_cost):
+			idx = missing_idx[chunk_start:chunk_stop]
+			self.checkpoint.append(idx + offset, values[idx], chunk_h2_cost)
+
+		h2_cost[missing_idx] = self.perform_monte_carlo_multiprocessing(values[missing_idx], 
+																		return_full_array = False,
+																		print_info = True, 
+																		callback = store_chunk)
+
+		return h2_cost, dcf_evaluated
+
+	def check_convergence(self, h2_cost):
+		'''Update convergence monitor (if used) with samples evaluated so far, returns
+		True if Monte Carlo analysis should be stopped.
+		'''
+
+		if self.monitor is None:
+			return False
+
+		weights = getattr(self, 'weights', np.ones(len(h2_cost)))
+
+		return self.monitor.update(self.values[:len(h2_cost)], h2_cost, weights[:len(h2_cost)])
+
+	def evaluate_until_converged(self):
+		'''Evaluation of `self.values` in rounds of `self.round_samples` samples until
+		stopping criteria of convergence monitor are met. `self.values` is truncated to the
+		evaluated samples. Returns H2 cost and mask of samples evaluated with the discounted
+		cash flow analysis (see ``evaluate_samples()``).
+		'''
+
+		h2_cost = np.empty(0)
+		dcf_evaluated = np.empty(0, dtype = bool)
+
+		for start, stop in chunk_bounds(len(self.values), self.round_samples):
+			round_h2_cost, round_dcf_evaluated = self.evaluate_samples(self.values[start:stop], offset = start)
+			h2_cost = np.r_[h2_cost, round_h2_cost]
+			dcf_evaluated = np.r_[dcf_evaluated, round_dcf_evaluated]
+
+			if self.check_convergence(h2_cost):
+				break
+
+		self.values = self.values[:len(h2_cost)]
+
+		return h2_cost, dcf_evaluated
+
+	def train_surrogate(self):
+		'''Training of polynomial chaos surrogate model for H2 cost.
+
+		Returns
+		-------
+		self.surrogate : Polynomial_Chaos_Surrogate
+			Fitted surrogate model.
+		self.surrogate_margin : float
+			Margin around target price range within which discounted cash flow
+			analysis is used instead of surrogate model.
+
+		Notes
+		-----
+		Training samples (latin hypercube) are evaluated with the discounted cash flow
+		analysis. They are streamed to the checkpoint file with indices starting at
+		`self.samples`, so that they are not repeated when an interrupted run is resumed.
+		'''
+
+		unit_samples = sample_unit_hypercube('latin hypercube', self.surrogate_training_samples, 
+											 self.values.shape[1], np.random.default_rng([self.seed, 0]))
+		values = self.scale_unit_samples(unit_samples)
+		h2_cost, _ = self.evaluate_samples(values, offset = self.samples)
+
+		surrogate = Polynomial_Chaos_Surrogate(self.values_ranges[:,0], self.values_ranges[:,1], 
+											   seed = self.seed)
+		self.surrogate = surrogate.fit(values, h2_cost)
+
+		if 'Surrogate Margin ($)' in self.inp['Monte_Carlo_Analysis']:
+			self.surrogate_margin = float(self.inp['Monte_Carlo_Analysis']['Surrogate Margin ($)']['Value'])
+		else:
+			self.surrogate_margin = max(self.surrogate.validation_error['Max'], 
+										3 * self.surrogate.validation_error['RMSE'])
+
+		print('Surrogate model: degree {0}, validation RMSE {1:.3g} $/kg, maximum error {2:.3g} $/kg, margin {3:.3g} $/kg'
+			  .format(self.surrogate.degree, self.surrogate.validation_error['RMSE'], 
+			  		  self.surrogate.validation_error['Max'], self.surrogate_margin))
+
+	def surrogate_fallback(self, h2_cost):
+		'''Boolean array indicating which predicted `h2_cost` values are within the
+		target price range extended by `self.surrogate_margin`.
+		'''
+
+		return ((h2_cost >= np.amin(self.target_price_range) - self.surrogate_margin) & 
+				(h2_cost <= np.amax(self.target_price_range) + self.surrogate_margin))
+
+	def surrogate_information(self):
+		'''Information on surrogate model (None if no surrogate model is used).
+		'''
+
+		if self.surrogate is None:
+			return None
+
+		return {'Training Samples': self.surrogate_training_samples, 'Degree': self.surrogate.degree,
+				'Margin': self.surrogate_margin, **self.surrogate.validation_error}
+
+	def predict_h2_cost(self, values):
+		'''H2 cost for each row of `values`, using the surrogate model (if available)
+		with discounted cash flow analysis for values close to the target price range, 
+		and the discounted cash flow analysis otherwise.
+		'''
+
+		if self.surrogate is None:
+			return self.perform_monte_carlo_multiprocessing(values, return_full_array = False)
+
+		h2_cost = self.surrogate.predict(values)
+		fallback = self.surrogate_fallback(h2_cost)
+
+		if np.any(fallback):
+			h2_cost[fallback] = self.perform_monte_carlo_multiprocessing(values[fallback], 
+																		 return_full_array = False)
+
+		return h2_cost
+
+	def perform_adaptive_rounds(self, h2_cost):
+		'''Adaptive sampling rounds, concentrating samples in regions with H2 costs
+		in target price range.
+
+		Parameters
+		----------
+		h2_cost : ndarray
+			H2 cost of samples in `self.values` (exploration round).
+
+		Returns
+		-------
+		h2_cost : ndarray
+			H2 cost of all samples.
+		self.values : ndarray
+			Parameter values of all samples.
+		self.weights : ndarray
+			Importance weights of all samples.
+		self.dcf_evaluated : ndarray
+			Mask of samples evaluated with the discounted cash flow analysis.
+
+		Notes
+		-----
+		Samples of each round are generated by ``Target_Price_Sampler.propose()`` 
+		based on all previously evaluated samples.
+		'''
+
+		sampler = Target_Price_Sampler(self.target_price_range, self.seed)
+
+		for round_number, samples in enumerate(self.round_sizes[1:], 1):
+			unit_samples, weights = sampler.propose(self.unit_samples(self.values), h2_cost, 
+													samples, round_number)
+			values = self.scale_unit_samples(unit_samples)
+			round_h2_cost, round_dcf_evaluated = self.evaluate_samples(values, offset = len(self.values))
+
+			self.values = np.r_[self.values, values]
+			self.weights = np.r_[self.weights, weights]
+			self.dcf_evaluated = np.r_[self.dcf_evaluated, round_dcf_evaluated]
+			h2_cost = np.r_[h2_cost, round_h2_cost]
+
+			in_range = (round_h2_cost >= self.target_price_range[0]) & (round_h2_cost <= self.target_price_range[1])
+			print('Adaptive round {0}/{1}: {2:.1f}% of samples in target price range'
+				  .format(round_number, self.adaptive_rounds, 100 * np.mean(in_range)))
+
+			if self.check_convergence(h2_cost):
+				break
+
+		return h2_cost
+
 	def save_results(self, file_name):
-		'''Results of Monte Carlo simulation are saved in `file_name` and a 
-		formatted header is added. Contains name, parameter path, type and values range 
-		from `self.parameters`.
+		'''Results of Monte Carlo simulation are saved in `file_name`.
+
+		Notes
+		-----
+		If `file_name` ends with ".npy", results are saved in binary format using
+		``save_binary_results()``. Otherwise, results are saved as text file with
+		a formatted header, which contains name, parameter path, type and values range 
+		from `self.parameters`. Importance weights (if not all 1) are saved in a 
+		separate .npy file (see ``weights_file_name()``), the mask of samples evaluated 
+		with the discounted cash flow analysis (if a surrogate model is used) in a separate 
+		.npy file (see ``dcf_evaluated_file_name()``) and the convergence trace 
+		(if used) in a separate text file (see ``convergence_file_name()``).
 		'''
 
+		if not np.all(self.weights == 1):
+			np.save(weights_file_name(file_name), self.weights)
+		elif os.path.exists(weights_file_name(file_name)):
+			os.remove(weights_file_name(file_name))
+
+		if not np.all(self.dcf_evaluated):
+			np.save(dcf_evaluated_file_name(file_name), self.dcf_evaluated)
+		elif os.path.exists(dcf_evaluated_file_name(file_name)):
+			os.remove(dcf_evaluated_file_name(file_name))
+
+		if self.monitor is not None:
+			self.monitor.save(convergence_file_name(file_name))
+		elif os.path.exists(convergence_file_name(file_name)):
+			os.remove(convergence_file_name(file_name))
+
+		if Path(file_name).suffix == '.npy':
+			self.save_binary_results(file_name)
+			return
+
 		header_string = ''
 		path_string = ''
 		type_string = ''
@@ -386,39 +1327,85 @@ class Monte_Carlo_Analysis:
 
 		np.savetxt(Path(file_name), self.results, header = complete_string, delimiter = '	')
 
-	def read_results(self, file_name):
-		'''Reads Monte Carlo simulation results from `file_name`.
+	def results_metadata(self):
+		'''Metadata of Monte Carlo results, containing sample plan (including name, 
+		parameter path, type, values range and column index of each parameter) and column names.
+		'''
+
+		parameters = [{'Name': name, 'Parameter': list(parameter['Parameter']), 
+					   'Type': parameter['Type'], 
+					   'Values': [float(value) for value in parameter['Values']],
+					   'Index': int(parameter['Index'])} 
+					  for name, parameter in self.parameters.items()]
+
+		columns = [None] * (len(parameters) + 1)
+		for parameter in parameters:
+			columns[parameter['Index']] = parameter['Name']
+		columns[-1] = 'H2 Cost'
+
+		return {'Format': 'pyH2A Monte Carlo results', 'Samples': len(self.results), 
+				'Seed': getattr(self, 'seed', None), 'Bit Generator': 'PCG64', 
+				'Sampling': getattr(self, 'sampling_method', None), 
+				'Adaptive Rounds': getattr(self, 'adaptive_rounds', 0), 
+				'Surrogate': self.surrogate_information(), 
+				'DCF Evaluated Samples': int(np.sum(self.dcf_evaluated)),
+				'Columns': columns, 'Parameters': parameters}
+
+	def save_binary_results(self, file_name):
+		'''Results of Monte Carlo simulation are saved in binary format.
 
 		Parameters
 		----------
 		file_name : str
-			Path to file containing Monte Carlo simulation results.	
+			Path to .npy file.
 
-		Returns
-		-------
-		self.results : ndarray
-			Array containing parameters and H2 cost for each model.
-		self.parameters : dict
-			Dictionary containing information on varied parameters.
-		self.target_price_range : ndarray
-			Selected target price range from `self.inp`.
+		Notes
+		-----
+		`self.results` is saved as .npy file (float64, C order) and metadata 
+		(see ``results_metadata()``) are saved as JSON file next to it (`file_name` 
+		with additional ".json" suffix).
+		'''
+
+		with open(Path(file_name), 'wb') as file:
+			np.save(file, np.ascontiguousarray(self.results, dtype = float))
+
+		with open(metadata_file_name(file_name), 'w') as file:
+			json.dump(self.results_metadata(), file, indent = 1)
+
+	def read_binary_results(self, file_name):
+		'''Reads Monte Carlo results and parameter information from binary results 
+		file `file_name` and its JSON metadata file.
 
 		Notes
 		-----
-		Assumes formatting created by `self.save_results()`function.
-		Header must contain name of parameters, path to parameters in input file, 
-		type of parameter and value range.
-		The header is processed to retrieve these atrribtues and stores them in `self.parameters`.
-		Reference values for each parameter and target price range are read from self.inp
-		The order of parameters is also read from `self.inp` and stored in `self.parameters` 
-		as `Input Index`. If the name of a parameter has been changed in `self.inp` and is 
-		different from the parameter stored in `file_name`, it is checked whether a `File Index`
-		is specified, which allows for mapping of renamed parameter to parameter stored in 
-		`File Index`. If `File Index` is specified, the existing parameter at this position 
-		in `File Index` is renamed to the specified name.
+		Results are opened as read-only memory map (``numpy.load()`` with 
+		``mmap_mode = 'r'``), so that they are only read from disk when they are
+		accessed and so that analyses reading the same file share memory pages.
 		'''
 
-		self.results = read_textfile(file_name, delimiter = '	', mode = 'r')
+		results = np.load(file_import(file_name, mode = 'rb', return_path = True), mmap_mode = 'r')
+
+		with file_import(metadata_file_name(file_name), mode = 'r') as file:
+			metadata = json.load(file)
+
+		parameters = {}
+
+		for parameter in metadata['Parameters']:
+			parameters[parameter['Name']] = {'Index': parameter['Index'], 
+											 'Parameter': parameter['Parameter'],
+											 'Type': parameter['Type'],
+											 'Values': np.array(parameter['Values'], dtype = float)}
+
+		self.seed = metadata.get('Seed')
+
+		return results, parameters
+
+	def read_text_results(self, file_name):
+		'''Reads Monte Carlo results and parameter information from text results
+		file `file_name` (four line header, followed by tab separated results).
+		'''
+
+		results = read_textfile(file_name, delimiter = '	', mode = 'r')
 
 		parameters = {}
 		column_dict = {}
@@ -462,6 +1449,59 @@ class Monte_Carlo_Analysis:
 
 		del parameters['H2 Cost']
 
+		return results, parameters
+
+	def read_results(self, file_name):
+		'''Reads Monte Carlo simulation results from `file_name`.
+
+		Parameters
+		----------
+		file_name : str
+			Path to file containing Monte Carlo simulation results.	
+
+		Returns
+		-------
+		self.results : ndarray
+			Array containing parameters and H2 cost for each model.
+		self.parameters : dict
+			Dictionary containing information on varied parameters.
+		self.target_price_range : ndarray
+			Selected target price range from `self.inp`.
+
+		Notes
+		-----
+		Assumes formatting created by `self.save_results()`function. Binary files
+		(.npy file with JSON metadata file, see ``save_binary_results()``) are detected 
+		automatically, otherwise `file_name` is read as text file, whose
+		header must contain name of parameters, path to parameters in input file, 
+		type of parameter and value range.
+		The header is processed to retrieve these atrribtues and stores them in `self.parameters`.
+		Reference values for each parameter and target price range are read from self.inp
+		The order of parameters is also read from `self.inp` and stored in `self.parameters` 
+		as `Input Index`. If the name of a parameter has been changed in `self.inp` and is 
+		different from the parameter stored in `file_name`, it is checked whether a `File Index`
+		is specified, which allows for mapping of renamed parameter to parameter stored in 
+		`File Index`. If `File Index` is specified, the existing parameter at this position 
+		in `File Index` is renamed to the specified name.
+		'''
+
+		if is_binary_results_file(file_name):
+			self.results, parameters = self.read_binary_results(file_name)
+		else:
+			self.results, parameters = self.read_text_results(file_name)
+
+		try:
+			self.weights = np.load(file_import(weights_file_name(file_name), mode = 'rb', return_path = True), 
+								   mmap_mode = 'r')
+		except FileNotFoundError:
+			self.weights = np.ones(len(self.results))
+
+		try:
+			self.dcf_evaluated = np.load(file_import(dcf_evaluated_file_name(file_name), mode = 'rb', 
+													 return_path = True))
+		except FileNotFoundError:
+			self.dcf_evaluated = np.ones(len(self.results), dtype = bool)
+
 		for key in parameters:
 			parameters[key]['Reference'] = get_by_path(self.inp, parameters[key]['Parameter'])
 			parameters[key]['Limit'] = select_non_reference_value(parameters[key]['Reference'],
@@ -638,9 +1678,9 @@ class Monte_Carlo_Analysis:
 		in `self.target_price_data`.
 		'''
 
-		results_sorted = self.results[np.argsort(self.results[:,-1])]
-		idx = fn.find_nearest(results_sorted[:,-1], self.target_price_range)
-		data = results_sorted[idx[0]:idx[1]]
+		order = np.argsort(self.results[:,-1])
+		idx = fn.find_nearest(self.results[order,-1], self.target_price_range)
+		data = self.results[order[idx[0]:idx[1]]]
 
 		self.target_price_data = data
 
@@ -710,7 +1750,11 @@ class Monte_Carlo_Analysis:
 
 		self.check_parameter_integrity(values)	
 
-		h2_cost = self.perform_monte_carlo_multiprocessing(values, return_full_array = False)
+		try:
+			h2_cost = self.predict_h2_cost(values)
+		finally:
+			self.close_worker_pool()
+
 		h2_cost_2D = np.reshape(h2_cost, (grid_points, grid_points))
 
 		self.target_price_2D_region = {'Grid Values': grid_values, 'H2 Cost 2D': h2_cost_2D}
@@ -768,10 +1812,19 @@ class Monte_Carlo_Analysis:
 
 		Returns
 		-------
-		self.results_distances_sorted : ndarray
-			Sorted array of distances for all datapoints from Monte Carlo Analysis.
+		self.distances_order : ndarray
+			Indices sorting datapoints from Monte Carlo Analysis by distance.
+		self.distances_cost_sorted : ndarray
+			Array of distances and H2 cost for all datapoints from Monte Carlo Analysis,
+			sorted by distance.
 		self.distances_cost_savgol : ndarray
 			Savitzky-Golay filter results.
+
+		Notes
+		-----
+		Only distances and H2 cost are stored, so that `self.results` (which can be 
+		memory-mapped) is not copied. The complete sorted array is available as 
+		`self.results_distances_sorted`.
 		'''
 
 		window_length = int(len(self.results)/reduction_factor)
@@ -784,12 +1837,22 @@ class Monte_Carlo_Analysis:
 									   log_normalize = log_normalize,
 									   sum_distance = sum_distance)
 
-		results_distances = np.c_[self.results, distances]
-		self.results_distances_sorted = results_distances[np.argsort(results_distances[:,-1])]
+		distances = np.ravel(distances)
+		self.distances_order = np.argsort(distances)
+		self.distances_cost_sorted = np.c_[distances[self.distances_order], 
+										   self.results[self.distances_order,-1]]
 
-		smoothed = savgol_filter(self.results_distances_sorted[:,-2], window_length, poly_order)
+		smoothed = savgol_filter(self.distances_cost_sorted[:,1], window_length, poly_order)
 	
-		self.distances_cost_savgol = np.c_[self.results_distances_sorted[:,-1], smoothed]
+		self.distances_cost_savgol = np.c_[self.distances_cost_sorted[:,0], smoothed]
+
+	@property
+	def results_distances_sorted(self):
+		'''Array of all datapoints from Monte Carlo Analysis with distance appended as 
+		last column, sorted by distance (see ``full_distance_cost_relationship()``).
+		'''
+
+		return np.c_[self.results[self.distances_order], self.distances_cost_sorted[:,0]]
 
 	def plot_complete_histogram(self, bins = None, xlim_low = None, xlim_high = None,
 								xlabel_string = 'Levelized $H_{2}$ Cost / \$/kg', 
@@ -841,7 +1904,7 @@ class Monte_Carlo_Analysis:
 		if bins is None:
 			bins = int(len(self.results) / 20)
 
-		ax.hist(self.results[:,-1], bins = bins, density=True, color=self.color, edgecolor = 'black')
+		ax.hist(self.results[:,-1], bins = bins, weights = self.weights, density=True, color=self.color, edgecolor = 'black')
 
 		ax.set_xlabel(xlabel_string)
 		ax.set_ylabel(ylabel_string)
@@ -1190,7 +2253,7 @@ class Monte_Carlo_Analysis:
 			figure = Figure_Lean(**kwargs)
 			ax = figure.ax
 
-		ax.plot(self.results_distances_sorted[:,-1], self.results_distances_sorted[:,-2], '.', 
+		ax.plot(self.distances_cost_sorted[:,0], self.distances_cost_sorted[:,1], '.', 
 				markersize = markersize, color = self.color, alpha = marker_alpha)
 		ax.plot(self.distances_cost_savgol[:,0], self.distances_cost_savgol[:,1], color = self.color, 
 			    label = self.display_name, linewidth = linewidth)
@@ -0,0 +1,271 @@
+import os
+import glob
+import numpy as np
+import pandas as pd
+from pyH2A.Discounted_Cash_Flow import Discounted_Cash_Flow, compile_workflow_plan
+from pyH2A.Plugins.Hourly_Irradiation_Plugin import (import_hourly_data, stacked_solar_geometry, 
+	power_profiles_from_geometry, hourly_irradiation_outputs, irradiance_area_keys)
+from pyH2A.Utilities.input_modification import (convert_input_to_dictionary, parse_parameter, set_by_path, 
+	process_table, apply_changes, Input_Overlay)
+from pyH2A.Utilities.output_utilities import Figure_Lean
+from pyH2A.Utilities.worker_pool import Worker_Pool
+
+file_parameter = ['Hourly Irradiation', 'File', 'Value']
+irradiation_plugin = 'Hourly_Irradiation_Plugin'
+
+tracking_modes = {'No Tracking (kW)': 'no tracking',
+				  'Horizontal Single Axis Tracking (kW)': 'single axis tracking',
+				  'Two Axis Tracking (kW)': 'two axis tracking'}
+
+def insert_site_values(input_dict, values):
+	'''Insert `values` (dictionary of middle key: value) into "Hourly Irradiation"
+	table of `input_dict`, marked as processed (as done by ``insert()``).
+	'''
+
+	for key, value in values.items():
+		input_dict['Hourly Irradiation'][key] = {'Value': value, 'Path': 'None', 'Processed': 'Yes'}
+
+def site_input(inp, file_name):
+	'''Copy-on-write view of `inp` (see ``Input_Overlay``) with irradiation
+	data file set to `file_name`. "Hourly Irradiation" and "Irradiance Area Parameters"
+	are processed and the location of the site is inserted, as done by 
+	``Hourly_Irradiation_Plugin`` before the power profiles are calculated.
+	'''
+
+	input_dict = Input_Overlay(inp)
+	set_by_path(input_dict, file_parameter, file_name)
+	process_table(input_dict, 'Hourly Irradiation', 'Value')
+
+	data, location = import_hourly_data(file_name)
+	insert_site_values(input_dict, {'Latitude': location['Latitude (decimal degrees)'],
+									'Longitude': location['Longitude (decimal degrees)']})
+
+	process_table(input_dict, 'Irradiance Area Parameters', 'Value')
+
+	return input_dict
+
+def site_h2_cost_calculation(values, inp, changes, plan = None):
+	'''H2 cost calculation for the sites whose indices (in `changes`) are stored
+	in the first column of `values`. Used by worker processes.
+	'''
+
+	h2_cost = np.empty(len(values))
+
+	for row, site in enumerate(values[:,0].astype(int)):
+		input_dict = Input_Overlay(inp)
+		apply_changes(input_dict, changes[site])
+
+		dcf = Discounted_Cash_Flow(input_dict, print_info = False, plan = plan)
+		h2_cost[row] = dcf.h2_cost
+
+	return h2_cost
+
+def find_site_files(specification):
+	'''List of irradiation data files for `specification`, which is either a
+	directory (all `.csv` files in it are used, sorted by name) or a list of
+	files separated by ";".
+	'''
+
+	specification = str(specification).strip(' ')
+
+	if os.path.isdir(specification):
+		files = sorted(glob.glob(os.path.join(specification, '*.csv')))
+	else:
+		files = [file for file in parse_parameter(specification, delimiter = ';') if file != '']
+
+	if len(files) == 0:
+		raise ValueError('No irradiation data files found for "{0}"'.format(specification))
+
+	return files
+
+def site_name(file_name):
+	'''Display name of site, i.e. file name without directory and extension.
+	'''
+
+	return os.path.splitext(os.path.basename(file_name.split('~')[-1]))[0]
+
+class Multi_Site_Analysis:
+	'''Levelized cost of hydrogen for the same plant at multiple locations,
+	each described by an hourly irradiation data file.
+
+	Parameters
+	----------
+	Multi_Site_Analysis > Irradiation Files > Value : str
+		Either a directory (all `.csv` files in it are used) or a list of irradiation
+		data files separated by ";". Files have to be in the format read by
+		:func:`~pyH2A.Plugins.Hourly_Irradiation_Plugin.import_hourly_data`.
+	Multi_Site_Analysis > Workers > Value : int, optional
+		Number of worker processes used to evaluate the sites. Defaults to the
+		number of available CPUs.
+	Multi_Site_Analysis > Output File > Value : str, optional
+		Path to location where the results table (see ``save_results()``) should
+		be saved.
+
+	Returns
+	-------
+	results : pandas.DataFrame
+		Table with one row per site, containing file, latitude, longitude, mean
+		solar input for each tracking mode (kWh/m2/day) and levelized cost of hydrogen
+		($/kg), sorted by levelized cost of hydrogen.
+	power_profiles : dict
+		Hourly power profiles per m2 (kW) for each tracking mode (keys are the
+		"Hourly Irradiation" outputs of ``Hourly_Irradiation_Plugin``), stacked
+		to 2D arrays (sites x hours).
+
+	Notes
+	-----
+	The power profiles of all sites are calculated in the current process in one 
+	stacked (sites x hours) evaluation (see 
+	:func:`~pyH2A.Plugins.Hourly_Irradiation_Plugin.power_profiles_from_geometry`),
+	using the irradiance area parameters of the input file.
+
+	For each site, "Hourly Irradiation > File > Value" of the input file is replaced
+	by the site's irradiation data file, the site's outputs of ``Hourly_Irradiation_Plugin``
+	(location and power profiles) are inserted and the discounted cash flow analysis is 
+	performed without ``Hourly_Irradiation_Plugin`` (e.g. ``Photovoltaic_Plugin`` uses
+	the inserted power profile). The workflow plan is compiled once and the sites are 
+	evaluated in parallel using a :class:`~pyH2A.Utilities.worker_pool.Worker_Pool`.
+
+	Irradiation data files are parsed once and stored as binary sidecar files (see
+	:func:`~pyH2A.Plugins.Hourly_Irradiation_Plugin.import_hourly_data`), so that
+	repeated screening runs over the same sites are fast.
+	'''
+
+	def __init__(self, input_file):
+		self.inp = convert_input_to_dictionary(input_file)
+		self.files = find_site_files(self.inp['Multi_Site_Analysis']['Irradiation Files']['Value'])
+		self.sites = [site_name(file) for file in self.files]
+
+		if 'Workers' in self.inp['Multi_Site_Analysis']:
+			self.workers = self.inp['Multi_Site_Analysis']['Workers']['Value']
+		else:
+			self.workers = None
+
+		self.site_inputs = [site_input(self.inp, file) for file in self.files]
+
+		self.locations, self.power_profiles = self.calculate_power_profiles()
+		self.h2_cost = self.perform_multi_site_analysis()
+		self.results = self.results_table()
+
+		if 'Output File' in self.inp['Multi_Site_Analysis']:
+			self.save_results(self.inp['Multi_Site_Analysis']['Output File']['Value'])
+
+	def calculate_power_profiles(self):
+		'''Hourly power profiles of all sites, calculated in one stacked evaluation.
+		The outputs of ``Hourly_Irradiation_Plugin`` are inserted into the input of 
+		each site.
+
+		Returns
+		-------
+		locations : ndarray
+			2D array containing latitude and longitude of each site.
+		power_profiles : dict
+			Power profiles for each tracking mode as 2D arrays (sites x hours).
+		'''
+
+		locations = np.array([[site['Hourly Irradiation']['Latitude']['Value'],
+							   site['Hourly Irradiation']['Longitude']['Value']] for site in self.site_inputs])
+
+		parameters = [np.array([site['Irradiance Area Parameters'][key]['Value'] for site in self.site_inputs],
+							   dtype = float) for key in irradiance_area_keys]
+
+		outputs = hourly_irradiation_outputs(*power_profiles_from_geometry(stacked_solar_geometry(self.files), 
+																		   *parameters))
+
+		for idx, site in enumerate(self.site_inputs):
+			insert_site_values(site, {key: value[idx] for key, value in outputs.items()})
+
+		return locations, {key: outputs[key] for key in tracking_modes}
+
+	def perform_multi_site_analysis(self):
+		'''Levelized cost of hydrogen for each site, evaluated in parallel using
+		a ``Worker_Pool``. ``Hourly_Irradiation_Plugin`` is removed from the workflow, 
+		since its outputs are part of the input of each site.
+		'''
+
+		inp = Input_Overlay(self.inp)
+		if irradiation_plugin in inp['Workflow']:
+			del inp['Workflow'][irradiation_plugin]
+
+		changes = [site.changes() for site in self.site_inputs]
+
+		compile_input = Input_Overlay(inp)
+		apply_changes(compile_input, changes[0])
+		plan = compile_workflow_plan(compile_input, [file_parameter])
+
+		context = {'inp': inp, 'changes': changes, 'plan': plan}
+		sites = np.arange(len(self.files), dtype = float)[:,None]
+
+		with Worker_Pool(site_h2_cost_calculation, context = context,
+						 workers = min(self.workers or os.cpu_count(), len(self.files)),
+						 chunks_per_worker = 1) as pool:
+			return pool.map(sites)
+
+	def results_table(self):
+		'''Table of results with one row per site, sorted by levelized cost of hydrogen.
+		'''
+
+		data = {'File': self.files,
+				'Latitude (decimal degrees)': self.locations[:,0],
+				'Longitude (decimal degrees)': self.locations[:,1]}
+
+		for key, name in tracking_modes.items():
+			data['Mean solar input {0} (kWh/m2/day)'.format(name)] = np.sum(self.power_profiles[key], axis = 1) / 365.
+
+		data['Levelized cost of hydrogen ($/kg)'] = self.h2_cost
+
+		table = pd.DataFrame(data, index = pd.Index(self.sites, name = 'Site'))
+
+		return table.sort_values('Levelized cost of hydrogen ($/kg)', kind = 'stable')
+
+	def save_results(self, file_name):
+		'''Save results table to `file_name` (comma separated values).
+		'''
+
+		self.results.to_csv(file_name)
+
+	def plot_site_comparison(self, ax = None, figure_lean = True, maximum_sites = 30,
+							 plot_kwargs = {}, **kwargs):
+		'''Bar chart of levelized cost of hydrogen for each site.
+
+		Parameters
+		----------
+		ax : matplotlib.axes, optional
+			Axes object in which plot is drawn. Default is None, creating new plot.
+		figure_lean : bool, optional
+			If figure_lean is True, matplotlib.fig object is returned.
+		maximum_sites : int, optional
+			Maximum number of sites (with lowest levelized cost of hydrogen) which
+			are shown.
+		plot_kwargs: dict, optional
+			Dictionary containing optional keyword arguments for
+			:func:`~pyH2A.Utilities.output_utilities.Figure_Lean`, has priority over `**kwargs`.
+		**kwargs:
+			Additional `kwargs` passed to
+			:func:`~pyH2A.Utilities.output_utilities.Figure_Lean`
+
+		Returns
+		-------
+		figure : matplotlib.fig or None
+			matplotlib.fig is returned if `figure_lean` is True.
+		'''
+
+		kwargs = {**{'left': 0.35, 'right': 0.95, 'bottom': 0.15, 'top': 0.95,
+				     'fig_width': 6, 'fig_height': 1 + 0.25 * min(len(self.sites), maximum_sites),
+				     'name': 'Multi_Site_Comparison'},
+				  **kwargs, **plot_kwargs}
+
+		if ax is None:
+			figure = Figure_Lean(**kwargs)
+			ax = figure.ax
+
+		data = self.results['Levelized cost of hydrogen ($/kg)'].iloc[:maximum_sites][::-1]
+
+		ax.barh(np.arange(len(data)), data.values, color = 'darkblue')
+		ax.set_yticks(np.arange(len(data)))
+		ax.set_yticklabels(data.index)
+		ax.set_xlabel('Levelized cost of hydrogen / $ kg$^{-1}$')
+
+		if figure_lean is True:
+			figure.execute()
+			return figure.fig
@@ -1,14 +1,35 @@
+import os
 import copy
 import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
 import matplotlib.patches as patches
-from pyH2A.Discounted_Cash_Flow import Discounted_Cash_Flow
-from pyH2A.Utilities.input_modification import num, convert_input_to_dictionary, parse_parameter, get_by_path, set_by_path
+from pyH2A.Discounted_Cash_Flow import Discounted_Cash_Flow, compile_workflow_plan
+from pyH2A.Utilities.input_modification import num, convert_input_to_dictionary, parse_parameter, get_by_path, set_by_path, Input_Overlay
 from pyH2A.Utilities.output_utilities import make_bold, Figure_Lean, dynamic_value_formatting
+from pyH2A.Utilities.worker_pool import Worker_Pool
 
 import pprint
 
+def sensitivity_h2_cost_calculation(values, inp, points, plan = None):
+	'''H2 cost calculation for the sensitivity points whose indices (in `points`) are
+	stored in the first column of `values`. Each point is a (parameter, value, value type)
+	tuple. Used by worker processes.
+	'''
+
+	h2_cost = np.empty(len(values))
+
+	for row, point in enumerate(values[:,0].astype(int)):
+		parameters, value, value_type = points[point]
+
+		input_dict = Input_Overlay(inp)
+		set_by_path(input_dict, parameters, value, value_type = value_type)
+
+		dcf = Discounted_Cash_Flow(input_dict, print_info = False, plan = plan)
+		h2_cost[row] = dcf.h2_cost
+
+	return h2_cost
+
 class Sensitivity_Analysis:
 	'''Sensitivity analysis for multiple parameters.
 
@@ -25,6 +46,9 @@ class Sensitivity_Analysis:
 		be higher than the base value, the other should be lower.
 		Specified in following format: value A; value B (order is irrelevant).
 		E.g. '0.3; 10'.
+	Sensitivity_Analysis > Workers > Values : int, optional
+		Number of worker processes used to evaluate the sensitivity points (other 
+		columns of this row are left empty). Defaults to the number of available CPUs.
 
 	Notes
 	-----
@@ -32,11 +56,26 @@ class Sensitivity_Analysis:
 	sensitivity analysis. First column specifies path to parameter in input file 
 	(top key > middle key > bottom key format, e.g. Catalyst > Cost per kg ($) > Value).
 	Order of parameters is not relevant.
+
+	Modified inputs are evaluated with an ``Incremental_Workflow_Plan``, i.e. only the 
+	plugins and functions of the workflow which depend on the varied parameter are executed.
+	All parameter/value combinations are evaluated in parallel using a 
+	:class:`~pyH2A.Utilities.worker_pool.Worker_Pool`, to which the base input and 
+	the compiled plan are shipped once per worker.
 	'''
 
 	def __init__(self, input_file):
 		self.inp = convert_input_to_dictionary(input_file)
 		self.base_case = Discounted_Cash_Flow(input_file, print_info = False)
+		self.parameters = [key for key in self.inp['Sensitivity_Analysis'] if '>' in key]
+
+		if 'Workers' in self.inp['Sensitivity_Analysis']:
+			self.workers = int(self.inp['Sensitivity_Analysis']['Workers']['Values'])
+		else:
+			self.workers = None
+
+		self.plan = compile_workflow_plan(self.inp, [parse_parameter(key) for key in self.parameters],
+										  incremental = True)
 		#self.results = self.perform_sensitivity_analysis()
 
 	def perform_sensitivity_analysis(self, format_cutoff = 7):
@@ -49,8 +88,10 @@ class Sensitivity_Analysis:
 		'''
 
 		sensitivity_results = {}
+		points = []
+		labels = []
 
-		for key in self.inp['Sensitivity_Analysis']:
+		for key in self.parameters:
 			parameters = parse_parameter(key)
 			name = self.inp['Sensitivity_Analysis'][key]['Name']
 
@@ -65,14 +106,10 @@ class Sensitivity_Analysis:
 									 delimiter = ';')
 
 			for value in values:
-				input_dict = copy.deepcopy(self.inp)
 				numerical_value = num(value)
 
 				value_type = self.inp['Sensitivity_Analysis'][key]['Type']
 
-				set_by_path(input_dict, parameters, numerical_value, 
-							value_type = value_type)
-
 				if self.inp['Sensitivity_Analysis'][key]['Type'] == 'factor':
 					sensitivity_results[name]['Base'] = '1.0x'
 					shown_value = '{0}x'.format(numerical_value)
@@ -87,13 +124,26 @@ class Sensitivity_Analysis:
 					else:
 						shown_value = dynamic_value_formatting(numerical_value, cutoff = format_cutoff)
 
+				points.append((parameters, numerical_value, value_type))
+				labels.append((name, shown_value))
 
-				dcf = Discounted_Cash_Flow(input_dict, print_info = False)
-
-				sensitivity_results[name]['Values'][shown_value] = dcf.h2_cost
+		for (name, shown_value), h2_cost in zip(labels, self.evaluate_points(points)):
+			sensitivity_results[name]['Values'][shown_value] = h2_cost
 
 		return sensitivity_results
 
+	def evaluate_points(self, points):
+		'''H2 cost for each sensitivity point (parameter, value, value type), evaluated
+		in parallel using a ``Worker_Pool``.
+		'''
+
+		context = {'inp': self.inp, 'points': points, 'plan': self.plan}
+		indices = np.arange(len(points), dtype = float)[:,None]
+
+		with Worker_Pool(sensitivity_h2_cost_calculation, context = context,
+						 workers = min(self.workers or os.cpu_count(), max(len(points), 1))) as pool:
+			return pool.map(indices)
+
 	def sort_h2_cost_values(self, data):
 		'''Sort H2 cost values.
 		'''
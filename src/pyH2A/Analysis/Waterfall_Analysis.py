@@ -1,10 +1,9 @@
-import copy
 import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
 import matplotlib.patches as patches
-from pyH2A.Discounted_Cash_Flow import Discounted_Cash_Flow
-from pyH2A.Utilities.input_modification import convert_input_to_dictionary, parse_parameter, get_by_path, set_by_path
+from pyH2A.Discounted_Cash_Flow import Discounted_Cash_Flow, compile_workflow_plan
+from pyH2A.Utilities.input_modification import convert_input_to_dictionary, parse_parameter, get_by_path, set_by_path, Input_Overlay
 from pyH2A.Utilities.output_utilities import make_bold, Figure_Lean
 
 class Waterfall_Analysis:
@@ -34,11 +33,14 @@ class Waterfall_Analysis:
 	In the order they are provided, each parameter is changed to the provided value. 
 	The relative change of introducing each change is computed,
 	and the new H2 cost (compound result of applying all changes) is calculated.
+	Modified inputs are evaluated with an ``Incremental_Workflow_Plan``.
 	'''
 
 	def __init__(self, input_file):
 		self.inp = convert_input_to_dictionary(input_file)
 		self.base_case = Discounted_Cash_Flow(input_file, print_info = False)
+		self.plan = compile_workflow_plan(self.inp, [parse_parameter(key) for key in self.inp['Waterfall_Analysis']],
+										  incremental = True)
 		self.results = self.perform_waterfall_analysis()
 
 
@@ -74,7 +76,7 @@ class Waterfall_Analysis:
 		running discounted cash flow analysis.
 		'''
 
-		inp_modified = copy.deepcopy(inp)
+		inp_modified = Input_Overlay(inp)
 
 		variable = dic[list(dic)[-1]]['Name']
 		output[variable] = {}
@@ -97,7 +99,7 @@ class Waterfall_Analysis:
 
 			output[variable]['Previous Changes'][name] = shown_value					
 
-		dcf = Discounted_Cash_Flow(inp_modified, print_info = False)
+		dcf = Discounted_Cash_Flow(inp_modified, print_info = False, plan = self.plan)
 
 		output[variable]['Value'] = dcf.h2_cost
 		output[variable]['Shown Value'] = shown_value
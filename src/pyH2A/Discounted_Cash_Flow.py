@@ -1,32 +1,175 @@
-import copy
 import numbers
-from functools import lru_cache
+import hashlib
+import inspect
+import types
+from collections.abc import Mapping
 import numpy as np
 
-from pyH2A.Utilities.input_modification import convert_input_to_dictionary, process_input, process_table, insert, read_textfile, set_by_path, execute_plugin
+from pyH2A.Utilities.input_modification import convert_input_to_dictionary, process_input, process_table, insert, read_textfile, set_by_path, import_plugin, parse_parameter, get_by_path, Input_Overlay, Recording_Overlay, Reference_Graph, compile_cell, compile_path, apply_changes, deleted_entry, scoped_warnings
 import pyH2A.Utilities.find_nearest as fn
+from pyH2A.Utilities.cache_registry import cached, register_cache, freeze
+
+core_financial_keys = ['equity', 'irr', 'interest', 'startup revenues', 'startup cost fixed', 
+					   'startup cost variable', 'decommissioning', 'salvage', 'state tax', 
+					   'federal tax', 'working capital']
+
+structural_financial_keys = ['ref year', 'startup year', 'basis year', 'current year capital costs',
+							 'startup time', 'plant life', 'construction time', 'depreciation length',
+							 'depreciation type', 'debt']
+
+workflow_function_inputs = [['Technical Operating Parameters and Specifications', 'Output per Year at Gate'],
+							['Depreciable Capital Costs', 'Inflated'],
+							['Non-Depreciable Capital Costs', 'Inflated'],
+							['Replacement', 'Total'],
+							['Fixed Operating Costs', 'Total'],
+							['Variable Operating Costs', 'Total']]
+
+def year_axis(years, *arrays):
+	'''Reshape 1D `years` array so that its values run along the first axis and
+	broadcast against the trailing (sample) axes of `arrays`.
+	'''
+
+	ndim = max([np.ndim(array) for array in arrays] + [0])
+
+	return np.reshape(years, (-1,) + (1,) * ndim)
+
+@cached(maxsize = 1024)
+def scalar_discount_factors(rate, horizon):
+	'''Discount factors for a single `rate` and `horizon`.
+	Uses bounded cache for repeated calculations.
+	'''
+
+	factors = 1. / (1. + rate)**np.arange(0, horizon)
+	factors.setflags(write = False)
+
+	return factors
+
+def discount_factors(rate, horizon):
+	'''Discount factors 1/(1+rate)**year for years 0 to `horizon` - 1.
+
+	Parameters
+	----------
+	rate : float or ndarray
+		Discount rate. In batched calculations, an array with one rate per sample.
+	horizon : int
+		Number of years.
+
+	Returns
+	-------
+	factors : ndarray
+		Discount factors with years along the first axis, followed by the axes of `rate`.
+	'''
 
-def numpy_npv(rate, values):
+	if np.ndim(rate) == 0:
+		return scalar_discount_factors(float(rate), int(horizon))
+	else:
+		rate = np.asarray(rate)
+		return 1. / (1. + rate)**year_axis(np.arange(0, horizon), rate)
+
+def numpy_npv(rate, values, factors = None):
 	'''Calculation of net present value.
+
+	Parameters
+	----------
+	rate : float or ndarray
+		Discount rate. In batched calculations, an array with one rate per sample.
+	values : ndarray or list
+		Values by year (first axis), optionally followed by a trailing sample axis.
+	factors : ndarray, optional
+		Precomputed ``discount_factors`` for `rate`, which have to cover at least 
+		as many years as `values`. If None, they are computed.
+
+	Returns
+	-------
+	npv : float or ndarray
+		Net present value, with one value per sample in batched calculations.
 	'''
 
 	values = np.asarray(values)
-	return (values / (1+rate)**np.arange(0, len(values))).sum(axis=0)
 
-@lru_cache(maxsize = None)
-def get_idx(diagonal_number, axis0, axis1):
-	'''Calculation of index for MACRS calculation.
-	Uses ``lru_cache`` for repeated calculations.
+	if factors is None:
+		factors = discount_factors(rate, len(values))
+
+	return np.einsum('y...,y...->...', values, factors[:len(values)])
+
+def numpy_npv_stack(rate, series, factors = None):
+	'''Net present values of several cash flow series, evaluated with a single product.
+
+	Parameters
+	----------
+	rate : float or ndarray
+		Discount rate. In batched calculations, an array with one rate per sample.
+	series : list
+		Cash flow series of equal length (years along first axis), which are 
+		stacked into one matrix. Series are broadcast against each other, so that 
+		scalar-per-year and per-sample series can be mixed.
+	factors : ndarray, optional
+		Precomputed ``discount_factors`` for `rate`. If None, they are computed.
+
+	Returns
+	-------
+	npv : ndarray
+		Net present values, first axis corresponds to `series`, followed by 
+		the sample axis in batched calculations.
+	'''
+
+	values = np.stack(np.broadcast_arrays(*[np.asarray(item, dtype = float) for item in series]))
+
+	if factors is None:
+		factors = discount_factors(rate, values.shape[1])
+
+	return np.einsum('iy...,y...->i...', values, factors[:values.shape[1]])
+
+MACRS_schedules = {}
+
+def MACRS_schedule(depreciation_length):
+	'''Returns MACRS schedule (fraction of depreciable capital charged in each year)
+	for the tabulated depreciation length closest to `depreciation_length`.
+
+	Notes
+	-----
+	The MACRS lookup table is only read once and stored in the module-level 
+	`MACRS_schedules` dictionary, which is keyed by depreciation length.
+	'''
+
+	if not MACRS_schedules:
+		macrs = read_textfile('pyH2A.Lookup_Tables~MACRS.csv', delimiter = '	')
+
+		for idx, length in enumerate(macrs[0][1:]):
+			schedule = macrs[1:,idx+1] / 100.
+			schedule = schedule[schedule != 0]
+			schedule.setflags(write = False)
+			MACRS_schedules[length] = schedule
+
+	lengths = np.array(list(MACRS_schedules))
+	idx = fn.find_nearest(lengths, depreciation_length)[0]
+
+	return MACRS_schedules[lengths[idx]]
+
+@cached(maxsize = 64)
+def MACRS_charge_matrix(years, depreciation_length):
+	'''Matrix which maps depreciable capital by year onto annual MACRS charges.
+
+	Notes
+	-----
+	Entry [i, j] is the fraction of capital spent in year j which is charged in year i,
+	i.e. the matrix form of the convolution of depreciable capital with the MACRS 
+	schedule. Charges which would fall after the last plant year are added to the 
+	last year. Uses bounded cache for repeated calculations.
 	'''
 
-	a = np.arange(0, diagonal_number)
-	b = a[::-1]
-	c = np.c_[a, b]
+	schedule = MACRS_schedule(depreciation_length)
+	columns = np.arange(years)
 
-	idx = c[(c[:,0] <= axis0 - 1) & (c[:,1] <= axis1 - 1)]
-	idx = (np.array(idx[:,0]), np.array(idx[:,1]))
+	convolution = np.zeros((years + len(schedule) - 1, years))
+	for idx, fraction in enumerate(schedule):
+		convolution[columns + idx, columns] = fraction
 
-	return idx
+	matrix = convolution[:years]
+	matrix[-1] += np.sum(convolution[years:], axis = 0)
+	matrix.setflags(write = False)
+
+	return matrix
 
 def MACRS_depreciation(plant_years, depreciation_length, annual_depreciable_capital):
 	'''Calculation of MACRS depreciations.
@@ -38,42 +181,23 @@ def MACRS_depreciation(plant_years, depreciation_length, annual_depreciable_capi
 	depreciation_length : int
 		Depreciation length.
 	annual_depreicable_capital : ndarray
-		Depreciable capital by year.
+		Depreciable capital by year. In batched calculations, a 2D array with
+		years along the first axis and samples along the second axis.
 
 	Returns 
 	-------
 	annual_charge : ndarray
 		Charge by year.
 
+	Notes
+	-----
+	The annual charge is the convolution of depreciable capital with the MACRS
+	schedule, which is computed for all samples at once using ``MACRS_charge_matrix``.
 	'''
 
-	end_idx = len(plant_years)	
-
-	original_macrs = read_textfile('pyH2A.Lookup_Tables~MACRS.csv', delimiter = '	')
-	macrs = np.copy(original_macrs)
-
-	macrs[1:,1:] = macrs[1:,1:]/100.
-	idx_macrs = fn.find_nearest(macrs[0][1:], depreciation_length)[0] 
-	macrs_values = macrs[1:,1:][:,idx_macrs]
-	macrs_values = macrs_values[macrs_values != 0]
-
-	depreciation = np.outer(annual_depreciable_capital, macrs_values)
+	matrix = MACRS_charge_matrix(len(plant_years), depreciation_length)
 
-	charge = []
-	diagonals = sum(depreciation.shape) + 1
-
-	for i in range(1, diagonals):
-		idx = get_idx(i, depreciation.shape[0], depreciation.shape[1])
-
-		diagonal = depreciation[idx]
-		charge.append(np.sum(diagonal))
-
-	charge = np.asarray(charge)
-
-	annual_charge = charge[:end_idx]
-	annual_charge[-1] += np.sum(charge[end_idx:])
-
-	return annual_charge
+	return matrix @ np.asarray(annual_depreciable_capital, dtype = float)
 
 def discounted_cash_flow_function(inp, values, parameters, attribute = 'h2_cost', 
 											plugin = None, plugin_attr = None):
@@ -117,10 +241,11 @@ def discounted_cash_flow_function(inp, values, parameters, attribute = 'h2_cost'
 	if isinstance(inp, str):
 		inp = convert_input_to_dictionary(inp)
 
+	plan = compile_workflow_plan(inp, parameters)
 	results = []
 
 	for value_set in values:
-		input_dict = copy.deepcopy(inp)
+		input_dict = Input_Overlay(inp)
 
 		if isinstance(value_set, numbers.Number):
 			set_by_path(input_dict, parameters, value_set)
@@ -129,7 +254,7 @@ def discounted_cash_flow_function(inp, values, parameters, attribute = 'h2_cost'
 			for value, parameter in zip(value_set, parameters):
 				set_by_path(input_dict, parameter, value)
 
-		dcf = Discounted_Cash_Flow(input_dict, print_info = False)
+		dcf = Discounted_Cash_Flow(input_dict, print_info = False, plan = plan)
 
 		result = getattr(dcf, attribute)
 
@@ -141,6 +266,782 @@ def discounted_cash_flow_function(inp, values, parameters, attribute = 'h2_cost'
 
 	return results
 
+def requires_workflow(inp, parameter):
+	'''Check if changing `parameter` requires the plugins and functions in "Workflow"
+	to be executed again.
+
+	Notes
+	-----
+	Parameters in `core_financial_keys` are only used by the financial calculations
+	of ``Discounted_Cash_Flow``, unless another cell of `inp` refers to them by path.
+	'''
+
+	top_key, middle_key, bottom_key = parameter
+
+	if top_key != 'Financial Input Values' or middle_key not in core_financial_keys or bottom_key != 'Value':
+		return True
+
+	for table in inp.values():
+		for row in table.values():
+			for cell in row.values():
+				if isinstance(cell, str) and '>' in cell:
+					for path in parse_parameter(cell, delimiter = ';'):
+						if parse_parameter(path) == list(parameter):
+							return True
+
+	return False
+
+def compile_workflow_plan(inp, parameters, incremental = False):
+	'''Compile ``Workflow_Plan`` for `inp`, which is shared by all analyses in which
+	`parameters` are varied. Returns None if any of the `parameters` is located in
+	the "Workflow" table. If `incremental` is True, an ``Incremental_Workflow_Plan``
+	is compiled.
+	'''
+
+	if 'Workflow' in np.ravel(np.asarray(parameters, dtype = object)):
+		return None
+	elif incremental is True:
+		return Incremental_Workflow_Plan(inp)
+	else:
+		return Workflow_Plan(inp)
+
+def workflow_record(dcf):
+	'''Retrieve values used by the financial calculations from `dcf.inp` after 
+	execution of the workflow.
+	'''
+
+	record = {}
+
+	for top_key in ['Financial Input Values', 'Construction']:
+		record[top_key] = {key: row['Value'] for key, row in dcf.inp[top_key].items()}
+
+	for top_key, middle_key in workflow_function_inputs:
+		record.setdefault(top_key, {})[middle_key] = dcf.inp[top_key][middle_key]['Value']
+
+	return record
+
+def stack_samples(values):
+	'''Stack per sample values along a trailing sample axis. Yearly arrays are
+	stacked to 2D arrays (years along first axis).
+	'''
+
+	if all(np.ndim(value) == 0 for value in values):
+		return np.asarray(values)
+	else:
+		return np.stack(np.broadcast_arrays(*values), axis = -1)
+
+def batch_discounted_cash_flow(inp, values, parameters, value_types = None, 
+							   contributions = False, plan = None):
+	'''Batched discounted cash flow analysis, calculating H2 cost for many sets of 
+	parameter values at once.
+
+	Parameters
+	----------
+	inp : dict or str
+		Dictionary containing input information. If `inp` is a file path, the provided 
+		file is converted to a dictionary using ``convert_input_to_dictionary``.
+	values : ndarray
+		2D array containing one set of values per row and one column per parameter.
+	parameters : list
+		Parameter specifications (location within inp) for each column of `values`;
+		Format: [top_key, middle_key, bottom_key].
+	value_types : list, optional
+		Type of each parameter, either `value` or `factor` (see ``set_by_path``). 
+		Defaults to `value` for all parameters.
+	contributions : bool, optional
+		Flag to control if cost contributions are returned in addition to H2 cost.
+	plan : Workflow_Plan, optional
+		Compiled workflow plan for `inp`. If None, it is compiled using 
+		``compile_workflow_plan``.
+
+	Returns
+	-------
+	h2_cost : ndarray
+		Levelized H2 cost for each row of `values`.
+	contributions : dict
+		Cost contributions to H2 cost, each entry containing one value per row of `values`.
+		Only returned if `contributions` is True.
+
+	Notes
+	-----
+	The plugins and functions specified in "Workflow" are executed once for each unique
+	combination of those parameter values that affect them (see ``requires_workflow``). 
+	Parameters that only enter the financial calculations (`core_financial_keys`) do 
+	not require the workflow to be executed again.
+	The financial calculations (``pre_workflow``, the functions in "Workflow" and 
+	``post_workflow``) are then performed for all rows of `values` at once by 
+	``Batch_Discounted_Cash_Flow``. Rows which differ in the time structure of the 
+	analysis (`structural_financial_keys`) are evaluated in separate batches.
+	'''
+
+	if isinstance(inp, str):
+		inp = convert_input_to_dictionary(inp)
+
+	values = np.asarray(values)
+
+	if value_types is None:
+		value_types = ['value'] * len(parameters)
+
+	workflow_idx = [idx for idx, parameter in enumerate(parameters) if requires_workflow(inp, parameter)]
+	financial_idx = [idx for idx in range(len(parameters)) if idx not in workflow_idx]
+
+	if len(workflow_idx) > 0:
+		unique_values, inverse = np.unique(values[:,workflow_idx], axis = 0, return_inverse = True)
+		inverse = np.reshape(inverse, -1)
+	else:
+		unique_values = np.empty((1, 0))
+		inverse = np.zeros(len(values), dtype = int)
+
+	if plan is None:
+		plan = compile_workflow_plan(inp, parameters)
+
+	records = []
+
+	for value_set in unique_values:
+		input_dict = Input_Overlay(inp)
+
+		for idx, value in zip(workflow_idx, value_set):
+			set_by_path(input_dict, parameters[idx], value, value_type = value_types[idx])
+
+		dcf = Discounted_Cash_Flow(input_dict, print_info = False, check_processing = False,
+								   run_post_workflow = False, plan = plan)
+		records.append(workflow_record(dcf))
+
+	financial_values = {}
+
+	for idx in financial_idx:
+		key = parameters[idx][1]
+
+		if value_types[idx] == 'factor':
+			base = np.array([records[i]['Financial Input Values'][key] for i in inverse])
+			financial_values[key] = base * values[:,idx]
+		else:
+			financial_values[key] = values[:,idx]
+
+	groups = {}
+
+	for sample, record_idx in enumerate(inverse):
+		fin = records[record_idx]['Financial Input Values']
+		structure = tuple(fin.get(key) for key in structural_financial_keys) + (len(records[record_idx]['Construction']),)
+		groups.setdefault(structure, []).append(sample)
+
+	h2_cost = np.empty(len(values))
+	output_contributions = {'Data': {}}
+
+	for samples in groups.values():
+		sample_records = [records[inverse[sample]] for sample in samples]
+
+		batch_inp = {'Workflow': {key: row for key, row in inp['Workflow'].items() if row['Type'] == 'function'}}
+
+		for top_key, table in sample_records[0].items():
+			batch_inp[top_key] = {}
+
+			for middle_key, value in table.items():
+				if top_key == 'Financial Input Values' and middle_key in structural_financial_keys:
+					stacked = value
+				elif top_key == 'Financial Input Values' and middle_key in financial_values:
+					stacked = financial_values[middle_key][samples]
+				else:
+					stacked = stack_samples([record[top_key][middle_key] for record in sample_records])
+
+				batch_inp[top_key][middle_key] = {'Value': stacked, 'Processed': 'Yes'}
+
+		batch = Batch_Discounted_Cash_Flow(batch_inp, len(samples))
+		h2_cost[samples] = batch.h2_cost
+
+		for key, value in batch.contributions['Data'].items():
+			output_contributions['Data'].setdefault(key, np.empty(len(values)))[samples] = value
+
+	if contributions is True:
+		output_contributions['Total'] = h2_cost
+		output_contributions['Table Group'] = 'Total cost of hydrogen'
+		return h2_cost, output_contributions
+	else:
+		return h2_cost
+
+@cached(maxsize = 256)
+def documented_outputs(target, spaces_cutoff = 5):
+	'''Paths of outputs documented in the "Returns" section of the docstring of 
+	`target` (plugin class or discounted cash flow function).
+	'''
+
+	from pyH2A.Utilities.plugin_input_output_processing import extract_input_output_from_docstring
+
+	if target.__doc__ is None:
+		return ()
+
+	data = extract_input_output_from_docstring(target, spaces_cutoff = spaces_cutoff)
+
+	return tuple(data['Output'])
+
+plugin_output_cache = register_cache('pyH2A.Discounted_Cash_Flow.plugin_output_cache', 
+									 maxsize = 4096, maxbytes = 256 * 2**20)
+
+def value_key(inp, value, visited):
+	'''Hashable key for cell `value` of `inp`. Paths in `value` are followed, so that
+	the key also reflects the values of all (directly or indirectly) referenced cells.
+	Arrays are represented by a digest of their content.
+	'''
+
+	if isinstance(value, np.ndarray):
+		data = np.ascontiguousarray(value)
+		return (value.shape, value.dtype.str, hashlib.blake2b(data.view(np.uint8)).hexdigest())
+
+	elif isinstance(value, str) and '>' in value:
+		return (value,) + tuple(cell_key(inp, compile_path(path), visited) 
+								for path in compile_cell(value))
+
+	elif isinstance(value, (list, dict)):
+		return repr(value)
+
+	else:
+		return value
+
+def cell_key(inp, path, visited):
+	'''Hashable key for cell at `path` (tuple of keys) of `inp`, including the path 
+	column of its row (see ``value_key()``).
+	'''
+
+	if len(path) != 3 or path in visited:
+		return path
+
+	visited.add(path)
+
+	try:
+		row = inp[path[0]][path[1]]
+	except (KeyError, TypeError):
+		return (path, None)
+
+	return (path, value_key(inp, row.get(path[2]), visited), value_key(inp, row.get('Path'), visited))
+
+def dependency_key(inp, dependencies):
+	'''Hashable key for the values of `dependencies` in `inp`.
+
+	Parameters
+	----------
+	inp : dict
+		Input dictionary.
+	dependencies : list
+		List of tables (top key) or cells (top key > middle key > bottom key path).
+
+	Returns
+	-------
+	key : tuple
+		Key which changes if any of the values in `dependencies`, or any of the 
+		values they refer to by path, change.
+	'''
+
+	visited = set()
+	key = []
+
+	for dependency in dependencies:
+		path = compile_path(dependency)
+
+		if len(path) == 1:
+			table = inp.get(path[0], {})
+			key.append((path, tuple(cell_key(inp, (path[0], middle_key, bottom_key), visited) 
+									for middle_key, row in table.items() for bottom_key in row)))
+		else:
+			key.append(cell_key(inp, path, visited))
+
+	return tuple(key)
+
+def execute_memoized_plugin(plugin, dcf):
+	'''Execute `plugin` for `dcf`, reusing the changes of `dcf.inp` performed by a 
+	previous execution with identical dependencies.
+
+	Parameters
+	----------
+	plugin : class
+		Plugin class with `dependencies` attribute, listing the tables and cells
+		(see ``dependency_key()``) its results depend on.
+	dcf : Discounted_Cash_Flow
+		Discounted cash flow object.
+
+	Returns
+	-------
+	plugin_object : object
+		Plugin object, which is shared by all discounted cash flow analyses with
+		identical dependencies.
+	hit : bool
+		True if the results of a previous execution were reused.
+
+	Notes
+	-----
+	During execution, the plugin operates on an ``Input_Overlay`` of `dcf.inp`, which
+	records all changes (processed tables and inserted outputs). These changes are
+	applied to `dcf.inp` and stored in `plugin_output_cache`. Inserted arrays are 
+	read-only.
+	'''
+
+	key = (plugin, dependency_key(dcf.inp, plugin.dependencies))
+	cached_result = plugin_output_cache.get(key)
+
+	if cached_result is not None:
+		plugin_object, changes = cached_result
+
+		try:
+			apply_changes(Input_Overlay(dcf.inp), changes) # changes have to fit structure of dcf.inp
+		except (KeyError, TypeError):
+			pass
+		else:
+			apply_changes(dcf.inp, changes)
+			return plugin_object, True
+
+	inp = dcf.inp
+	dcf.inp = Input_Overlay(inp)
+
+	try:
+		plugin_object = plugin(dcf = dcf, print_info = dcf.print_info)
+		changes = dcf.inp.changes()
+	finally:
+		dcf.inp = inp
+
+	apply_changes(inp, changes)
+
+	size = sum(value.nbytes if isinstance(value, np.ndarray) else 100 for path, value in changes)
+	plugin_output_cache.store(key, freeze((plugin_object, changes)), size = size)
+
+	return plugin_object, False
+
+class Workflow_Plan:
+	'''Compiled plan of the plugins and functions specified in "Workflow", which can be
+	executed for many discounted cash flow analyses.
+
+	Parameters
+	----------
+	inp : dict
+		Dictionary containing "Workflow" table.
+	dcf_class : class, optional
+		Discounted cash flow class whose methods are executed for entries of type 
+		"function". Defaults to ``Discounted_Cash_Flow``.
+
+	Returns
+	-------
+	Workflow_Plan : object
+		Compiled workflow plan.
+
+	Attributes
+	----------
+	steps : list
+		List of (name, type, target) tuples in order of execution. `target` is either the
+		unbound method of `dcf_class` (type "function") or the plugin class (type "plugin").
+	references : Reference_Graph
+		Compiled path references of `inp`.
+	memoization : dict
+		Number of 'Hits' and 'Misses' of each plugin with declared `dependencies`,
+		for which memoization is active (see ``execute_memoized_plugin()``).
+
+	Notes
+	-----
+	Sorting of "Workflow" by "Position", importing of plugins and look-up of functions 
+	is performed once when the plan is compiled. The plan can then be executed for 
+	modified input dictionaries, as long as their "Workflow" table is unchanged.
+
+	Results of plugins which declare their `dependencies` are reused for discounted 
+	cash flow analyses with unchanged dependencies (unless `print_info` is True). If the 
+	first `memoization_probe` executions of such a plugin are all misses (i.e. its
+	dependencies are varied), memoization of the plugin is disabled for this plan.
+
+	Path references in `inp` are compiled into a ``Reference_Graph`` when the plan is 
+	compiled. Invalid paths (paths which are neither present in `inp` nor documented 
+	outputs of the workflow functions and plugins) and circular references are reported
+	once at this stage.
+	'''
+
+	memoization_probe = 64
+
+	def __init__(self, inp, dcf_class = None):
+
+		if dcf_class is None:
+			dcf_class = Discounted_Cash_Flow
+
+		sorted_keys = sorted(inp['Workflow'], key = lambda x: inp['Workflow'][x]['Position'])
+		self.steps = []
+		self.memoization = {}
+
+		outputs = list(documented_outputs(dcf_class.pre_workflow, spaces_cutoff = 9))
+
+		for key in sorted_keys:
+			if inp['Workflow'][key]['Type'] == 'function':
+				self.steps.append((key, 'function', getattr(dcf_class, key)))
+				outputs.extend(documented_outputs(getattr(dcf_class, key), spaces_cutoff = 9))
+			else:
+				self.steps.append((key, 'plugin', import_plugin(key, plugin_module = True)))
+				outputs.extend(documented_outputs(self.steps[-1][2]))
+
+				if hasattr(self.steps[-1][2], 'dependencies'):
+					self.memoization[key] = {'Hits': 0, 'Misses': 0}
+
+		self.references = Reference_Graph(inp, outputs = outputs)
+		self.references.check()
+
+	def execute(self, dcf, npv_dict, plugs_dict):
+		'''Executing compiled plan for `dcf`, storing function outputs in `npv_dict` and
+		plugin objects in `plugs_dict`.
+		'''
+
+		for name, step_type, target in self.steps:
+			self.execute_step(name, step_type, target, dcf, npv_dict, plugs_dict)
+
+	def execute_step(self, name, step_type, target, dcf, npv_dict, plugs_dict):
+		'''Execute single step of plan for `dcf`.
+		'''
+
+		if step_type == 'function':
+			npv_dict[name] = target(dcf)
+		elif name in self.memoization and dcf.print_info is False:
+			plugs_dict[name] = self.execute_memoized(name, target, dcf)
+		else:
+			plugs_dict[name] = target(dcf = dcf, print_info = dcf.print_info)
+
+	def execute_memoized(self, name, plugin, dcf):
+		'''Execute `plugin` using ``execute_memoized_plugin()``, disabling memoization
+		if the first `memoization_probe` executions are all misses.
+		'''
+
+		plugin_object, hit = execute_memoized_plugin(plugin, dcf)
+
+		statistics = self.memoization[name]
+		statistics['Hits' if hit else 'Misses'] += 1
+
+		if statistics['Hits'] == 0 and statistics['Misses'] >= self.memoization_probe:
+			del self.memoization[name]
+
+		return plugin_object
+
+def same_value(value, reference):
+	'''Check if `value` is identical to `reference` (same type and equal value).
+	Values which cannot be compared are considered to differ.
+	'''
+
+	if value is reference:
+		return True
+
+	if type(value) is not type(reference):
+		return False
+
+	if isinstance(value, np.ndarray):
+		return value.shape == reference.shape and value.dtype == reference.dtype and np.array_equal(value, reference)
+
+	if isinstance(value, Mapping):
+		return value.keys() == reference.keys() and all(same_value(value[key], reference[key]) for key in value)
+
+	try:
+		return bool(value == reference)
+	except (ValueError, TypeError):
+		return False
+
+def modified_changes(changes, reference):
+	'''Paths of `changes` (see ``Input_Overlay.changes()``) whose values differ from the 
+	`reference` changes, including paths which are only present in one of them.
+	'''
+
+	reference = dict(reference)
+	paths = {path for path, value in changes if path not in reference or not same_value(value, reference[path])}
+
+	present = {path for path, value in changes}
+	paths.update(path for path in reference if path not in present)
+
+	return paths
+
+def path_prefixes(paths):
+	'''Set of all proper prefixes of `paths` (tuples of keys).
+	'''
+
+	return {path[:end] for path in paths for end in range(1, len(path))}
+
+def affects_reads(paths, reads, prefixes):
+	'''Check if modification of any of `paths` affects an entry in `reads` (paths
+	read by a workflow step, `prefixes` are their proper prefixes, see ``path_prefixes()``).
+	A modified path affects a read path if one of them is a prefix of the other. Iteration
+	over the top level of the input dictionary (empty path) is only affected by tables 
+	which are set or deleted as a whole.
+	'''
+
+	for path in paths:
+		if path in prefixes or (len(path) == 1 and () in reads):
+			return True
+
+		for end in range(1, len(path) + 1):
+			if path[:end] in reads:
+				return True
+
+	return False
+
+class Recording_Cash_Flow:
+	'''Proxy of discounted cash flow object `dcf`, recording the input entries (using
+	a ``Recording_Overlay``) and attributes which are read and written by a workflow step.
+
+	Parameters
+	----------
+	dcf : Discounted_Cash_Flow
+		Discounted cash flow object.
+
+	Attributes
+	----------
+	inp : Recording_Overlay
+		Overlay of `dcf.inp`, whose ``changes()`` are the entries written by the step.
+	fin : Recording_Overlay
+		"Financial Input Values" table of `inp`.
+	reads : set
+		Paths of read entries of `inp`.
+	attribute_reads : set
+		Names of read attributes of `dcf`.
+	attribute_writes : set
+		Names of written attributes of `dcf`.
+
+	Notes
+	-----
+	Methods of `dcf` are bound to the proxy, so that accesses within called methods
+	are recorded as well. Written attributes are set on `dcf`.
+	'''
+
+	def __init__(self, dcf):
+		reads = set()
+		inp = Recording_Overlay(dcf.inp, reads)
+
+		vars(self).update(dcf = dcf, inp = inp, fin = inp['Financial Input Values'], reads = reads,
+						  attribute_reads = set(), attribute_writes = set())
+
+	def __getattr__(self, name):
+		if name.startswith('__'):
+			raise AttributeError(name)
+
+		dcf = vars(self)['dcf']
+		attribute = inspect.getattr_static(type(dcf), name, None)
+
+		if isinstance(attribute, types.FunctionType):
+			return types.MethodType(attribute, self)
+
+		self.attribute_reads.add(name)
+		return getattr(dcf, name)
+
+	def __setattr__(self, name, value):
+		self.attribute_writes.add(name)
+		setattr(self.dcf, name, value)
+
+class Incremental_Workflow_Plan(Workflow_Plan):
+	'''``Workflow_Plan`` which only re-executes those plugins and functions of "Workflow" 
+	that are affected by the modifications of the input dictionary, reusing the outputs 
+	of a reference execution for all other steps.
+
+	Parameters
+	----------
+	inp : dict
+		Base input dictionary. Modified inputs have to be ``Input_Overlay`` objects of 
+		`inp` (e.g. ``Input_Overlay(inp)`` with parameters set by ``set_by_path()``).
+	dcf_class : class, optional
+		Discounted cash flow class. Defaults to ``Discounted_Cash_Flow``.
+
+	Returns
+	-------
+	Incremental_Workflow_Plan : object
+		Compiled workflow plan.
+
+	Attributes
+	----------
+	inp : dict
+		Base input dictionary.
+	stages : list
+		Record of the reference execution for each step, containing the read input paths 
+		('Reads'), the read and written attributes of the discounted cash flow object
+		('Attribute Reads', 'Attribute Values'), the changes of the input dictionary 
+		('Changes', see ``Input_Overlay.changes()``) and the function output or plugin 
+		object ('Output').
+	pre_workflow : dict
+		Input paths read ('Reads') and attributes written ('Attribute Values') by 
+		``pre_workflow()``.
+	statistics : dict
+		Number of incremental evaluations ('Evaluations') as well as executed ('Executed') 
+		and reused ('Reused') steps.
+	incremental : bool
+		False if incremental evaluation has been disabled for this plan.
+
+	Notes
+	-----
+	When the plan is compiled, the workflow is executed once for `inp` and every step is
+	recorded (see ``Recording_Cash_Flow``). Together with the order of the steps, the 
+	recorded reads and writes form the dependency graph of the workflow. 
+
+	For a modified input, the modified paths are determined from the changes of the 
+	``Input_Overlay`` (compared to the reference execution). A step is executed again if 
+	it reads a modified path or an attribute written by a step (or ``pre_workflow()``)
+	which has been executed again, in which case the paths and attributes it writes are 
+	considered modified for all subsequent steps. For all other steps, the recorded changes
+	and attributes are applied to the discounted cash flow object. E.g. if only the 
+	internal rate of return is modified, no plugin has to be executed again.
+
+	Recorded outputs are shared between analyses and are read-only. Re-executed steps
+	are executed as in ``Workflow_Plan`` (including memoization of plugins). Inputs which 
+	are not overlays of `inp` and analyses with `print_info` set to True are executed 
+	using ``Workflow_Plan.execute()``. If less than `minimum_reuse` of the steps are reused
+	during the first `incremental_probe` evaluations (i.e. the varied parameters affect
+	almost all steps), incremental evaluation is disabled for this plan.
+	'''
+
+	incremental_probe = 32
+	minimum_reuse = 0.25
+
+	def __init__(self, inp, dcf_class = None):
+
+		if dcf_class is None:
+			dcf_class = Discounted_Cash_Flow
+
+		super().__init__(inp, dcf_class = dcf_class)
+
+		self.inp = inp
+		self.stages = None
+		self.incremental = True
+		self.statistics = {'Evaluations': 0, 'Executed': 0, 'Reused': 0}
+
+		dcf_class(Input_Overlay(inp), print_info = False, check_processing = False,
+				  run_post_workflow = False, plan = self)
+
+	def execute(self, dcf, npv_dict, plugs_dict):
+		'''Executing plan for `dcf`, only executing steps which are affected by the 
+		modifications of `dcf.inp`.
+		'''
+
+		if (self.incremental is False or dcf.print_info is True or 
+			not isinstance(dcf.inp, Input_Overlay) or dcf.inp.base is not self.inp):
+			return super().execute(dcf, npv_dict, plugs_dict)
+
+		if self.stages is None:
+			return self.record(dcf, npv_dict, plugs_dict)
+
+		paths = self.modified_paths(dcf.inp)
+		attributes = set()
+
+		if affects_reads(paths, self.pre_workflow['Reads'], self.pre_workflow['Read Prefixes']):
+			attributes.update(attribute for attribute, value in self.pre_workflow['Attribute Values'].items()
+							  if not same_value(getattr(dcf, attribute), value))
+
+		for (name, step_type, target), stage in zip(self.steps, self.stages):
+			if (affects_reads(paths, stage['Reads'], stage['Read Prefixes']) or 
+				not attributes.isdisjoint(stage['Attribute Reads'])):
+				changes, written = self.execute_captured(name, step_type, target, dcf, npv_dict, plugs_dict)
+
+				paths.update(modified_changes(changes, stage['Changes']))
+				attributes.update(written.symmetric_difference(stage['Attribute Values']))
+				attributes.update(attribute for attribute in written.intersection(stage['Attribute Values'])
+								  if not same_value(getattr(dcf, attribute), stage['Attribute Values'][attribute]))
+
+				self.statistics['Executed'] += 1
+
+			else:
+				apply_changes(dcf.inp, stage['Changes'])
+
+				for attribute, value in stage['Attribute Values'].items():
+					setattr(dcf, attribute, value)
+
+				if step_type == 'function':
+					npv_dict[name] = stage['Output']
+				else:
+					plugs_dict[name] = stage['Output']
+
+				self.statistics['Reused'] += 1
+
+		self.statistics['Evaluations'] += 1
+
+		if (self.statistics['Evaluations'] == self.incremental_probe and 
+			self.statistics['Reused'] < self.minimum_reuse * (self.statistics['Executed'] + self.statistics['Reused'])):
+			self.incremental = False
+
+	def record(self, dcf, npv_dict, plugs_dict):
+		'''Reference execution of plan for `dcf`, recording ``pre_workflow()`` and each 
+		step (see ``record_step()``).
+		'''
+
+		self.initial_changes = dict(freeze(dcf.inp.changes()))
+
+		proxy = Recording_Cash_Flow(dcf)
+		type(dcf).pre_workflow(proxy)
+
+		self.pre_workflow = {'Reads': proxy.reads, 'Read Prefixes': path_prefixes(proxy.reads),
+							 'Attribute Values': freeze({attribute: getattr(dcf, attribute) 
+														 for attribute in proxy.attribute_writes})}
+
+		stages = []
+
+		for name, step_type, target in self.steps:
+			record = freeze(self.record_step(name, step_type, target, dcf, npv_dict, plugs_dict))
+			record['Read Prefixes'] = path_prefixes(record['Reads'])
+			stages.append(record)
+
+		self.stages = stages
+
+	def record_step(self, name, step_type, target, dcf, npv_dict, plugs_dict):
+		'''Execute single step for `dcf` using a ``Recording_Cash_Flow`` proxy, applying
+		the changes of the input dictionary to `dcf.inp`.
+
+		Returns
+		-------
+		record : dict
+			Record of step (see `stages`).
+		'''
+
+		proxy = Recording_Cash_Flow(dcf)
+
+		if step_type == 'function':
+			output = npv_dict[name] = target(proxy)
+		else:
+			output = plugs_dict[name] = target(dcf = proxy, print_info = False)
+
+		changes = proxy.inp.changes()
+		apply_changes(dcf.inp, changes)
+
+		return {'Reads': proxy.reads, 'Attribute Reads': proxy.attribute_reads,
+				'Attribute Values': {attribute: getattr(dcf, attribute) for attribute in proxy.attribute_writes},
+				'Changes': changes, 'Output': output}
+
+	def execute_captured(self, name, step_type, target, dcf, npv_dict, plugs_dict):
+		'''Execute single step for `dcf` (see ``Workflow_Plan.execute_step()``), capturing
+		the changes of the input dictionary using an ``Input_Overlay``.
+
+		Returns
+		-------
+		changes : list
+			Changes of `dcf.inp` (see ``Input_Overlay.changes()``).
+		written : set
+			Names of attributes of `dcf` which have been set to new objects.
+		'''
+
+		inp, fin = dcf.inp, dcf.fin
+		attributes = dict(vars(dcf))
+
+		dcf.inp = Input_Overlay(inp)
+		dcf.fin = dcf.inp['Financial Input Values']
+
+		try:
+			self.execute_step(name, step_type, target, dcf, npv_dict, plugs_dict)
+			changes = dcf.inp.changes()
+		finally:
+			dcf.inp, dcf.fin = inp, fin
+
+		apply_changes(inp, changes)
+
+		return changes, {attribute for attribute, value in vars(dcf).items() 
+						 if attributes.get(attribute, deleted_entry) is not value}
+
+	def modified_paths(self, inp):
+		'''Paths of entries of `inp` (``Input_Overlay`` of `self.inp`) which differ from
+		the reference execution before the workflow is executed.
+		'''
+
+		changes = inp.changes()
+		paths = modified_changes(changes, self.initial_changes.items())
+
+		for path, value in changes:
+			if path in paths and path not in self.initial_changes:
+				try:
+					if same_value(value, get_by_path(self.inp, path)):
+						paths.discard(path)
+				except (KeyError, TypeError):
+					pass
+
+		return paths
+
 class Discounted_Cash_Flow:
 	'''Class to perform discounted cash flow analysis.
 
@@ -154,6 +1055,14 @@ class Discounted_Cash_Flow:
 		Boolean flag to control if `check_processing` is run at the end of discounted 
 		cash flow analysis, which checks if all tables in input file have been processed
 		during run.
+	run_post_workflow : bool, optional
+		Boolean flag to control if `post_workflow` is run. If `False`, only the plugins
+		and functions specified in "Workflow" are executed and `h2_cost` is not calculated
+		(used by ``batch_discounted_cash_flow`` to retrieve workflow outputs).
+	plan : Workflow_Plan, optional
+		Compiled workflow plan, which is executed instead of compiling the "Workflow"
+		table of the input. Has to be compiled from an input with an identical
+		"Workflow" table.
 
 	Returns
 	-------
@@ -168,6 +1077,12 @@ class Discounted_Cash_Flow:
 		Cost contributions to H2 price.
 	plugs : dict 
 		Dictionary containing plugin class objects used during analysis.
+	sample_shape : tuple
+		Shape of trailing sample axes of yearly arrays. Empty for a single
+		discounted cash flow analysis, see ``Batch_Discounted_Cash_Flow``.
+	discount_vectors : dict
+		Discount factors for the rates used in the analysis, computed once per run 
+		(see ``npv``).
 
 	Notes
 	-----
@@ -185,7 +1100,8 @@ class Discounted_Cash_Flow:
 	"---" is used on its own line to seperate table headers from table entries.
 
 	Paths to locations in the input file/in self.inp are specified using ">". Paths are always composed
-	of three levels: top key > middle key > bottom key.
+	of three levels: top key > middle key > bottom key. Warnings for invalid paths are printed once per 
+	input, i.e. once for all analyses sharing the same compiled `plan`.
 
 	File name paths are specified using "/".
 
@@ -227,7 +1143,10 @@ class Discounted_Cash_Flow:
 	of the "insert()" function to modify the discounted cash flow object's "inp" dictionary (self.inp).
 	'''
 
-	def __init__(self, input_file, print_info = True, check_processing = True):
+	sample_shape = ()
+
+	def __init__(self, input_file, print_info = True, check_processing = True, 
+				 run_post_workflow = True, plan = None):
 
 		if isinstance(input_file, str):
 			self.inp = convert_input_to_dictionary(input_file)
@@ -236,18 +1155,26 @@ class Discounted_Cash_Flow:
 
 		self.print_info = print_info
 
-		process_table(self.inp, 'Financial Input Values', 'Value')
-		self.fin = self.inp['Financial Input Values']
+		printed_warnings = plan.references.printed_warnings if plan is not None else set()
 
-		self.npv_dict = {}	
-		self.plugs = {}
+		with scoped_warnings(printed_warnings):
+			process_table(self.inp, 'Financial Input Values', 'Value')
+			self.fin = self.inp['Financial Input Values']
 
-		self.pre_workflow()
-		self.workflow(self.inp, self.npv_dict, self.plugs)  # execution of all functions and plugins specified in "Workflow"
-		self.post_workflow()
+			self.npv_dict = {}	
+			self.plugs = {}
+			self.discount_vectors = {}
 
-		if check_processing is True:
-			self.check_processing()
+			self.pre_workflow()
+			self.workflow(self.inp, self.npv_dict, self.plugs, plan = plan)  # execution of all functions and plugins specified in "Workflow"
+
+			if run_post_workflow is False:
+				return
+
+			self.post_workflow()
+
+			if check_processing is True:
+				self.check_processing()
 
 	def pre_workflow(self):
 		'''Functions executed before workflow.
@@ -305,17 +1232,18 @@ class Discounted_Cash_Flow:
 		self.time()
 		self.inflation()
 
-	def workflow(self, inp, npv_dict, plugs_dict):
+	def workflow(self, inp, npv_dict, plugs_dict, plan = None):
 		'''Executing plugins and functions for discounted cash flow.
+
+		Notes
+		-----
+		If no compiled `plan` is provided, a ``Workflow_Plan`` is generated from `inp`.
 		'''
 
-		sorted_keys = sorted(inp['Workflow'], key = lambda x: inp['Workflow'][x]['Position'])
+		if plan is None:
+			plan = Workflow_Plan(inp, dcf_class = type(self))
 
-		for key in sorted_keys:
-			if inp['Workflow'][key]['Type'] == 'function':
-				self.execute_function(key, npv_dict)
-			else:
-				execute_plugin(key, plugs_dict, print_info = self.print_info, dcf = self)
+		plan.execute(self, npv_dict, plugs_dict)
 
 	def post_workflow(self):
 		'''Functions executed after workflow.
@@ -385,7 +1313,7 @@ class Discounted_Cash_Flow:
 		'''
 
 		inflation_rate = 1 + self.fin['inflation']['Value']
-		self.inflation_factor = inflation_rate ** self.plant_years
+		self.inflation_factor = inflation_rate ** year_axis(self.plant_years, inflation_rate)
 		self.inflation_correction = inflation_rate ** (self.fin['startup year']['Value'] - 
 			      									   self.fin['ref year']['Value'])
 
@@ -452,14 +1380,14 @@ class Discounted_Cash_Flow:
 			cost = self.inp['Construction'][key]['Value'] * self.fin['equity']['Value'] * self.depreciable_capital_inflation * self.inflation_factor[counter]
 			construction_years.append(cost)
 
-		self.initial_depreciable_capital = np.sum(construction_years)
+		self.initial_depreciable_capital = np.sum(construction_years, axis = 0)
 
-		self.annual_initial_depreciable_capital = np.zeros(len(self.inflation_factor))
+		self.annual_initial_depreciable_capital = self.zeros_by_year()
 		self.annual_initial_depreciable_capital[:self.fin['construction time']['Value']] = construction_years
 
 		self.after_tax_nominal_irr = (1 + self.fin['irr']['Value']) * (1 + self.fin['inflation']['Value']) - 1
 
-		return numpy_npv(self.after_tax_nominal_irr, construction_years)
+		return self.npv(construction_years)
 
 	def non_depreciable_capital_costs(self):
 		'''Calculate non-depreciable capital costs.
@@ -474,7 +1402,7 @@ class Discounted_Cash_Flow:
 		self.non_depreciable_capital_inflated = self.non_depreciable_capital * self.inflation_correction
 		non_depreciable_capital_inflation_corrected = self.non_depreciable_capital_inflated * self.inflation_factor[0]
 
-		self.annual_non_depreciable_capital = np.zeros(len(self.inflation_factor))
+		self.annual_non_depreciable_capital = self.zeros_by_year()
 		self.annual_non_depreciable_capital[0] = non_depreciable_capital_inflation_corrected
 
 		return non_depreciable_capital_inflation_corrected
@@ -488,13 +1416,14 @@ class Discounted_Cash_Flow:
 			Total replacement costs.
 		'''
 	
-		yearly_costs = self.inp['Replacement']['Total']['Value']
+		yearly_costs = np.array(self.inp['Replacement']['Total']['Value']) # copy, since inserted arrays may be shared
 
 		self.start_idx = fn.find_nearest(self.plant_years, 0)[0]
 		yearly_costs[:self.start_idx] = 0
+		self.inp['Replacement']['Total']['Value'] = yearly_costs
 		self.annual_replacement_costs = yearly_costs	
 
-		return numpy_npv(self.after_tax_nominal_irr, yearly_costs)
+		return self.npv(yearly_costs)
 
 	def fixed_operating_costs(self):
 		'''Calculate fixed operating costs.
@@ -520,7 +1449,7 @@ class Discounted_Cash_Flow:
 
 		self.fixed_operating_costs = yearly_costs
 
-		return numpy_npv(self.after_tax_nominal_irr, yearly_costs)
+		return self.npv(yearly_costs)
 
 	def variable_operating_costs(self):
 		'''Calculate variable operating costs.
@@ -539,7 +1468,7 @@ class Discounted_Cash_Flow:
 
 		self.variable_operating_costs = variable_operating_costs
 
-		return numpy_npv(self.after_tax_nominal_irr, variable_operating_costs)
+		return self.npv(variable_operating_costs)
 
 	def salvage_decommissioning(self):
 		'''Calculate salvage and decomissioning costs.
@@ -550,13 +1479,13 @@ class Discounted_Cash_Flow:
 		decommissioning = self.depreciable_capital_inflation * self.fin['decommissioning']['Value']
 		salvage = self.total_capital_inflated * self.fin['salvage']['Value']
 
-		self.decommissioning_costs = np.zeros(len(self.plant_years))
+		self.decommissioning_costs = self.zeros_by_year()
 		self.decommissioning_costs[-1] = decommissioning * self.inflation_factor[-1]
 
-		self.salvage_income = np.zeros(len(self.plant_years))
+		self.salvage_income = self.zeros_by_year()
 		self.salvage_income[-1] = salvage * self.inflation_factor[-1]
 
-		return numpy_npv(self.after_tax_nominal_irr, self.salvage_income), numpy_npv(self.after_tax_nominal_irr, self.decommissioning_costs)
+		return tuple(self.npv(self.salvage_income, self.decommissioning_costs))
 
 	def working_capital_reserve_calc(self):
 		'''Calculate working capital reserve.
@@ -564,11 +1493,12 @@ class Discounted_Cash_Flow:
 
 		sum_variable_fixed_operating_costs = self.variable_operating_costs + self.fixed_operating_costs
 
-		self.working_capital_reserve = -self.fin['working capital']['Value'] * np.diff(sum_variable_fixed_operating_costs)
-		self.working_capital_reserve[-1] = -np.sum(self.working_capital_reserve[:-1])
-		self.working_capital_reserve = np.r_[np.zeros(1), self.working_capital_reserve]
+		self.working_capital_reserve = -self.fin['working capital']['Value'] * np.diff(sum_variable_fixed_operating_costs, axis = 0)
+		self.working_capital_reserve[-1] = -np.sum(self.working_capital_reserve[:-1], axis = 0)
+		self.working_capital_reserve = np.concatenate([np.zeros_like(self.working_capital_reserve[:1]), 
+													   self.working_capital_reserve])
 
-		return -numpy_npv(self.after_tax_nominal_irr, self.working_capital_reserve)
+		return -self.npv(self.working_capital_reserve)
 
 	def debt_financing(self):
 		'''Calculate constant debt financing.
@@ -576,12 +1506,12 @@ class Discounted_Cash_Flow:
 
 		self.debt_financed_capital = self.depreciable_capital_inflation * (1 - self.fin['equity']['Value']) * self.inflation_factor[0]
 		interest = self.debt_financed_capital * self.fin['interest']['Value']
-		self.interest_per_year = np.ones(len(self.inflation_factor)) * interest
+		self.interest_per_year = self.zeros_by_year() + interest
 
-		self.principal_payment = np.zeros(len(self.inflation_factor))
+		self.principal_payment = self.zeros_by_year()
 		self.principal_payment[-1] = self.debt_financed_capital
 
-		return numpy_npv(self.after_tax_nominal_irr, self.interest_per_year), numpy_npv(self.after_tax_nominal_irr, self.principal_payment)
+		return tuple(self.npv(self.interest_per_year, self.principal_payment))
 
 	def depreciation_charge(self):
 		'''Calculate depreciation charge.
@@ -593,17 +1523,17 @@ class Discounted_Cash_Flow:
 
 		self.annual_charge = MACRS_depreciation(self.plant_years, self.fin['depreciation length']['Value'], annual_depreciable_capital)		
 
-		return numpy_npv(self.after_tax_nominal_irr, self.annual_charge)
+		return self.npv(self.annual_charge)
 
 	def h2_sales(self):
 		'''Calculate H2 sales.
 		'''
 
-		self.annual_sales = np.ones(len(self.inflation_factor)) * self.output_per_year_at_gate
+		self.annual_sales = self.zeros_by_year() + self.output_per_year_at_gate
 		self.annual_sales[:self.start_up_time_idx] = self.annual_sales[:self.start_up_time_idx] * self.fin['startup revenues']['Value']
 		self.annual_sales[:self.start_idx] = 0
 
-		return numpy_npv(self.fin['irr']['Value'], self.annual_sales)
+		return self.npv(self.annual_sales, rate = 'irr')
 
 	def h2_cost(self):
 		'''Calculate levelized H2 cost.
@@ -626,7 +1556,7 @@ class Discounted_Cash_Flow:
 
 		self.annual_revenue = self.annual_sales * self.h2_cost_nominal * self.inflation_factor
 
-		return numpy_npv(self.after_tax_nominal_irr, self.annual_revenue)
+		return self.npv(self.annual_revenue)
 
 	def income(self):
 		'''Calculate total income.
@@ -637,7 +1567,8 @@ class Discounted_Cash_Flow:
 		self.annual_taxes = self.taxable_income * self.total_tax_rate
 		self.after_tax_income = self.annual_pre_depreciation_income - self.annual_taxes
 
-		return numpy_npv(self.after_tax_nominal_irr, self.annual_pre_depreciation_income), numpy_npv(self.after_tax_nominal_irr, self.taxable_income), numpy_npv(self.after_tax_nominal_irr, self.annual_taxes), numpy_npv(self.after_tax_nominal_irr, self.after_tax_income)
+		return tuple(self.npv(self.annual_pre_depreciation_income, self.taxable_income, 
+							  self.annual_taxes, self.after_tax_income))
 
 	def cash_flow(self):
 		'''Calculate cash flow.
@@ -646,14 +1577,14 @@ class Discounted_Cash_Flow:
 		pre_tax_cash_flow = -self.annual_initial_depreciable_capital - self.annual_replacement_costs + self.working_capital_reserve - self.annual_non_depreciable_capital + self.annual_pre_depreciation_income - self.principal_payment
 		after_tax_post_depreciation_cash_flow = pre_tax_cash_flow - self.annual_taxes
 
-		npv_after_tax_post_depreciation = numpy_npv(self.after_tax_nominal_irr, after_tax_post_depreciation_cash_flow)
+		npv_after_tax_post_depreciation = self.npv(after_tax_post_depreciation_cash_flow)
 
-		if abs(npv_after_tax_post_depreciation) > 1e-6:
+		if np.any(np.abs(npv_after_tax_post_depreciation) > 1e-6):
 			print('Warning: NPV of After tax post-depreciation cash flow is not 0, possible error. NPV: {0}'.format(npv_after_tax_post_depreciation))
 
-		cummulative_cash_flow = np.cumsum(after_tax_post_depreciation_cash_flow)
+		cummulative_cash_flow = np.cumsum(after_tax_post_depreciation_cash_flow, axis = 0)
 
-		return numpy_npv(self.after_tax_nominal_irr, cummulative_cash_flow)
+		return self.npv(cummulative_cash_flow)
 
 	def cost_contribution(self):
 		'''Compile contributions to H2 cost.
@@ -677,6 +1608,51 @@ class Discounted_Cash_Flow:
 		self.contributions['Total'] = self.h2_cost
 		self.contributions['Table Group'] = 'Total cost of hydrogen'
 
+	def npv(self, *series, rate = 'after_tax_nominal_irr'):
+		'''Net present value(s) of the provided cash flow `series`.
+
+		Parameters
+		----------
+		*series : ndarray or list
+			Cash flow series with years along the first axis.
+		rate : str, optional
+			Discount rate, either 'after_tax_nominal_irr' or 'irr' (after tax real 
+			internal rate of return).
+
+		Returns
+		-------
+		npv : float or ndarray
+			Net present value if one series is provided, otherwise array of net 
+			present values (first axis corresponds to `series`).
+
+		Notes
+		-----
+		Discount factors are computed once per run for each rate and stored in 
+		`discount_vectors`. Multiple series are stacked and discounted with a single 
+		product.
+		'''
+
+		if rate == 'irr':
+			value = self.fin['irr']['Value']
+		else:
+			value = getattr(self, rate)
+
+		if rate not in self.discount_vectors:
+			self.discount_vectors[rate] = discount_factors(value, len(self.plant_years))
+
+		factors = self.discount_vectors[rate]
+
+		if len(series) == 1:
+			return numpy_npv(value, series[0], factors = factors)
+		else:
+			return numpy_npv_stack(value, series, factors = factors)
+
+	def zeros_by_year(self):
+		'''Array of zeros with one entry per plant year and trailing `sample_shape` axes.
+		'''
+
+		return np.zeros((len(self.plant_years),) + self.sample_shape)
+
 	def expenses_per_kg_H2(self, value):
 		'''Calculate expenses per kg H2.
 		'''
@@ -702,3 +1678,52 @@ class Discounted_Cash_Flow:
 					if 'Processed' not in self.inp[top_key][middle_key]:
 						print('Warning: "{0} > {1}" has not been processed'.format(top_key, middle_key))
 
+class Batch_Discounted_Cash_Flow(Discounted_Cash_Flow):
+	'''Discounted cash flow analysis for a batch of samples, performing the financial 
+	calculations of ``Discounted_Cash_Flow`` for all samples at once.
+
+	Parameters
+	----------
+	inp : dict
+		Dictionary containing "Financial Input Values", "Construction", "Workflow" 
+		(only entries of type "function") and the workflow outputs listed in
+		`workflow_function_inputs`. Sample dependent entries are arrays with a trailing 
+		sample axis: 1D arrays for values which are constant over time and 2D arrays 
+		(years along first axis) for yearly values. Entries in `structural_financial_keys`
+		have to be identical for all samples and are provided as single values.
+	samples : int
+		Number of samples.
+
+	Returns
+	-------
+	Batch_Discounted_Cash_Flow : object
+		Batched discounted cash flow analysis object.
+
+	Attributes
+	----------
+	h2_cost : ndarray
+		Levelized H2 cost per kg for each sample.
+	contributions : dict
+		Cost contributions to H2 price, each entry containing one value per sample.
+
+	Notes
+	-----
+	Usually generated by ``batch_discounted_cash_flow``, which executes the plugins of 
+	the workflow and assembles `inp`.
+	'''
+
+	def __init__(self, inp, samples):
+
+		self.inp = inp
+		self.print_info = False
+		self.sample_shape = (samples,)
+
+		self.fin = self.inp['Financial Input Values']
+
+		self.npv_dict = {}
+		self.plugs = {}
+		self.discount_vectors = {}
+
+		self.pre_workflow()
+		self.workflow(self.inp, self.npv_dict, self.plugs)
+		self.post_workflow()
@@ -1,7 +1,9 @@
+import os
+import hashlib
 import numpy as np
-from functools import lru_cache
-
+from pyH2A.Utilities import input_modification
 from pyH2A.Utilities.input_modification import insert, process_table, read_textfile, file_import
+from pyH2A.Utilities.cache_registry import cached
 
 class Hourly_Irradiation_Plugin:
 	'''Calculation of hourly and mean daily irradiation data with different module configurations.
@@ -56,32 +58,27 @@ class Hourly_Irradiation_Plugin:
 		pv = dcf.inp['Irradiance Area Parameters']
 
 		self.power_kW, self.power_sat_kW, self.power_dat_kW = calculate_PV_power_ratio(dcf.inp['Hourly Irradiation']['File']['Value'],
-											pv['Module Tilt (degrees)']['Value'], pv['Array Azimuth (degrees)']['Value'],
-											pv['Nominal Operating Temperature (Celsius)']['Value'], 
-											pv['Temperature Coefficient (per Celsius)']['Value'],
-											pv['Mismatch Derating']['Value'], pv['Dirt Derating']['Value'])
-
-		insert(dcf, 'Hourly Irradiation', 'No Tracking (kW)', 'Value', 
-			   self.power_kW, __name__, print_info = print_info)
-		insert(dcf, 'Hourly Irradiation', 'Horizontal Single Axis Tracking (kW)', 'Value', 
-			   self.power_sat_kW, __name__, print_info = print_info)
-		insert(dcf, 'Hourly Irradiation', 'Two Axis Tracking (kW)', 'Value', 
-			   self.power_dat_kW, __name__, print_info = print_info)
+											*[pv[key]['Value'] for key in irradiance_area_keys])
 
-		insert(dcf, 'Hourly Irradiation', 'Mean solar input no tracking (kWh/m2/day)', 'Value', 
-			   np.sum(self.power_kW)/365., __name__, print_info = print_info)
-		insert(dcf, 'Hourly Irradiation', 'Mean solar input single axis tracking (kWh/m2/day)', 'Value', 
-			   np.sum(self.power_sat_kW)/365., __name__, print_info = print_info)
-		insert(dcf, 'Hourly Irradiation', 'Mean solar input two axis tracking (kWh/m2/day)', 'Value', 
-			   np.sum(self.power_dat_kW)/365., __name__, print_info = print_info)
+		for key, value in hourly_irradiation_outputs(self.power_kW, self.power_sat_kW, self.power_dat_kW).items():
+			insert(dcf, 'Hourly Irradiation', key, 'Value', value, __name__, print_info = print_info)
 
-def converter_function(string):
-	'''Converter function for datetime of hourly irradiation data.'''
+irradiance_area_keys = ['Module Tilt (degrees)', 'Array Azimuth (degrees)', 
+						'Nominal Operating Temperature (Celsius)', 'Temperature Coefficient (per Celsius)',
+						'Mismatch Derating', 'Dirt Derating']
 
-	decoded = string.decode('utf-8')
-	split = decoded.split(':')
+def hourly_irradiation_outputs(power_kW, power_sat_kW, power_dat_kW):
+	'''Dictionary of power profiles and mean solar inputs, which are inserted into 
+	"Hourly Irradiation" by ``Hourly_Irradiation_Plugin`` (keys are middle keys). 
+	Power profiles can have leading site axes, in which case mean solar inputs are arrays.
+	'''
 
-	return float(split[1][:2]) #- 0.5
+	return {'No Tracking (kW)': power_kW, 
+			'Horizontal Single Axis Tracking (kW)': power_sat_kW,
+			'Two Axis Tracking (kW)': power_dat_kW,
+			'Mean solar input no tracking (kWh/m2/day)': np.sum(power_kW, axis = -1)/365.,
+			'Mean solar input single axis tracking (kWh/m2/day)': np.sum(power_sat_kW, axis = -1)/365.,
+			'Mean solar input two axis tracking (kWh/m2/day)': np.sum(power_dat_kW, axis = -1)/365.}
 
 def import_Chang_data(file_name):
 	'''Import of Chang 2020 data, for debugging.'''
@@ -97,42 +94,180 @@ def import_Chang_data(file_name):
 
 	return data_dict, location
 	
-@lru_cache(maxsize = None)
-def import_hourly_data(file_name):
-	'''Imports hourly irradiation data and location coordinates from the `.csv` format provided 
-	by: https://re.jrc.ec.europa.eu/pvg_tools/en/#TMY.
-	``@lru_cache`` is used for fast repeated reads
+location_keys = ['Latitude (decimal degrees)', 'Longitude (decimal degrees)']
+sidecar_columns = ['Time', 'Temperature', 'Global Horizontal Irradiance', 
+				   'Direct Normal Irradiance', 'Diffuse Horizontal Irradiance']
+
+def parse_hourly_data(path):
+	'''Vectorized parser for hourly irradiation data `.csv` file at `path` 
+	(see ``import_hourly_data()``).
+
+	Returns
+	-------
+	data_dict : dict
+		Dictionary of 1D arrays (keys are `sidecar_columns`).
+	location : dict
+		Dictionary containing latitude and longitude (keys are `location_keys`).
+
+	Notes
+	-----
+	The header lines are scanned for the location coordinates and the 
+	"time(UTC)" column header. All following lines starting with a digit are 
+	data rows, which are converted to a 2D array in a single call. The time stamp 
+	(e.g. "20140101:0100") is split into date and time, and the hour of the day
+	is used as time.
 	'''
 
-	data = np.genfromtxt(file_import(file_name, mode = 'r'), 
-						  delimiter = ',', skip_header = 17, 
-						  skip_footer = 9, converters = {0: converter_function})
+	with open(path, mode = 'r') as file:
+		lines = file.read().splitlines()
 
-	strings = ['Latitude (decimal degrees)', 'Longitude (decimal degrees)']
 	location = {}
 
-	file_read = file_import(file_name, mode = 'r')
-	for row_counter, line in enumerate(file_read):
-
+	for row_counter, line in enumerate(lines):
 		split = line.split(':')
 
-		if split[0] in strings:
+		if split[0] in location_keys:
 			location[split[0]] = float(split[1].strip(' '))
-		else:
+		elif line.startswith('time(UTC)'):
 			break
-	file_read.close()
+	else:
+		raise ValueError('No hourly data found in {0}'.format(path))
 
-	data_dict = {'Time': data[:,0], 'Temperature': data[:,1], 'Global Horizontal Irradiance':  data[:,3],
-				 'Direct Normal Irradiance': data[:,4], 'Diffuse Horizontal Irradiance': data[:,5]}
+	start = row_counter + 1
+	stop = start
+	while stop < len(lines) and lines[stop][:1].isdigit():
+		stop += 1
+
+	data = np.array(','.join(lines[start:stop]).replace(':', ',').split(','), 
+					dtype = float).reshape(stop - start, -1)
+
+	data_dict = {'Time': data[:,1] // 100, 'Temperature': data[:,2], 
+				 'Global Horizontal Irradiance': data[:,4],
+				 'Direct Normal Irradiance': data[:,5], 
+				 'Diffuse Horizontal Irradiance': data[:,6]}
 
 	return data_dict, location
 
-@lru_cache(maxsize = None)
-def calculate_PV_power_ratio(file_name, module_tilt, array_azimuth, nominal_operating_temperature,
-							 temperature_coefficient, mismatch_derating, dirt_derating):
-	'''Calculation based on Chang 2020, https://doi.org/10.1016/j.xcrp.2020.100209
-	SAT: horzontal single axis tracking
-	DAT: dual axis tracking, no diffuse radiation
+package_directory = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def user_cache_directory():
+	'''Default directory for sidecar files of irradiation data files located in the
+	pyH2A package ("pyH2A" in `XDG_CACHE_HOME`, defaulting to "~/.cache").
+	'''
+
+	cache_home = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+
+	return os.path.join(cache_home, 'pyH2A')
+
+def sidecar_file_name(path):
+	'''Name of binary sidecar file for hourly irradiation data file at `path`. 
+	If an input cache directory is set (see 
+	:func:`~pyH2A.Utilities.input_modification.set_input_cache_directory`), 
+	the sidecar is stored there. Otherwise, it is stored next to the `.csv` file,
+	unless the file is part of the pyH2A package (e.g. the bundled TMY files), in which
+	case the user cache directory is used (see ``user_cache_directory()``).
+	'''
+
+	path = os.path.abspath(path)
+
+	if input_modification.input_cache_directory is not None:
+		directory = input_modification.input_cache_directory
+	elif os.path.commonpath([path, package_directory]) == package_directory:
+		directory = user_cache_directory()
+	else:
+		return '{0}.npz'.format(path)
+
+	path_hash = hashlib.sha256(path.encode()).hexdigest()
+
+	return os.path.join(directory, 'tmy_' + path_hash + '.npz')
+
+def read_sidecar(sidecar, status):
+	'''Read hourly irradiation data from binary `sidecar` file. Returns None if 
+	the sidecar does not exist, is unreadable or was created for a different 
+	version of the source file (based on size and modification time in `status`).
+	'''
+
+	try:
+		with np.load(sidecar) as stored:
+			if (int(stored['Size']) != status.st_size or 
+				int(stored['Modified']) != status.st_mtime_ns):
+				return None
+
+			data = stored['Data']
+			location = {key: value for key, value in zip(location_keys, stored['Location'].tolist())
+						if not np.isnan(value)}
+
+	except (OSError, KeyError, ValueError):
+		return None
+
+	data_dict = {key: data[column] for column, key in enumerate(sidecar_columns)}
+
+	return data_dict, location
+
+def write_sidecar(sidecar, status, data_dict, location):
+	'''Write hourly irradiation data to binary `sidecar` file (atomic replace). 
+	Failure to write (e.g. read-only directory) is ignored.
+	'''
+
+	temporary_file = '{0}.{1}.tmp.npz'.format(sidecar, os.getpid())
+
+	try:
+		os.makedirs(os.path.dirname(sidecar), exist_ok = True)
+		np.savez(temporary_file, Data = np.array([data_dict[key] for key in sidecar_columns]),
+				 Location = np.array([location.get(key, np.nan) for key in location_keys]),
+				 Size = status.st_size, Modified = status.st_mtime_ns)
+		os.replace(temporary_file, sidecar)
+	except OSError:
+		try:
+			os.remove(temporary_file)
+		except OSError:
+			pass
+
+@cached(maxsize = 32, maxbytes = 128 * 2**20)
+def import_hourly_data(file_name):
+	'''Imports hourly irradiation data and location coordinates from the `.csv` format provided 
+	by: https://re.jrc.ec.europa.eu/pvg_tools/en/#TMY.
+	Bounded cache (see :func:`~pyH2A.Utilities.cache_registry.cached`) is used for fast 
+	repeated reads, returned arrays are read-only.
+
+	Notes
+	-----
+	The `.csv` file is parsed once (``parse_hourly_data()``) and stored as binary 
+	sidecar file (see ``sidecar_file_name()``), which is used for subsequent imports 
+	as long as size and modification time of the `.csv` file are unchanged.
+	'''
+
+	path = str(file_import(file_name, mode = 'r', return_path = True))
+	status = os.stat(path)
+	sidecar = sidecar_file_name(path)
+
+	stored = read_sidecar(sidecar, status)
+	if stored is not None:
+		return stored
+
+	data_dict, location = parse_hourly_data(path)
+	write_sidecar(sidecar, status, data_dict, location)
+
+	return data_dict, location
+
+@cached(maxsize = 32, maxbytes = 128 * 2**20)
+def solar_geometry(file_name):
+	'''Solar geometry (altitude and azimuth angle for each hour) and the module 
+	orientation-independent irradiation of horizontal single axis tracking, 
+	calculated once per irradiation file.
+	Bounded cache is used for fast repeated reads.
+
+	Parameters
+	----------
+	file_name : str
+		Path to hourly irradiation data file (see ``import_hourly_data()``).
+
+	Returns
+	-------
+	geometry : dict
+		Dictionary containing hourly altitude angle, azimuth angle, sine and cosine 
+		of altitude angle, plane of array irradiation for single axis tracking 
+		(`SAT Total POA`) and the irradiation data.
 	'''
 
 	data, location = import_hourly_data(file_name)
@@ -156,24 +291,6 @@ def calculate_PV_power_ratio(file_name, module_tilt, array_azimuth, nominal_oper
 					np.sin(2 * np.pi / 360 * latitude) * np.cos(2 * np.pi / 360 * hour_angle)) / 
 					np.cos(2 * np.pi / 360 * altitude_angle)) * np.sign(hour_angle)
 
-	dni_fraction = np.cos(2 * np.pi / 360 * altitude_angle) * np.sin(2 * np.pi / 360 * 
-				   module_tilt) * np.cos(2 * np.pi / 360 * (array_azimuth - 
-				   azimuth_angle)) + np.sin(2 * np.pi / 360 * altitude_angle) * np.cos(2 * np.pi / 
-				   360 * module_tilt)
-	dni_fraction = dni_fraction.clip(min = 0)
-
-	direct_plane_radiation = data['Direct Normal Irradiance'] * dni_fraction
-	diffuse_plane_radiation = data['Diffuse Horizontal Irradiance'] * (180 - module_tilt) / 180
-	total_plane_radiation = direct_plane_radiation + diffuse_plane_radiation
-
-	cell_temperature = data['Temperature'] + (nominal_operating_temperature - 
-					   20) * total_plane_radiation/800  #where does this formula come from?
-
-	temperature_derating = 1 + temperature_coefficient * (cell_temperature - 25)  # why the 25 correction?
-
-	power_kW = (temperature_derating * mismatch_derating * 
-					 dirt_derating * total_plane_radiation/1000)  # Converting W to kW
-
 	sat_azimuth = np.sign(azimuth_angle) * 90
 
 	sat_tilt = 360 / (2 * np.pi) * np.arctan(1 / np.tan(2 * np.pi / 360 * altitude_angle) * 
@@ -188,11 +305,108 @@ def calculate_PV_power_ratio(file_name, module_tilt, array_azimuth, nominal_oper
 	sat_diffuse_POA = data['Diffuse Horizontal Irradiance'] * (180 - sat_tilt) / 180
 	sat_total_POA = sat_direct_POA + sat_diffuse_POA
 
+	geometry = {'Altitude Angle': altitude_angle, 'Azimuth Angle': azimuth_angle,
+				'Cos Altitude': np.cos(2 * np.pi / 360 * altitude_angle),
+				'Sin Altitude': np.sin(2 * np.pi / 360 * altitude_angle),
+				'SAT Total POA': sat_total_POA, **data}
+
+	return geometry
+
+def stacked_solar_geometry(file_names):
+	'''Solar geometry (see ``solar_geometry()``) of many irradiation files, stacked 
+	to 2D arrays (files x hours).
+	'''
+
+	geometries = [solar_geometry(file_name) for file_name in file_names]
+
+	if len(set(len(geometry['Time']) for geometry in geometries)) > 1:
+		raise ValueError('Hourly irradiation data files have to contain the same number of hours')
+
+	return {key: np.stack([geometry[key] for geometry in geometries]) for key in geometries[0]}
+
+def calculate_PV_power_profiles(file_name, module_tilt, array_azimuth, nominal_operating_temperature,
+								temperature_coefficient, mismatch_derating, dirt_derating):
+	'''Calculation of hourly power profiles for one or many module configurations,
+	based on Chang 2020, https://doi.org/10.1016/j.xcrp.2020.100209
+
+	Parameters
+	----------
+	file_name : str
+		Path to hourly irradiation data file (see ``import_hourly_data()``).
+	module_tilt, array_azimuth, nominal_operating_temperature, temperature_coefficient, mismatch_derating, dirt_derating : float or ndarray
+		Module configuration parameters (see ``Hourly_Irradiation_Plugin``). Arrays are
+		broadcast against each other.
+
+	Returns
+	-------
+	power_kW : ndarray
+		Hourly power with no tracking per m2 in kW.
+	power_sat_kW : ndarray
+		Hourly power with horizontal single axis tracking per m2 in kW.
+	power_dat_kW : ndarray
+		Hourly power with dual axis tracking (no diffuse radiation) per m2 in kW.
+
+	Notes
+	-----
+	The solar geometry is only calculated once per file (see ``solar_geometry()``), 
+	only the module orientation and derating terms are evaluated for each configuration.
+	All configurations are evaluated in one broadcasted operation: the shape of the 
+	returned arrays is the broadcast shape of the parameters with an additional 
+	trailing hour axis (i.e. 1D arrays for scalar parameters).
+	'''
+
+	return power_profiles_from_geometry(solar_geometry(file_name), module_tilt, array_azimuth, 
+										nominal_operating_temperature, temperature_coefficient, 
+										mismatch_derating, dirt_derating)
+
+def power_profiles_from_geometry(geometry, module_tilt, array_azimuth, nominal_operating_temperature,
+								 temperature_coefficient, mismatch_derating, dirt_derating):
+	'''Hourly power profiles for solar `geometry`, see ``calculate_PV_power_profiles()``.
+	`geometry` is either the geometry of one file (see ``solar_geometry()``) or of many 
+	files (see ``stacked_solar_geometry()``). In the latter case, parameters are either 
+	scalars or 1D arrays with one value per file, and the returned arrays are 2D (files x hours).
+	'''
+
+	module_tilt, array_azimuth, nominal_operating_temperature, temperature_coefficient, \
+	mismatch_derating, dirt_derating = [np.asarray(parameter, dtype = float)[...,None] for parameter in 
+										(module_tilt, array_azimuth, nominal_operating_temperature,
+										 temperature_coefficient, mismatch_derating, dirt_derating)]
+
+	dni_fraction = geometry['Cos Altitude'] * np.sin(2 * np.pi / 360 * 
+				   module_tilt) * np.cos(2 * np.pi / 360 * (array_azimuth - 
+				   geometry['Azimuth Angle'])) + geometry['Sin Altitude'] * np.cos(2 * np.pi / 
+				   360 * module_tilt)
+	dni_fraction = dni_fraction.clip(min = 0)
+
+	direct_plane_radiation = geometry['Direct Normal Irradiance'] * dni_fraction
+	diffuse_plane_radiation = geometry['Diffuse Horizontal Irradiance'] * (180 - module_tilt) / 180
+	total_plane_radiation = direct_plane_radiation + diffuse_plane_radiation
+
+	cell_temperature = geometry['Temperature'] + (nominal_operating_temperature - 
+					   20) * total_plane_radiation/800  #where does this formula come from?
+
+	temperature_derating = 1 + temperature_coefficient * (cell_temperature - 25)  # why the 25 correction?
+
+	power_kW = (temperature_derating * mismatch_derating * 
+					 dirt_derating * total_plane_radiation/1000)  # Converting W to kW
+
 	power_sat_kW = (temperature_derating * mismatch_derating * 
-					 dirt_derating * sat_total_POA / 1000)  # Convert W to kW
+					 dirt_derating * geometry['SAT Total POA'] / 1000)  # Convert W to kW
 
-	power_dat_kW = (data['Direct Normal Irradiance'] * temperature_derating * 
+	power_dat_kW = (geometry['Direct Normal Irradiance'] * temperature_derating * 
 					mismatch_derating * dirt_derating / 1000)
 
 	return power_kW, power_sat_kW, power_dat_kW
 
+@cached(maxsize = 256, maxbytes = 128 * 2**20)
+def calculate_PV_power_ratio(file_name, module_tilt, array_azimuth, nominal_operating_temperature,
+							 temperature_coefficient, mismatch_derating, dirt_derating):
+	'''Calculation based on Chang 2020, https://doi.org/10.1016/j.xcrp.2020.100209
+	SAT: horzontal single axis tracking
+	DAT: dual axis tracking, no diffuse radiation
+
+	Power profiles for a single module configuration, see ``calculate_PV_power_profiles()``.
+	'''
+
+	return calculate_PV_power_profiles(file_name, module_tilt, array_azimuth, nominal_operating_temperature,
+									   temperature_coefficient, mismatch_derating, dirt_derating)
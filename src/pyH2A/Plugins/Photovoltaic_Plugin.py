@@ -60,8 +60,19 @@ class Photovoltaic_Plugin:
 		Total land required in acres.
 	Non-Depreciable Capital Costs > Solar Collection Area (m2) > Value : float
 		Solar collection area in m2.
+
+	Notes
+	-----
+	`dependencies` lists all inputs of the plugin. When many discounted cash flow 
+	analyses are performed (e.g. Monte Carlo analysis), results are reused for
+	analyses in which these inputs are unchanged (see 
+	:func:`~pyH2A.Discounted_Cash_Flow.execute_memoized_plugin`).
 	'''
 
+	dependencies = ['Irradiation Used', 'CAPEX Multiplier', 'Electrolyzer', 'Photovoltaic',
+					'Financial Input Values > construction time > Value',
+					'Financial Input Values > plant life > Value']
+
 	def __init__(self, dcf, print_info):
 		process_table(dcf.inp, 'Irradiation Used', 'Value')
 		process_table(dcf.inp, 'CAPEX Multiplier', 'Value')
@@ -94,7 +105,8 @@ class Photovoltaic_Plugin:
 
 	def calculate_H2_production(self, dcf):
 		'''Using hourly irradiation data and electrolyzer as well as PV array parameters,
-		H2 production is calculated.
+		H2 production is calculated for all operation years at once (see 
+		``calculate_yearly_H2_production()``).
 		'''
 
 		if isinstance(dcf.inp['Irradiation Used']['Data']['Value'], str):
@@ -102,44 +114,32 @@ class Photovoltaic_Plugin:
 		else:
 			data = dcf.inp['Irradiation Used']['Data']['Value']
 
-		yearly_data = []
-
-		for year in dcf.operation_years:
-			data_loss_corrected = self.calculate_photovoltaic_loss_correction(dcf, data, year)
-			power_generation = data_loss_corrected * dcf.inp['Photovoltaic']['Nominal Power (kW)']['Value']
-
-			electrolyzer_power_demand, power_increase = self.calculate_electrolyzer_power_demand(dcf, year) 
-			electrolyzer_power_demand *= np.ones(len(power_generation))
-			electrolyzer_power_consumption = np.amin(np.c_[power_generation, electrolyzer_power_demand], axis = 1)
-
-			threshold = dcf.inp['Electrolyzer']['Minimum capacity']['Value']
-			electrolyzer_capacity = electrolyzer_power_consumption / electrolyzer_power_demand
-			electrolyzer_capacity[electrolyzer_capacity > threshold] = 1
-			electrolyzer_capacity[electrolyzer_capacity <= threshold] = 0
+		h2_produced, running_hours = calculate_yearly_H2_production(data, dcf.operation_years,
+										dcf.inp['Photovoltaic']['Power loss per year']['Value'],
+										dcf.inp['Photovoltaic']['Nominal Power (kW)']['Value'],
+										dcf.inp['Electrolyzer']['Power requirement increase per year']['Value'],
+										dcf.inp['Electrolyzer']['Nominal Power (kW)']['Value'],
+										dcf.inp['Electrolyzer']['Minimum capacity']['Value'],
+										dcf.inp['Electrolyzer']['Conversion efficiency (kg H2/kWh)']['Value'])
 
-			h2_produced = electrolyzer_power_consumption * dcf.inp['Electrolyzer']['Conversion efficiency (kg H2/kWh)']['Value'] / power_increase
-			h2_produced *= electrolyzer_capacity
-
-			yearly_data.append([year, np.sum(h2_produced), np.sum(electrolyzer_capacity)])
-
-		self.yearly_data = np.asarray(yearly_data)
+		self.yearly_data = np.c_[dcf.operation_years, h2_produced, running_hours]
 		self.h2_production = np.concatenate([np.zeros(dcf.inp['Financial Input Values']['construction time']['Value']), 
 												self.yearly_data[:,1]])
 
 	def calculate_photovoltaic_loss_correction(self, dcf, data, year):
-		'''Calculation of yearly reduction in electricity production by PV array.
+		'''Calculation of yearly reduction in electricity production by PV array
+		(see ``photovoltaic_loss_factor()``).
 		'''
 
-		return data * (1. - dcf.inp['Photovoltaic']['Power loss per year']['Value']) ** year
+		return data * photovoltaic_loss_factor(dcf.inp['Photovoltaic']['Power loss per year']['Value'], year)
 
 	def calculate_electrolyzer_power_demand(self, dcf, year):
-		'''Calculation of yearly increase in electrolyzer power demand.
+		'''Calculation of yearly increase in electrolyzer power demand
+		(see ``electrolyzer_power_demand()``).
 		'''
 
-		increase = (1. + dcf.inp['Electrolyzer']['Power requirement increase per year']['Value']) ** year
-		demand = increase * dcf.inp['Electrolyzer']['Nominal Power (kW)']['Value']
-
-		return demand, increase
+		return electrolyzer_power_demand(dcf.inp['Electrolyzer']['Power requirement increase per year']['Value'],
+										 dcf.inp['Electrolyzer']['Nominal Power (kW)']['Value'], year)
 
 	def calculate_stack_replacement(self, dcf):
 		'''Calculation of stack replacement frequency for electrolyzer.
@@ -174,3 +174,115 @@ class Photovoltaic_Plugin:
 		self.area_m2 = dcf.inp['Photovoltaic']['Nominal Power (kW)']['Value'] / peak_kW_per_m2
 		self.area_acres = self.area_m2 * 0.000247105
 
+def photovoltaic_loss_factor(power_loss, years):
+	'''Yearly reduction factor of electricity production by PV array, 
+	(1 - loss per year) ^ year.
+	'''
+
+	return (1. - power_loss) ** years
+
+def electrolyzer_power_demand(power_increase, electrolyzer_power, years):
+	'''Yearly electrolyzer power demand in kW and its increase factor, 
+	(1 + increase per year) ^ year.
+	'''
+
+	increase = (1. + power_increase) ** years
+
+	return increase * electrolyzer_power, increase
+
+def yearly_H2_production_kernel(data, years, power_loss, pv_power, power_increase, 
+								electrolyzer_power, minimum_capacity, efficiency):
+	'''Broadcasted H2 production calculation for (samples x) years x hours, see 
+	``calculate_yearly_H2_production()``. Parameters are either scalars or 1D arrays 
+	(one value per sample), `data` is either 1D (hours) or 2D (samples x hours).
+	'''
+
+	years = np.asarray(years)
+
+	loss_factor = photovoltaic_loss_factor(power_loss[...,None], years)
+	demand, increase = electrolyzer_power_demand(power_increase[...,None], electrolyzer_power[...,None], years)
+
+	power_generation = data[...,None,:] * loss_factor[...,None] * pv_power[...,None,None]
+	power_consumption = np.minimum(power_generation, demand[...,None])
+
+	capacity = np.where(power_consumption / demand[...,None] > minimum_capacity[...,None,None], 1., 0.)
+
+	h2_produced = power_consumption * efficiency[...,None,None] / increase[...,None]
+	h2_produced *= capacity
+
+	return np.sum(h2_produced, axis = -1), np.sum(capacity, axis = -1)
+
+def calculate_yearly_H2_production(data, years, power_loss, pv_power, power_increase, 
+								   electrolyzer_power, minimum_capacity, efficiency, block_size = 1):
+	'''Yearly H2 production of PV + electrolysis, optionally for many samples at once.
+
+	Parameters
+	----------
+	data : ndarray
+		Hourly power ratio data (kW per kW of nominal PV power), either 1D (hours) 
+		or with leading sample axes (e.g. samples x hours).
+	years : ndarray
+		Operation years.
+	power_loss : float or ndarray
+		Reduction in power produced by PV array per year due to degradation.
+	pv_power : float or ndarray
+		Nominal power of PV array in kW.
+	power_increase : float or ndarray
+		Electrolyzer power requirement increase per year.
+	electrolyzer_power : float or ndarray
+		Nominal power of electrolyzer in kW.
+	minimum_capacity : float or ndarray
+		Minimum capacity required for electrolyzer operation.
+	efficiency : float or ndarray
+		Electrical conversion efficiency of electrolyzer in (kg H2)/kWh.
+	block_size : int, optional
+		Number of samples evaluated per block if a sample axis is present.
+
+	Returns
+	-------
+	h2_produced : ndarray
+		H2 produced in each year in kg, shape is sample shape x years.
+	running_hours : ndarray
+		Hours of electrolyzer operation in each year, shape is sample shape x years.
+
+	Notes
+	-----
+	PV degradation ((1 - loss per year) ^ year) and electrolyzer power demand increase 
+	((1 + increase per year) ^ year) are applied as a (years x hours) broadcast. In hours 
+	in which the electrolyzer operates below `minimum_capacity`, no H2 is produced.
+
+	Sample axes are given by the broadcast shape of the parameters and the leading 
+	axes of `data`. Samples are evaluated in blocks of `block_size`, so that the 
+	(samples x years x hours) intermediate arrays remain small (for typical plant 
+	lifetimes, one sample per block keeps them cache-sized and is fastest).
+
+	The sample axis is a library-level option for custom screening scripts. 
+	``Photovoltaic_Plugin`` always evaluates a single sample, since the discounted cash 
+	flow analyses of Monte Carlo and batch runs execute plugins once per distinct set of 
+	workflow inputs (see :func:`~pyH2A.Discounted_Cash_Flow.batch_discounted_cash_flow`), 
+	with results reused through plugin memoization.
+	'''
+
+	data = np.asarray(data, dtype = float)
+	parameters = [np.asarray(parameter, dtype = float) for parameter in 
+				  (power_loss, pv_power, power_increase, electrolyzer_power, minimum_capacity, efficiency)]
+
+	sample_shape = np.broadcast_shapes(data.shape[:-1], *[parameter.shape for parameter in parameters])
+
+	if sample_shape == ():
+		return yearly_H2_production_kernel(data, years, *parameters)
+
+	number_of_samples = int(np.prod(sample_shape))
+	data = np.broadcast_to(data, sample_shape + data.shape[-1:]).reshape(number_of_samples, -1)
+	parameters = [np.broadcast_to(parameter, sample_shape).reshape(-1) for parameter in parameters]
+
+	h2_produced = np.empty((number_of_samples, len(years)))
+	running_hours = np.empty((number_of_samples, len(years)))
+
+	for start in range(0, number_of_samples, block_size):
+		block = slice(start, start + block_size)
+		h2_produced[block], running_hours[block] = yearly_H2_production_kernel(data[block], years, 
+														*[parameter[block] for parameter in parameters])
+
+	return (h2_produced.reshape(sample_shape + (len(years),)), 
+			running_hours.reshape(sample_shape + (len(years),)))
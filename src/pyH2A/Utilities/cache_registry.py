@@ -0,0 +1,278 @@
+import sys
+import threading
+from collections import OrderedDict
+from functools import update_wrapper
+import numpy as np
+
+cache_registry = {}
+keyword_marker = object()
+
+def freeze(value):
+	'''Set all ndarrays contained in `value` (also within tuples, lists and dicts)
+	to read-only, so that cached results cannot be modified by callers.
+	'''
+
+	if isinstance(value, np.ndarray):
+		value.flags.writeable = False
+	elif isinstance(value, (tuple, list)):
+		for item in value:
+			freeze(item)
+	elif isinstance(value, dict):
+		for item in value.values():
+			freeze(item)
+
+	return value
+
+def size_in_bytes(value):
+	'''Estimate of memory used by `value` in bytes (ndarrays are counted by
+	their data buffer).
+	'''
+
+	if isinstance(value, np.ndarray):
+		return value.nbytes
+	elif isinstance(value, (tuple, list)):
+		return sys.getsizeof(value) + sum(size_in_bytes(item) for item in value)
+	elif isinstance(value, dict):
+		return sys.getsizeof(value) + sum(size_in_bytes(key) + size_in_bytes(item)
+										  for key, item in value.items())
+	else:
+		return sys.getsizeof(value)
+
+class Bounded_Cache:
+	'''Least recently used (LRU) cache for the results of `function`, bounded
+	by number of entries and memory size.
+
+	Parameters
+	----------
+	function : function or None
+		Function whose results are cached. Arguments have to be hashable. If None,
+		results are added with ``store()`` and retrieved with ``get()``.
+	maxsize : int or None, optional
+		Maximum number of entries. None for no limit.
+	maxbytes : int or None, optional
+		Maximum memory used by cached results in bytes (see ``size_in_bytes()``).
+		None for no limit.
+
+	Returns
+	-------
+	Bounded_Cache : object
+		Cache object.
+
+	Attributes
+	----------
+	hits : int
+		Number of calls answered from the cache.
+	misses : int
+		Number of calls for which `function` was evaluated.
+	evictions : int
+		Number of entries removed to stay within the limits.
+
+	Notes
+	-----
+	Cached results are frozen (see ``freeze()``), i.e. all contained ndarrays are
+	read-only. Results larger than `maxbytes` are returned but not stored.
+	'''
+
+	def __init__(self, function, maxsize = 128, maxbytes = None):
+
+		self.function = function
+		self.maxsize = maxsize
+		self.maxbytes = maxbytes
+
+		self.entries = OrderedDict()
+		self.sizes = {}
+		self.bytes = 0
+		self.hits = 0
+		self.misses = 0
+		self.evictions = 0
+		self.lock = threading.RLock()
+
+	@staticmethod
+	def make_key(args, kwargs):
+		'''Cache key for positional `args` and keyword `kwargs`.
+		'''
+
+		if kwargs:
+			return args + (keyword_marker,) + tuple(sorted(kwargs.items()))
+		else:
+			return args
+
+	def __call__(self, *args, **kwargs):
+
+		key = self.make_key(args, kwargs)
+
+		with self.lock:
+			if key in self.entries:
+				self.hits += 1
+				self.entries.move_to_end(key)
+				return self.entries[key]
+
+			self.misses += 1
+
+		result = freeze(self.function(*args, **kwargs))
+		self.store(key, result)
+
+		return result
+
+	def get(self, key, default = None):
+		'''Cached result for `key` (see ``make_key()``), or `default` if there is no
+		entry. Used for caches whose results are computed by the caller and added
+		with ``store()``.
+		'''
+
+		with self.lock:
+			if key in self.entries:
+				self.hits += 1
+				self.entries.move_to_end(key)
+				return self.entries[key]
+
+			self.misses += 1
+
+			return default
+
+	def store(self, key, result, size = None):
+		'''Store `result` under `key` and evict least recently used entries until
+		the limits are met. If `size` (in bytes) is not provided, it is estimated
+		using ``size_in_bytes()``.
+		'''
+
+		if size is None:
+			size = size_in_bytes(result)
+
+		if self.maxbytes is not None and size > self.maxbytes:
+			return
+
+		with self.lock:
+			if key in self.entries:
+				self.bytes -= self.sizes[key]
+
+			self.entries[key] = result
+			self.sizes[key] = size
+			self.bytes += size
+
+			self.enforce_limits()
+
+	def enforce_limits(self):
+		'''Evict least recently used entries until `maxsize` and `maxbytes` are met.
+		'''
+
+		with self.lock:
+			while self.entries and ((self.maxsize is not None and len(self.entries) > self.maxsize) or
+									(self.maxbytes is not None and self.bytes > self.maxbytes)):
+				key, _ = self.entries.popitem(last = False)
+				self.bytes -= self.sizes.pop(key)
+				self.evictions += 1
+
+	def invalidate(self, *args, **kwargs):
+		'''Remove entry for arguments `args` and `kwargs` from cache. Returns True if
+		an entry was removed.
+		'''
+
+		key = self.make_key(args, kwargs)
+
+		with self.lock:
+			if key not in self.entries:
+				return False
+
+			del self.entries[key]
+			self.bytes -= self.sizes.pop(key)
+
+			return True
+
+	def clear(self):
+		'''Remove all entries and reset statistics.
+		'''
+
+		with self.lock:
+			self.entries.clear()
+			self.sizes.clear()
+			self.bytes = 0
+			self.hits = 0
+			self.misses = 0
+			self.evictions = 0
+
+	def set_limits(self, maxsize = None, maxbytes = None):
+		'''Change limits of cache (None for no limit) and evict entries if required.
+		'''
+
+		self.maxsize = maxsize
+		self.maxbytes = maxbytes
+		self.enforce_limits()
+
+	def statistics(self):
+		'''Dictionary containing hits, misses, evictions, number of entries, memory
+		used and limits of the cache.
+		'''
+
+		with self.lock:
+			return {'Hits': self.hits, 'Misses': self.misses, 'Evictions': self.evictions,
+					'Entries': len(self.entries), 'Bytes': self.bytes,
+					'Maximum Entries': self.maxsize, 'Maximum Bytes': self.maxbytes}
+
+def cached(name = None, maxsize = 128, maxbytes = None):
+	'''Decorator caching the results of a function in a ``Bounded_Cache``, which is
+	registered in `cache_registry`.
+
+	Parameters
+	----------
+	name : str, optional
+		Name of cache in `cache_registry`. Defaults to the qualified name of the
+		decorated function.
+	maxsize : int or None, optional
+		Maximum number of entries.
+	maxbytes : int or None, optional
+		Maximum memory used by cached results in bytes.
+
+	Returns
+	-------
+	decorator : function
+		Decorator. The decorated function has the attributes `cache` (``Bounded_Cache``),
+		`cache_info()`, `cache_clear()` and `invalidate()`.
+	'''
+
+	def decorator(function):
+		cache = Bounded_Cache(function, maxsize = maxsize, maxbytes = maxbytes)
+		cache_registry[name or '{0}.{1}'.format(function.__module__, function.__qualname__)] = cache
+
+		def wrapper(*args, **kwargs):
+			return cache(*args, **kwargs)
+
+		update_wrapper(wrapper, function)
+		wrapper.cache = cache
+		wrapper.cache_info = cache.statistics
+		wrapper.cache_clear = cache.clear
+		wrapper.invalidate = cache.invalidate
+
+		return wrapper
+
+	return decorator
+
+def register_cache(name, maxsize = 128, maxbytes = None):
+	'''Create ``Bounded_Cache`` without function (see ``Bounded_Cache.get()``) and
+	register it in `cache_registry` as `name`.
+	'''
+
+	cache = Bounded_Cache(None, maxsize = maxsize, maxbytes = maxbytes)
+	cache_registry[name] = cache
+
+	return cache
+
+def cache_statistics():
+	'''Statistics of all registered caches (see ``Bounded_Cache.statistics()``), keyed
+	by name.
+	'''
+
+	return {name: cache.statistics() for name, cache in cache_registry.items()}
+
+def clear_caches(names = None):
+	'''Clear registered caches with `names` (all caches if None).
+	'''
+
+	for name in (names or list(cache_registry)):
+		cache_registry[name].clear()
+
+def set_cache_limits(name, maxsize = None, maxbytes = None):
+	'''Set limits of registered cache `name` (see ``Bounded_Cache.set_limits()``).
+	'''
+
+	cache_registry[name].set_limits(maxsize = maxsize, maxbytes = maxbytes)
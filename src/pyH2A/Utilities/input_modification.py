@@ -1,12 +1,24 @@
 import numbers
-from functools import lru_cache, reduce
+from collections.abc import Mapping, MutableMapping
+from functools import reduce
+from contextlib import contextmanager
 import importlib.resources
 from importlib import import_module
 from pathlib import Path
 import ast
 import operator
+import os
+import re
+import hashlib
+import pickle
 import numpy as np
 
+from pyH2A import __version__
+from pyH2A.Utilities.cache_registry import cached
+
+input_cache_directory = None
+warning_scope = None
+
 def import_plugin(plugin_name, plugin_module):
 	'''Importing module.
 
@@ -144,9 +156,10 @@ def file_import(file_name, mode = 'rb', return_path = False):
 	else:
 		return output
 
-@lru_cache(maxsize = None)
+@cached(maxsize = 64, maxbytes = 256 * 2**20)
 def read_textfile(file_name, delimiter, mode = 'rb', **kwargs):
-	'''Wrapper for genfromtxt with lru_cache for repeated reads of the same file.
+	'''Wrapper for genfromtxt with bounded cache (see ``cached()``) for repeated reads 
+	of the same file. Returned arrays are read-only.
 
 	Parameters
 	----------
@@ -329,6 +342,99 @@ def merge(a, b, path=None, update=True):
 			a[key] = b[key]
 	return a
 
+def set_input_cache_directory(directory):
+	'''Set directory for the on-disk cache of parsed input files. If `directory` 
+	is None, the on-disk cache is disabled (in-memory caching remains active).
+	'''
+
+	global input_cache_directory
+
+	if directory is not None:
+		os.makedirs(directory, exist_ok = True)
+
+	input_cache_directory = directory
+
+def copy_input_dictionary(inp):
+	'''Cheap copy of a parsed input dictionary.
+
+	Notes
+	-----
+	Parsed input files are three-level dictionaries whose entries are ints, floats 
+	or strings. Since these are immutable, copying the three dictionary levels yields
+	a fully independent copy without the overhead of ``copy.deepcopy()``.
+	'''
+
+	return {top_key: {middle_key: dict(row) for middle_key, row in table.items()} 
+			for top_key, table in inp.items()}
+
+def cached_file_to_dictionary(file_name):
+	'''Cached version of ``convert_file_to_dictionary()``, returning a copy of the 
+	parsed input file.
+
+	Parameters
+	----------
+	file_name : str
+		Path to file, see ``file_import()``.
+
+	Returns
+	-------
+	inp : dict
+		Dictionary containing converted data from file.
+
+	Notes
+	-----
+	Parsed files are cached (see ``parse_input_file()``), keyed by path, modification time
+	and file size, so that changed files are parsed again. Cached dictionaries are
+	never handed out directly, copies are generated using ``copy_input_dictionary()``.
+
+	If an input cache directory is set (``set_input_cache_directory()``), parsed files 
+	are additionally pickled to this directory, keyed by a hash of the file content 
+	and the pyH2A version, so that repeated runs with the same input skip parsing.
+	'''
+
+	path = file_import(file_name, return_path = True)
+	stat = os.stat(path)
+	key = (str(Path(path).resolve()), stat.st_mtime_ns, stat.st_size)
+
+	return copy_input_dictionary(parse_input_file(file_name, path, key))
+
+@cached(maxsize = 32)
+def parse_input_file(file_name, path, key):
+	'''Parsed input file, cached by `file_name`, `path` and `key` (resolved path, 
+	modification time and size of file). Evicted entries of changed files are thus
+	never used again.
+	'''
+
+	return read_cached_input(file_name, path)
+
+def read_cached_input(file_name, path):
+	'''Reading parsed input file from on-disk cache if available, otherwise 
+	parsing it (and storing it in on-disk cache if input cache directory is set).
+	'''
+
+	if input_cache_directory is None:
+		return convert_file_to_dictionary(file_import(file_name, mode = 'r'))
+
+	with open(path, 'rb') as file:
+		content_hash = hashlib.sha256(file.read() + __version__.encode()).hexdigest()
+
+	cache_file = os.path.join(input_cache_directory, content_hash + '.pickle')
+
+	try:
+		with open(cache_file, 'rb') as file:
+			return pickle.load(file)
+	except (OSError, pickle.UnpicklingError, EOFError):
+		pass
+
+	inp = convert_file_to_dictionary(file_import(file_name, mode = 'r'))
+
+	temporary_file = '{0}.{1}.tmp'.format(cache_file, os.getpid())
+	with open(temporary_file, 'wb') as file:
+		pickle.dump(inp, file, protocol = pickle.HIGHEST_PROTOCOL)
+	os.replace(temporary_file, cache_file)
+
+	return inp
+
 def convert_input_to_dictionary(file, default = 'pyH2A.Config~Defaults.md', merge_default = True):
 	'''Reads provided input file (file) and default file, converting both to dictionaries.
 	The dictionaries are merged, with the input file having priority.
@@ -346,17 +452,222 @@ def convert_input_to_dictionary(file, default = 'pyH2A.Config~Defaults.md', merg
 	-------
 	inp : dict
 		Input dictionary.
+
+	Notes
+	-----
+	Files are only parsed once, see ``cached_file_to_dictionary()``. The returned 
+	dictionary is an independent copy which can be modified.
 	'''
 
-	inp_file = convert_file_to_dictionary(file_import(file, mode = 'r'))
+	inp_file = cached_file_to_dictionary(file)
 
 	if merge_default is False:
 		return inp_file
 
 	else:
-		inp_default = convert_file_to_dictionary(file_import(default, mode = 'r'))
+		inp_default = cached_file_to_dictionary(default)
 		return merge(inp_default, inp_file)
 
+class Input_Overlay(MutableMapping):
+	'''Copy-on-write view of a nested input dictionary.
+
+	Parameters
+	----------
+	base : dict
+		Nested input dictionary, which is not modified.
+
+	Returns
+	-------
+	Input_Overlay : object
+		Mutable mapping that behaves like a copy of `base`.
+
+	Attributes
+	----------
+	base : dict
+		Underlying input dictionary.
+	layer : dict
+		Entries which have been set (or accessed, in case of nested dictionaries) 
+		in this overlay.
+	deleted : set
+		Keys of `base` which have been deleted in this overlay.
+
+	Notes
+	-----
+	Reading an entry returns the value from `base`, unless it has been set in this 
+	overlay. Nested dictionaries are wrapped in their own ``Input_Overlay`` on first 
+	access, so that writing to `inp[top_key][middle_key][bottom_key]` only records the 
+	new value in the overlay and leaves `base` unchanged. Values (including ndarrays) are 
+	never copied, hence they should not be modified in-place.
+
+	``Input_Overlay`` objects can be used instead of ``copy.deepcopy(inp)`` to run many 
+	discounted cash flow analyses with modified inputs, since the memory and time 
+	required only scale with the number of accessed and modified entries.
+	'''
+
+	def __init__(self, base):
+		self.base = base
+		self.layer = {}
+		self.deleted = set()
+
+	def __getitem__(self, key):
+		try:
+			return self.layer[key]
+		except KeyError:
+			if key in self.deleted:
+				raise
+
+		value = self.base[key]
+
+		if isinstance(value, Mapping):
+			value = self.nested(key, value)
+			self.layer[key] = value
+
+		return value
+
+	def nested(self, key, value):
+		'''Overlay for nested dictionary `value` stored under `key`.'''
+
+		return Input_Overlay(value)
+
+	def __setitem__(self, key, value):
+		self.layer[key] = value
+		self.deleted.discard(key)
+
+	def __delitem__(self, key):
+		if key not in self:
+			raise KeyError(key)
+
+		self.layer.pop(key, None)
+		if key in self.base:
+			self.deleted.add(key)
+
+	def __contains__(self, key):
+		return key in self.layer or (key in self.base and key not in self.deleted)
+
+	def __iter__(self):
+		for key in self.base:
+			if key not in self.deleted:
+				yield key
+
+		for key in list(self.layer):
+			if key not in self.base:
+				yield key
+
+	def __len__(self):
+		return len(self.base) - len(self.deleted) + sum(key not in self.base for key in self.layer)
+
+	def __repr__(self):
+		return 'Input_Overlay({0})'.format(self.to_dict())
+
+	def to_dict(self):
+		'''Returns overlay as nested dictionary (values are not copied).'''
+
+		return {key: value.to_dict() if isinstance(value, Input_Overlay) 
+				else dict(value) if isinstance(value, Mapping) else value 
+				for key, value in self.items()}
+
+	def changes(self, path = ()):
+		'''List of (path, value) tuples of all entries which have been set in this
+		overlay (including nested overlays), in the order in which they were set.
+		Deleted entries have `deleted_entry` as value. Can be applied to another
+		input dictionary using ``apply_changes()``.
+		'''
+
+		output = []
+
+		for key, value in self.layer.items():
+			if isinstance(value, Input_Overlay):
+				output.extend(value.changes(path + (key,)))
+			else:
+				output.append((path + (key,), value))
+
+		for key in self.deleted:
+			output.append((path + (key,), deleted_entry))
+
+		return output
+
+class Recording_Overlay(Input_Overlay):
+	'''``Input_Overlay`` which records the paths of all entries that are read.
+
+	Parameters
+	----------
+	base : dict
+		Nested input dictionary, which is not modified.
+	reads : set, optional
+		Set to which the paths (tuples of keys) of read entries are added. Shared with 
+		all nested overlays.
+	path : tuple, optional
+		Path of `base` within the top-level input dictionary.
+
+	Returns
+	-------
+	Recording_Overlay : object
+		Mutable mapping that behaves like a copy of `base`.
+
+	Notes
+	-----
+	Reading an entry which is not a dictionary (or failing to read it) and checking 
+	if a key is present records the path of the entry. Iterating over a dictionary or 
+	determining its length records the path of the dictionary itself, i.e. the reader 
+	depends on all of its entries. Written entries are available from ``changes()``.
+	'''
+
+	def __init__(self, base, reads = None, path = ()):
+		super().__init__(base)
+		self.reads = set() if reads is None else reads
+		self.path = path
+
+	def nested(self, key, value):
+		return Recording_Overlay(value, self.reads, self.path + (key,))
+
+	def __getitem__(self, key):
+		try:
+			value = super().__getitem__(key)
+		except KeyError:
+			self.reads.add(self.path + (key,))
+			raise
+
+		if not isinstance(value, Input_Overlay):
+			self.reads.add(self.path + (key,))
+
+		return value
+
+	def __contains__(self, key):
+		self.reads.add(self.path + (key,))
+		return super().__contains__(key)
+
+	def __iter__(self):
+		self.reads.add(self.path)
+		return super().__iter__()
+
+	def __len__(self):
+		self.reads.add(self.path)
+		return super().__len__()
+
+deleted_entry = object()
+
+def copy_mapping(value):
+	'''Copy of nested dictionaries in `value` (other values are not copied).'''
+
+	if isinstance(value, Mapping):
+		return {key: copy_mapping(item) for key, item in value.items()}
+	else:
+		return value
+
+def apply_changes(inp, changes):
+	'''Apply `changes` (see ``Input_Overlay.changes()``) to input dictionary `inp`.
+	Dictionaries contained in `changes` are copied, so that `changes` can be applied
+	to many input dictionaries.
+	'''
+
+	for path, value in changes:
+		container = get_by_path(inp, path[:-1])
+
+		if value is deleted_entry:
+			del container[path[-1]]
+		else:
+			container[path[-1]] = copy_mapping(value)
+
 def get_by_path(root, items):
 	'''Access a nested object in `root` by item sequence.'''
 	return reduce(operator.getitem, items, root)
@@ -369,9 +680,12 @@ def set_by_path(root, items, value, value_type = 'value'):
 	Existing value is either multiplied by provided one 
 	(value_type = factor) or is replaced by provided one.
 	In-place replacement, should only be used on deep copy of self.inp dictionary
+	or on an ``Input_Overlay``. Factors are not applied in-place, so that values 
+	shared with an underlying input dictionary are not modified.
 	'''
 	if value_type == 'factor':
-		get_by_path(root, items[:-1])[items[-1]] *= value
+		container = get_by_path(root, items[:-1])
+		container[items[-1]] = container[items[-1]] * value
 	else:
 		get_by_path(root, items[:-1])[items[-1]] = value
 
@@ -505,6 +819,297 @@ def parse_parameter_to_array(key, delimiter = '>', dictionary = None, top_key =
 
 	return np.asarray(array)
 
+@contextmanager
+def scoped_warnings(printed_warnings):
+	'''Context within which ``print_warning_once()`` records printed messages in the
+	set `printed_warnings`, e.g. for all processing steps of one input dictionary.
+	'''
+
+	global warning_scope
+
+	previous_scope = warning_scope
+	warning_scope = printed_warnings
+
+	try:
+		yield printed_warnings
+	finally:
+		warning_scope = previous_scope
+
+def print_warning_once(message, printed_warnings = None):
+	'''Print warning `message`, unless the same message is contained in `printed_warnings` 
+	(defaults to the set of the active ``scoped_warnings()`` context). If no set is provided
+	and no context is active, `message` is always printed.
+	'''
+
+	if printed_warnings is None:
+		printed_warnings = warning_scope
+
+	if printed_warnings is None:
+		print(message)
+
+	elif message not in printed_warnings:
+		printed_warnings.add(message)
+		print(message)
+
+@cached(maxsize = 4096)
+def compile_path(path):
+	'''Split `path` into a tuple of keys. Uses bounded cache so that each
+	path is only parsed once.
+	'''
+
+	return tuple(parse_parameter(path))
+
+@cached(maxsize = 4096)
+def compile_cell(cell):
+	'''Compile content of input `cell`.
+
+	Parameters
+	----------
+	cell : str
+		Cell entry.
+
+	Returns
+	-------
+	compiled : float, int or tuple
+		If `cell` contains no path (no ">" symbol), the number in `cell` is returned
+		(or 1 if `cell` contains no number). Otherwise, tuple of the paths
+		separated by ";" is returned.
+
+	Notes
+	-----
+	Uses bounded cache so that the parsing of each distinct cell entry is only
+	performed once.
+	'''
+
+	if '>' not in cell:
+		value = num(cell)
+
+		if isinstance(value, numbers.Number):
+			return value
+		else:
+			return 1.
+
+	else:
+		return tuple(parse_parameter(cell, delimiter = ';'))
+
+def match_path(pattern, path):
+	'''Check if `path` (tuple of keys) matches `pattern` (tuple of keys), which
+	can contain "[...]" placeholders or empty keys matching any key.
+	'''
+
+	if len(pattern) != len(path):
+		return False
+
+	for pattern_key, key in zip(pattern, path):
+		if pattern_key in ('', '[...]'):
+			continue
+
+		if '[...]' in pattern_key:
+			regex = '.*'.join(re.escape(part.strip(' ')) for part in pattern_key.split('[...]'))
+			if re.fullmatch(regex, key.strip(' ')) is None:
+				return False
+
+		elif pattern_key != key:
+			return False
+
+	return True
+
+class Reference_Graph:
+	'''Graph of path references between cells of an input dictionary, which
+	is compiled once to validate references.
+
+	Parameters
+	----------
+	inp : dict
+		Input dictionary.
+	outputs : list, optional
+		Paths (strings or tuples of keys) which are generated during the discounted
+		cash flow analysis (e.g. plugin outputs) and hence can be referenced even though
+		they are not present in `inp`. Paths can contain "[...]" placeholders.
+	path_key : str, optional
+		Key used for path column. Defaults to 'Path'.
+
+	Returns
+	-------
+	Reference_Graph : object
+		Reference graph object.
+
+	Attributes
+	----------
+	references : dict
+		Dictionary with (top_key, middle_key, bottom_key) of each cell containing path(s)
+		as keys and tuple of referenced (top_key, middle_key, bottom_key) as values.
+	path_rows : dict
+		Dictionary with (top_key, middle_key) of rows with path(s) in `path_key` column
+		as keys and list of the other bottom keys of the row as values.
+	unresolved : list
+		List of (cell, path) tuples for paths which are invalid or cannot be resolved.
+	cycles : list
+		List of reference cycles, each a list of cells.
+	printed_warnings : set
+		Warnings printed for this input (see ``check()``). If the graph is compiled within
+		a ``scoped_warnings()`` context, the set of the context is used.
+
+	Notes
+	-----
+	Tables which are not processed during the discounted cash flow analysis
+	("Workflow", "Display Parameters" and all tables containing "Analysis" in their
+	name) as well as comment columns are ignored.
+
+	A cell depends on the cells referenced in it, and additionally on the cells
+	referenced in the `path_key` column of its row (see ``process_input()``).
+	'''
+
+	exceptions = ['Workflow', 'Display Parameters']
+
+	def __init__(self, inp, outputs = None, path_key = 'Path'):
+
+		self.path_key = path_key
+		self.outputs = [compile_path(output) if isinstance(output, str) else tuple(output)
+						for output in (outputs or [])]
+
+		self.references = {}
+		self.path_rows = {}
+		self.unresolved = []
+		self.printed_warnings = warning_scope if warning_scope is not None else set()
+
+		for top_key, table in inp.items():
+			if top_key in self.exceptions or 'Analysis' in top_key:
+				continue
+
+			for middle_key, row in table.items():
+				for bottom_key, cell in row.items():
+					if isinstance(cell, str) and '>' in cell and 'Comment' not in bottom_key:
+						self.compile_references(inp, (top_key, middle_key, bottom_key), cell)
+
+				if (top_key, middle_key, path_key) in self.references:
+					self.path_rows[(top_key, middle_key)] = [bottom_key for bottom_key in row 
+															 if bottom_key != path_key]
+
+		self.cycles = self.find_cycles()
+
+	def compile_references(self, inp, cell, entry):
+		'''Compile references in `entry` of `cell`, storing invalid paths in `unresolved`.
+		'''
+
+		targets = []
+
+		for path in compile_cell(entry):
+			parsed_path = compile_path(path)
+
+			if len(parsed_path) == 1:
+				continue
+
+			elif len(parsed_path) == 3 and self.is_resolvable(inp, parsed_path):
+				targets.append(parsed_path)
+
+			else:
+				self.unresolved.append((cell, path))
+
+		self.references[cell] = tuple(targets)
+
+	def is_resolvable(self, inp, path):
+		'''Check if `path` is present in `inp` or refers to a table written by 
+		one of the `outputs`.
+
+		Notes
+		-----
+		Only the table (top key) of paths which are not present in `inp` is checked, 
+		since plugins may insert entries whose names depend on their input.
+		'''
+
+		try:
+			inp[path[0]][path[1]][path[2]]
+			return True
+		except (KeyError, TypeError):
+			return any(match_path(output[:1], path[:1]) for output in self.outputs)
+
+	def dependencies(self, cell):
+		'''Cells directly referenced by `cell`, including references in the
+		path column of its row.
+		'''
+
+		targets = self.references.get(cell, ())
+
+		if cell[2] != self.path_key:
+			targets = targets + self.references.get((cell[0], cell[1], self.path_key), ())
+
+		return targets
+
+	def dependents(self, cells):
+		'''Returns set of all cells which directly or indirectly depend on `cells`.
+		'''
+
+		reverse = {}
+		for cell in self.references:
+			for target in self.references[cell]:
+				reverse.setdefault(target, set()).add(cell)
+
+		output = set()
+		stack = [tuple(cell) for cell in cells]
+
+		while stack:
+			cell = stack.pop()
+			dependents = set(reverse.get(cell, ()))
+
+			if cell[2] == self.path_key:
+				dependents.update((cell[0], cell[1], bottom_key) 
+								  for bottom_key in self.path_rows.get(cell[:2], []))
+
+			for dependent in dependents:
+				if dependent not in output:
+					output.add(dependent)
+					stack.append(dependent)
+
+		return output
+
+	def find_cycles(self):
+		'''Find reference cycles using depth-first search.
+		'''
+
+		cycles = []
+		state = {}
+
+		for start in self.references:
+			if start in state:
+				continue
+
+			state[start] = 'active'
+			stack = [(start, iter(self.dependencies(start)))]
+			trail = [start]
+
+			while stack:
+				cell, targets = stack[-1]
+				target = next(targets, None)
+
+				if target is None:
+					state[cell] = 'done'
+					stack.pop()
+					trail.pop()
+
+				elif state.get(target) == 'active':
+					cycles.append(trail[trail.index(target):] + [target])
+
+				elif target not in state:
+					state[target] = 'active'
+					stack.append((target, iter(self.dependencies(target))))
+					trail.append(target)
+
+		return cycles
+
+	def check(self):
+		'''Print warnings for unresolved paths and reference cycles (each warning
+		is only printed once for this input, see `printed_warnings`).
+		'''
+
+		for cell, path in self.unresolved:
+			print_warning_once('Warning: Invalid path specified for "{0}" (at "{1} > {2} > {3}"), setting to 1'
+							   .format(path, *cell), self.printed_warnings)
+
+		for cycle in self.cycles:
+			print_warning_once('Warning: Circular reference: {0}'
+							   .format(' -> '.join(' > '.join(cell) for cell in cycle)), self.printed_warnings)
+
 def process_path(dictionary, path, top_key, key, bottom_key, print_processing_warning = True):
 	'''Processing provided path. Checks are performed to see if path is valid.
 
@@ -533,9 +1138,12 @@ def process_path(dictionary, path, top_key, key, bottom_key, print_processing_wa
 	If the rerieved target value comes from an unprocessed key, a warning is printed.
 	If the retrieved target value is non-numerical, a warning is printed and 1 is returned.
 	If the retrieved target value is numerical, it is returned.
+
+	Paths are only parsed once (``compile_path()``) and each warning is only printed
+	once within the active ``scoped_warnings()`` context (``print_warning_once()``).
 	'''
 
-	parsed_path = parse_parameter(path)
+	parsed_path = compile_path(path)
 
 	if len(parsed_path) == 1:
 		return 1.
@@ -543,29 +1151,30 @@ def process_path(dictionary, path, top_key, key, bottom_key, print_processing_wa
 	elif len(parsed_path) == 3:
 
 		try:
-			target_value = get_by_path(dictionary, parsed_path)
+			row = dictionary[parsed_path[0]][parsed_path[1]]
+			target_value = row[parsed_path[2]]
 
-			if 'Processed' not in dictionary[parsed_path[0]][parsed_path[1]] and print_processing_warning is True:
-				print('Warning: Unprocessed value is being used at "{0} > {1} > {2}" (by "{3} > {4}")'
+			if 'Processed' not in row and print_processing_warning is True:
+				print_warning_once('Warning: Unprocessed value is being used at "{0} > {1} > {2}" (by "{3} > {4}")'
 					  .format(parsed_path[0], parsed_path[1], parsed_path[2], top_key, key))
 
 			if not isinstance(target_value, numbers.Number):
 				if isinstance(target_value, list) or type(target_value).__module__ == np.__name__:
 					pass
 				else:
-					print('Warning: Non-numerical value retrieved at "{0} > {1} > {2}" (by "{3} > {4}"), setting to 1'
+					print_warning_once('Warning: Non-numerical value retrieved at "{0} > {1} > {2}" (by "{3} > {4}"), setting to 1'
 						  .format(parsed_path[0], parsed_path[1], parsed_path[2], top_key, key))
 					target_value = 1.
 
 		except KeyError:
-			print('Warning: Invalid path specified for "{0}" (at "{1} > {2} > {3}"), setting to 1'
+			print_warning_once('Warning: Invalid path specified for "{0}" (at "{1} > {2} > {3}"), setting to 1'
 				  .format(path, top_key, key, bottom_key))
 			target_value = 1.
 
 		return target_value
 
 	else:
-		print('Warning: Invalid path specified for "{0}" (at "{1} > {2} > {3}"), setting to 1'
+		print_warning_once('Warning: Invalid path specified for "{0}" (at "{1} > {2} > {3}"), setting to 1'
 			   .format(path, top_key, key, bottom_key))
 		return 1.
 
@@ -603,15 +1212,13 @@ def process_cell(dictionary, top_key, key, bottom_key, cell = None, print_proces
 	if isinstance(cell, numbers.Number):
 		return cell
 
-	elif '>' not in cell:
-		if isinstance(num(cell), numbers.Number):
-			return num(cell)
-		else:
-			return 1.
+	paths = compile_cell(cell)
+
+	if isinstance(paths, numbers.Number):
+		return paths
 
 	else:
 		value = 1.
-		paths = parse_parameter(cell, delimiter = ';')
 
 		for path in paths:
 			target_value = process_path(dictionary, path, top_key, key, bottom_key, 
@@ -0,0 +1,174 @@
+import itertools
+import numpy as np
+from numpy.polynomial import legendre
+
+def total_degree_indices(dimensions, degree):
+	'''Multi-indices of all multivariate polynomials in `dimensions` variables
+	with a total degree of at most `degree`.
+
+	Returns
+	-------
+	indices : ndarray
+		2D integer array with one multi-index per row.
+	'''
+
+	indices = [index for index in itertools.product(range(degree + 1), repeat = dimensions)
+			   if sum(index) <= degree]
+	indices.sort(key = sum)
+
+	return np.array(indices, dtype = int).reshape(-1, dimensions)
+
+def legendre_design_matrix(unit_values, indices):
+	'''Design matrix of orthonormal Legendre polynomials.
+
+	Parameters
+	----------
+	unit_values : ndarray
+		2D array of samples scaled to unit hypercube.
+	indices : ndarray
+		Multi-indices of polynomials (see ``total_degree_indices()``).
+
+	Returns
+	-------
+	matrix : ndarray
+		2D array with one row per sample and one column per polynomial.
+
+	Notes
+	-----
+	Polynomials are orthonormal with respect to the uniform distribution on the
+	unit hypercube.
+	'''
+
+	degree = int(indices.max()) if indices.size > 0 else 0
+	x = 2 * np.asarray(unit_values, dtype = float) - 1
+
+	normalization = np.sqrt(2 * np.arange(degree + 1) + 1)
+	matrix = np.ones((len(x), len(indices)))
+
+	for dimension in range(x.shape[1]):
+		vander = legendre.legvander(x[:,dimension], degree) * normalization
+		matrix *= vander[:,indices[:,dimension]]
+
+	return matrix
+
+class Polynomial_Chaos_Surrogate:
+	'''Polynomial chaos expansion (Legendre polynomials) as fast surrogate model
+	of a function of several bounded parameters.
+
+	Parameters
+	----------
+	lower : ndarray
+		Lower limit of each parameter.
+	upper : ndarray
+		Upper limit of each parameter.
+	max_degree : int, optional
+		Highest total polynomial degree which is considered.
+	validation_fraction : float, optional
+		Fraction of training samples which is held out to select the polynomial
+		degree and to determine the validation error.
+	seed : int, optional
+		Seed for random number generator used to split training samples.
+
+	Returns
+	-------
+	Polynomial_Chaos_Surrogate : object
+		Surrogate model object.
+
+	Attributes
+	----------
+	degree : int
+		Selected total polynomial degree.
+	coefficients : ndarray
+		Coefficients of polynomials.
+	validation_error : dict
+		Root mean square error ('RMSE') and maximum absolute error ('Max') of
+		the selected model for the held out samples.
+
+	Notes
+	-----
+	For each degree (as long as the number of polynomials is at most half the
+	number of fitting samples), coefficients are fitted by least squares and the
+	error on the held out samples is computed. The degree with the smallest root
+	mean square error is selected and the model is refitted using all samples.
+	'''
+
+	def __init__(self, lower, upper, max_degree = 4, validation_fraction = 0.2, seed = None):
+
+		self.lower = np.asarray(lower, dtype = float)
+		self.upper = np.asarray(upper, dtype = float)
+		self.max_degree = max_degree
+		self.validation_fraction = validation_fraction
+		self.seed = seed
+
+	def scale(self, values):
+		'''Scale parameter `values` to unit hypercube.
+		'''
+
+		return (np.asarray(values, dtype = float) - self.lower) / (self.upper - self.lower)
+
+	def fit_coefficients(self, unit_values, targets, indices):
+		'''Least squares fit of coefficients for polynomials `indices`.
+		'''
+
+		matrix = legendre_design_matrix(unit_values, indices)
+
+		return np.linalg.lstsq(matrix, targets, rcond = None)[0]
+
+	def fit(self, values, targets):
+		'''Fit surrogate model.
+
+		Parameters
+		----------
+		values : ndarray
+			2D array containing one set of parameter values per row.
+		targets : ndarray
+			Function value for each row of `values`.
+
+		Returns
+		-------
+		self : Polynomial_Chaos_Surrogate
+			Fitted surrogate model.
+		'''
+
+		unit_values = self.scale(values)
+		targets = np.asarray(targets, dtype = float)
+
+		rng = np.random.default_rng(self.seed)
+		order = rng.permutation(len(targets))
+		number_validation = max(int(round(self.validation_fraction * len(targets))), 1)
+		validation, training = order[:number_validation], order[number_validation:]
+
+		errors = {}
+
+		for degree in range(1, self.max_degree + 1):
+			indices = total_degree_indices(unit_values.shape[1], degree)
+
+			if len(indices) > len(training) / 2 and degree > 1:
+				break
+
+			coefficients = self.fit_coefficients(unit_values[training], targets[training], indices)
+			residuals = legendre_design_matrix(unit_values[validation], indices) @ coefficients - targets[validation]
+
+			errors[degree] = {'RMSE': float(np.sqrt(np.mean(residuals**2))),
+							  'Max': float(np.amax(np.abs(residuals)))}
+
+		self.degree = min(errors, key = lambda degree: errors[degree]['RMSE'])
+		self.validation_error = errors[self.degree]
+
+		self.indices = total_degree_indices(unit_values.shape[1], self.degree)
+		self.coefficients = self.fit_coefficients(unit_values, targets, self.indices)
+
+		return self
+
+	def predict(self, values, block_size = 65536):
+		'''Evaluate surrogate model for each row of `values`.
+		'''
+
+		values = np.asarray(values, dtype = float)
+		output = np.empty(len(values))
+
+		for start in range(0, len(values), block_size):
+			block = self.scale(values[start:start + block_size])
+			output[start:start + block_size] = legendre_design_matrix(block, self.indices) @ self.coefficients
+
+		return output
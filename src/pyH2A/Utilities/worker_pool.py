@@ -0,0 +1,253 @@
+import multiprocessing
+from multiprocessing import shared_memory, resource_tracker
+from timeit import default_timer as timer
+import weakref
+import numpy as np
+
+worker_state = {}
+
+def initialize_worker(function, context):
+	'''Initializer of worker processes, storing `function` and `context`
+	(which are shipped once per worker) in `worker_state`.
+	'''
+
+	worker_state['function'] = function
+	worker_state['context'] = context
+
+def attach_array(name, shape):
+	'''Attach to shared memory block `name` and return it together with an
+	ndarray view of `shape`.
+	'''
+
+	block = shared_memory.SharedMemory(name = name)
+	array = np.ndarray(shape, dtype = float, buffer = block.buf)
+
+	return block, array
+
+def evaluate_chunk(task):
+	'''Evaluate rows `start` to `stop` of shared input array in worker process and
+	write results to shared output array.
+	'''
+
+	input_name, input_shape, output_name, start, stop = task
+
+	start_time = timer()
+
+	input_block, values = attach_array(input_name, input_shape)
+	output_block, output = attach_array(output_name, (input_shape[0],))
+
+	try:
+		output[start:stop] = worker_state['function'](values[start:stop], **worker_state['context'])
+	finally:
+		del values, output
+		input_block.close()
+		output_block.close()
+
+	return start, stop, timer() - start_time
+
+def chunk_bounds(length, chunk_size):
+	'''Returns list of (start, stop) tuples dividing `length` rows into chunks
+	of at most `chunk_size` rows.
+	'''
+
+	starts = np.arange(0, length, max(int(chunk_size), 1))
+	stops = np.minimum(starts + max(int(chunk_size), 1), length)
+
+	return list(zip(starts.tolist(), stops.tolist()))
+
+def print_progress(chunk, chunks, chunk_rows, chunk_time, completed, total, elapsed):
+	'''Print progress report for completed chunk, including throughput of the 
+	chunk and estimated time until all `total` rows are evaluated.
+	'''
+
+	throughput = completed / elapsed if elapsed > 0 else float('inf')
+	eta = (total - completed) / throughput if throughput > 0 else float('inf')
+
+	print('Chunk {0}/{1}: {2} samples in {3:.2f} s ({4:.1f} samples/s), {5}/{6} done, ETA {7:.1f} s'
+		  .format(chunk, chunks, chunk_rows, chunk_time, chunk_rows / max(chunk_time, 1e-12), 
+		  		  completed, total, eta))
+
+def shutdown_pool(pool):
+	'''Graceful shutdown of `pool`, waiting for running tasks to finish.
+	'''
+
+	pool.close()
+	pool.join()
+
+class Worker_Pool:
+	'''Persistent pool of worker processes, which evaluate a function for many
+	sets of parameter values.
+
+	Parameters
+	----------
+	function : function
+		Module-level function with signature ``function(values, **context)``, which
+		returns a 1D array with one result per row of the 2D array `values`.
+	context : dict, optional
+		Keyword arguments for `function` (e.g. base input dictionary and compiled
+		workflow plan), which are shipped to each worker once at startup.
+	workers : int, optional
+		Number of worker processes. Defaults to the number of available CPUs.
+	chunks_per_worker : int, optional
+		Default number of chunks per worker into which sets of parameter values are
+		divided (see ``map()``).
+
+	Returns
+	-------
+	Worker_Pool : object
+		Worker pool object.
+
+	Attributes
+	----------
+	workers : int
+		Number of worker processes.
+	pool : multiprocessing.pool.Pool or None
+		Pool of worker processes, None if only one worker is used (in which case
+		`function` is evaluated in the current process).
+
+	Notes
+	-----
+	Sets of parameter values and results are exchanged with the workers through
+	``multiprocessing.shared_memory`` buffers, so that only the buffer names and
+	row ranges are sent with each task.
+
+	Rows are dispatched in chunks which are handed to idle workers as they become 
+	available (``imap_unordered``), so that slow chunks do not stall the other workers. 
+	Results are written to their row position, hence the original order is preserved.
+
+	The pool is shut down gracefully when ``close()`` is called, when it is used as
+	a context manager, when the ``Worker_Pool`` object is garbage collected or when
+	the interpreter exits.
+	'''
+
+	def __init__(self, function, context = None, workers = None, chunks_per_worker = 4):
+
+		self.function = function
+		self.context = context or {}
+		self.workers = int(workers or multiprocessing.cpu_count())
+		self.chunks_per_worker = chunks_per_worker
+
+		if self.workers > 1:
+			resource_tracker.ensure_running() # shared by workers, which attach to shared memory
+			self.pool = multiprocessing.Pool(self.workers, initializer = initialize_worker,
+											 initargs = (self.function, self.context))
+			self.finalizer = weakref.finalize(self, shutdown_pool, self.pool)
+		else:
+			self.pool = None
+
+	def map(self, values, chunk_size = None, print_info = False, callback = None):
+		'''Evaluate `function` for each row of `values`.
+
+		Parameters
+		----------
+		values : ndarray
+			2D array containing one set of parameter values per row.
+		chunk_size : int, optional
+			Number of rows per chunk. Defaults to the number of rows divided by
+			`workers` * `chunks_per_worker`.
+		print_info : bool, optional
+			Flag to control if throughput and estimated remaining time are printed
+			after each completed chunk.
+		callback : function, optional
+			Function with signature ``callback(start, stop, results)``, which is
+			called in the current process after each completed chunk with the 
+			results for rows `start` to `stop`.
+
+		Returns
+		-------
+		results : ndarray
+			1D array containing result for each row of `values`.
+
+		Notes
+		-----
+		If only one worker is used, all rows are evaluated with one call of `function`, 
+		unless `chunk_size`, `print_info` or `callback` are specified.
+		'''
+
+		values = np.ascontiguousarray(values, dtype = float)
+
+		if len(values) == 0:
+			return np.asarray(self.function(values, **self.context), dtype = float)
+
+		if chunk_size is None:
+			if self.pool is None and print_info is False and callback is None:
+				chunk_size = len(values)
+			else:
+				chunk_size = np.ceil(len(values) / (self.workers * self.chunks_per_worker))
+
+		bounds = chunk_bounds(len(values), chunk_size)
+
+		if self.pool is None:
+			return self.process_chunks(self.evaluate_serial(values, bounds), 
+									   np.empty(len(values)), len(bounds), print_info, callback)
+
+		input_block = shared_memory.SharedMemory(create = True, size = max(values.nbytes, 1))
+		output_block = shared_memory.SharedMemory(create = True, size = max(len(values) * 8, 1))
+
+		shared_values = np.ndarray(values.shape, dtype = float, buffer = input_block.buf)
+		output = np.ndarray((len(values),), dtype = float, buffer = output_block.buf)
+
+		try:
+			shared_values[:] = values
+
+			tasks = [(input_block.name, values.shape, output_block.name, start, stop)
+					 for start, stop in bounds]
+
+			self.process_chunks(self.pool.imap_unordered(evaluate_chunk, tasks), 
+								output, len(bounds), print_info, callback)
+			results = np.copy(output)
+
+		finally:
+			del shared_values, output
+			for block in (input_block, output_block):
+				block.close()
+				block.unlink()
+
+		return results
+
+	def evaluate_serial(self, values, bounds):
+		'''Evaluate chunks defined by `bounds` in current process, yielding the
+		same information as ``evaluate_chunk()`` together with the results.
+		'''
+
+		for start, stop in bounds:
+			start_time = timer()
+			results = self.function(values[start:stop], **self.context)
+			yield start, stop, timer() - start_time, results
+
+	def process_chunks(self, chunks, output, number_of_chunks, print_info, callback):
+		'''Process completed `chunks` (results are stored in `output`), printing 
+		progress and calling `callback`.
+		'''
+
+		start_time = timer()
+		completed = 0
+
+		for chunk, (start, stop, chunk_time, *results) in enumerate(chunks, 1):
+			if results:
+				output[start:stop] = results[0]
+
+			completed += stop - start
+
+			if print_info is True:
+				print_progress(chunk, number_of_chunks, stop - start, chunk_time, 
+							   completed, len(output), timer() - start_time)
+
+			if callback is not None:
+				callback(start, stop, np.copy(output[start:stop]))
+
+		return output
+
+	def close(self):
+		'''Graceful shutdown of worker processes.
+		'''
+
+		if self.pool is not None:
+			self.finalizer()
+			self.pool = None
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, exc_type, exc_value, traceback):
+		self.close()
@@ -13,10 +13,11 @@ def cli():
 @cli.command()
 @click.option('-i', '--input_file', type=str, help='Path to input file.', required = True)
 @click.option('-o', '--output_dir', type=str, help='Path to output directory.', required = True)
-def run(input_file, output_dir):
+@click.option('-c', '--cache_dir', type=str, default = None, help='Path to directory for caching parsed input files.')
+def run(input_file, output_dir, cache_dir):
 	'''Run pyH2A analysis.
 	'''
-	output = command_line_pyH2A(input_file, output_dir)
+	output = command_line_pyH2A(input_file, output_dir, cache_dir = cache_dir)
 
 @cli.command()
 @click.option('-i', '--input_file', type=str, help='Path to input file.', required = True)
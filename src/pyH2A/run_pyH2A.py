@@ -2,7 +2,7 @@ import sys
 import ast
 import os
 from pyH2A.Discounted_Cash_Flow import Discounted_Cash_Flow
-from pyH2A.Utilities.input_modification import convert_input_to_dictionary, execute_plugin, convert_dict_to_kwargs_dict, check_for_meta_module
+from pyH2A.Utilities.input_modification import convert_input_to_dictionary, execute_plugin, convert_dict_to_kwargs_dict, check_for_meta_module, set_input_cache_directory
 
 from timeit import default_timer as timer
 
@@ -73,7 +73,7 @@ class pyH2A:
 								input_file = self.input_file)
 
 		for key in self.inp:
-			if module_name in key and 'Methods' in key: 
+			if key.split(' ')[-1] == module_name and 'Methods' in key: 
 				self.execute_module_methods(module, key, module_name, meta_dict)
 
 	def execute_module_methods(self, module, key, module_name, meta_dict):
@@ -131,10 +131,16 @@ def run_pyH2A():
 
 	return output
 
-def command_line_pyH2A(input_file, output_dir):
+def command_line_pyH2A(input_file, output_dir, cache_dir = None):
 	'''Wrapper function to run pyH2A using click.
+
+	Notes
+	-----
+	If `cache_dir` is provided, parsed input files are cached in this directory
+	(see ``set_input_cache_directory()``).
 	'''
 
+	set_input_cache_directory(cache_dir)
 	output = pyH2A(input_file, output_dir)
 
 	return output